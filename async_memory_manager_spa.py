@@ -0,0 +1,248 @@
+"""
+Async Enhanced Memory Manager
+=============================
+
+Coroutine counterpart of EnhancedMemoryManager for the async server, backed by
+an asyncpg connection pool. Uses the same table, SQL and memory dict shape as
+the sync manager, and takes its options through the same _configure (read
+cache, pool size, turn log, ...). Only the I/O methods are coroutines; the
+buyer-journey logic (add_interaction, build_context_summary, ...), projected
+LazyMemory loads and partial saves are inherited unchanged.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+import asyncpg
+
+from enhanced_memory_manager_spa import (
+    EnhancedMemoryManager, LazyMemory, LOAD_MEMORY_SQL, SAVE_MEMORY_SQL, CLEANUP_EXPIRED_SQL,
+    NOTIFY_MEMORY_SQL, projected_load_sql, to_numbered_sql
+)
+from funnel_analytics_spa import INSERT_FUNNEL_EVENT_SQL, funnel_event_rows
+from turn_log_spa import INSERT_TURN_SQL, create_partition_sql, turn_months, turn_rows
+from memory_codec_spa import apply_history_blob
+from schema_migrations_spa import ensure_schema_async
+
+logger = logging.getLogger(__name__)
+
+# psycopg2 %s placeholders -> asyncpg $1..$n
+to_asyncpg_sql = to_numbered_sql
+
+class AsyncEnhancedMemoryManager(EnhancedMemoryManager):
+    def __init__(self, database_url: str = None, max_interactions: int = 15, expiry_days: int = 90,
+                 max_save_retries: int = 3, min_pool_size: int = 2, max_pool_size: int = None,
+                 cache_ttl: float = None, notify_changes: bool = None, turn_log: bool = None,
+                 cleanup_batch_size: int = 5000, funnel_events: bool = None):
+        """
+        Initialize the async memory manager (call ``await connect()`` before use)
+
+        Args:
+            database_url: PostgreSQL connection URL
+            max_interactions: Maximum interactions to keep per user
+            expiry_days: Days after which user memory expires
+            max_save_retries: Merge-and-retry attempts when a save hits a version conflict
+            min_pool_size: Connections opened up front
+            max_pool_size: Upper bound on pooled connections (default MEMORY_DB_POOL_SIZE, 10)
+            cache_ttl, notify_changes, turn_log, cleanup_batch_size, funnel_events: as EnhancedMemoryManager
+        """
+        # Skip the sync constructor: it would open a blocking connection for DDL
+        self._configure(database_url=database_url, max_interactions=max_interactions, expiry_days=expiry_days,
+                        max_save_retries=max_save_retries, cache_ttl=cache_ttl, notify_changes=notify_changes,
+                        pool_size=max_pool_size, turn_log=turn_log, cleanup_batch_size=cleanup_batch_size,
+                        funnel_events=funnel_events)
+        # asyncpg always pools; 0 ("connect per call" for the sync manager) still needs one connection
+        self.max_pool_size = max(self.pool_size, 1)
+        self.min_pool_size = min(min_pool_size, self.max_pool_size)
+        self.pool = None
+
+        if not self.database_url:
+            raise ValueError("DATABASE_URL environment variable is required")
+
+        self._load_sql = to_asyncpg_sql(LOAD_MEMORY_SQL)
+        self._save_sql = to_asyncpg_sql(SAVE_MEMORY_SQL)
+        self._cleanup_sql = to_asyncpg_sql(CLEANUP_EXPIRED_SQL)
+        self._notify_sql = to_asyncpg_sql(NOTIFY_MEMORY_SQL)
+        self._turn_sql = to_asyncpg_sql(INSERT_TURN_SQL)
+        self._funnel_sql = to_asyncpg_sql(INSERT_FUNNEL_EVENT_SQL)
+
+    @staticmethod
+    async def _init_connection(conn) -> None:
+        """Decode JSONB into Python objects; parameters arrive already JSON-encoded"""
+        await conn.set_type_codec("jsonb", encoder=lambda value: value, decoder=json.loads,
+                                  schema="pg_catalog")
+
+    async def connect(self) -> None:
+        """Open the pool and verify the schema version"""
+        self.pool = await asyncpg.create_pool(
+            self.database_url,
+            min_size=self.min_pool_size,
+            max_size=self.max_pool_size,
+            init=self._init_connection
+        )
+        try:
+            async with self.pool.acquire() as conn:
+                version = await ensure_schema_async(conn)
+            logger.info(f"AsyncEnhancedMemoryManager initialized successfully (schema version {version})")
+        except Exception as e:
+            logger.error(f"Error initializing database: {e}")
+            raise
+
+    async def close(self) -> None:
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    async def load_memory(self, user_id: Optional[str] = None,
+                          fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """Load enhanced user memory (read cache first; fields loads only those columns as a LazyMemory)"""
+        if not user_id:
+            user_id = self._generate_user_id()
+            logger.info(f"Generated new user_id: {user_id}")
+
+        if cached := self._from_cache(user_id, fields):
+            return cached
+
+        default_memory = self._default_memory(user_id)
+        try:
+            async with self.pool.acquire() as conn:
+                if fields:
+                    fields = tuple(fields)
+                    row = await conn.fetchrow(to_asyncpg_sql(projected_load_sql(fields)),
+                                              datetime.now() - timedelta(days=self.expiry_days), user_id)
+                    return self._projected_memory(dict(row) if row else None, user_id, fields, default_memory)
+                memory = self._row_to_memory(await self._fetch_row_async(conn, user_id), default_memory)
+        except Exception as e:
+            logger.error(f"Error loading memory for {user_id}: {e}")
+            return default_memory
+
+        self._cache_loaded(memory)
+        return memory
+
+    async def _fetch_row_async(self, conn, user_id: str) -> Optional[Dict[str, Any]]:
+        record = await conn.fetchrow(self._load_sql, user_id)
+        return apply_history_blob(dict(record)) if record else None
+
+    async def save_memory(self, memory: Dict[str, Any]) -> bool:
+        """
+        Save enhanced user memory with the same compare-and-swap semantics as the sync manager
+
+        Returns:
+            True if the memory was persisted
+        """
+        user_id = memory.get("user_id")
+        if not user_id:
+            logger.error("Cannot save memory without user_id")
+            return False
+
+        try:
+            async with self.pool.acquire() as conn:
+                for attempt in range(self.max_save_retries + 1):
+                    async with conn.transaction():
+                        new_version = await self._compare_and_swap_async(conn, memory)
+                        if new_version is not None:
+                            await self._log_turns_async(conn, memory)
+                            await self._log_funnel_events_async(conn, memory)
+                            if self.notify_changes:
+                                await conn.execute(self._notify_sql, f"{user_id}:{new_version}")
+                    if new_version is not None:
+                        memory.pop("pending_turns", None)
+                        memory.pop("pending_events", None)
+                        memory["version"] = new_version
+                        logger.info(f"Saved memory for user {user_id} (version {new_version})")
+                        self._cache_saved(memory, True)
+                        return True
+
+                    # Someone else saved since we loaded - merge their changes and retry
+                    self._handle_conflict(memory, await self._fetch_row_async(conn, user_id), attempt)
+
+            self._give_up_save(user_id)
+
+        except Exception as e:
+            logger.error(f"Error saving memory for {user_id}: {e}")
+        self._cache_saved(memory, False)
+        return False
+
+    async def _compare_and_swap_async(self, conn, memory: Dict[str, Any]) -> Optional[int]:
+        """New row version, or None if another writer got there first (see _compare_and_swap)"""
+        if isinstance(memory, LazyMemory):
+            sql, params = self._partial_save(memory)
+            return await conn.fetchval(to_asyncpg_sql(sql), *params)
+        return await conn.fetchval(self._save_sql, *self._save_params(memory))
+
+    async def _log_turns_async(self, conn, memory: Dict[str, Any]) -> None:
+        """Append this save's new turns to conversation_turns (savepoint inside the save)"""
+        pending = memory.get("pending_turns")
+        if not pending:
+            return
+        user_id = memory["user_id"]
+        rows = turn_rows(user_id, memory.get("buyer_stage"), pending)
+        try:
+            async with conn.transaction():
+                await conn.executemany(self._turn_sql, rows)
+            return
+        except Exception as e:
+            first_error = e
+        # Usually the month's partition is missing because partition upkeep didn't run
+        try:
+            async with conn.transaction():
+                for month in turn_months(pending):
+                    await conn.execute(create_partition_sql(month))
+                await conn.executemany(self._turn_sql, rows)
+        except Exception as e:
+            self._turn_log_failed(user_id, len(pending), e)
+            return
+        self._turn_log_repaired(user_id, first_error)
+
+    async def _log_funnel_events_async(self, conn, memory: Dict[str, Any]) -> None:
+        """Queue this save's funnel events (savepoint inside the save)"""
+        pending = memory.get("pending_events")
+        if not pending:
+            return
+        try:
+            async with conn.transaction():
+                await conn.executemany(self._funnel_sql, funnel_event_rows(pending))
+        except Exception as e:
+            logger.warning(f"Could not record {len(pending)} funnel event(s) for {memory['user_id']}: {e}")
+
+    async def cleanup_expired_memories(self) -> int:
+        """Clean up expired user memory records in short batches (partition upkeep runs in the sync manager)"""
+        cleaned = 0
+        try:
+            cutoff_date = datetime.now() - timedelta(days=self.expiry_days)
+
+            async with self.pool.acquire() as conn:
+                while True:
+                    status = await conn.execute(self._cleanup_sql, cutoff_date, self.cleanup_batch_size)
+                    batch = int(status.split()[-1])
+                    cleaned += batch
+                    if batch < self.cleanup_batch_size:
+                        break
+
+            if cleaned > 0:
+                logger.info(f"Cleaned {cleaned} expired memory records")
+
+            return cleaned
+
+        except Exception as e:
+            logger.error(f"Error cleaning up expired memories: {e}")
+            return cleaned
+
+    async def get_user_stats(self, user_id: str) -> Dict[str, Any]:
+        """Get comprehensive statistics about a user"""
+        memory = await self.load_memory(user_id)
+
+        return {
+            "user_id": user_id,
+            "total_interactions": len(memory.get("interactions", [])),
+            "key_facts": memory.get("key_facts", {}),
+            "buyer_stage": memory.get("buyer_stage"),
+            "engagement_level": memory.get("engagement_level"),
+            "render_requested": memory.get("render_requested"),
+            "render_status": memory.get("render_status"),
+            "cta_attempts": len(memory.get("cta_attempts", [])),
+            "last_active": memory.get("last_updated"),
+            "context_summary": self.build_context_summary(memory)
+        }
@@ -0,0 +1,63 @@
+"""
+Memory Backend Benchmark
+========================
+Load/save latency for each storage backend on the same workload: every user
+gets --turns chat turns, each one a load_memory -> add_interaction -> save_memory
+cycle. Postgres is included when DATABASE_URL is set.
+
+Usage:  python benchmarks/bench_backends.py --users 500 --turns 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_backends_spa import InMemoryManager, SQLiteMemoryManager  # noqa: E402
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1e3 if samples else 0.0
+
+def run(manager, users: int, turns: int) -> dict:
+    loads, saves = [], []
+    for turn in range(turns):
+        for n in range(users):
+            user_id = f"bench_{n}"
+            started = time.perf_counter()
+            memory = manager.load_memory(user_id)
+            loaded = time.perf_counter()
+            manager.add_interaction(memory, f"Turn {turn}: how much is a 6 person spa?", "About $11,247 all-in.")
+            before_save = time.perf_counter()
+            manager.save_memory(memory)
+            saves.append(time.perf_counter() - before_save)
+            loads.append(loaded - started)
+    return {
+        "load_p50": percentile(loads, 0.50), "load_p99": percentile(loads, 0.99),
+        "save_p50": percentile(saves, 0.50), "save_p99": percentile(saves, 0.99),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=8)
+    args = parser.parse_args()
+
+    backends = {"memory": InMemoryManager()}
+    tmpdir = tempfile.mkdtemp(prefix="spa_bench_")
+    backends["sqlite"] = SQLiteMemoryManager(os.path.join(tmpdir, "bench.db"))
+    if os.getenv("DATABASE_URL"):
+        from enhanced_memory_manager_spa import EnhancedMemoryManager
+        backends["postgres"] = EnhancedMemoryManager()
+
+    print(f"users={args.users} turns={args.turns} (latency in ms)")
+    print(f"{'backend':<10}{'load p50':>10}{'load p99':>10}{'save p50':>10}{'save p99':>10}")
+    for name, manager in backends.items():
+        r = run(manager, args.users, args.turns)
+        print(f"{name:<10}{r['load_p50']:>10.3f}{r['load_p99']:>10.3f}{r['save_p50']:>10.3f}{r['save_p99']:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+History Codec Benchmark
+=======================
+Encode/decode time and stored size per user for the interactions/cta_attempts
+histories: today's two JSON arrays vs the compact msgpack blob
+(memory_codec_spa). With DATABASE_URL set, sizes are also measured as Postgres
+stores them (pg_column_size of the JSONB values vs the BYTEA value, after
+TOAST compression).
+
+Usage:  python benchmarks/bench_codec.py --users 2000 --turns 15
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import memory_codec_spa  # noqa: E402
+from memory_codec_spa import decode_history, encode_history  # noqa: E402
+
+USER_LINES = [
+    "How much is the Utopia series?", "Do you have anything for 6 people?",
+    "We have a small patio, maybe 7 feet", "What's the price on the Vacanza Marino?",
+    "Is delivery included?", "Can I come see it this weekend?", "Do you offer financing?",
+]
+BOT_LINES = [
+    "Great question! The Utopia series runs from about $11,000 to $17,000 all-inclusive, "
+    "which covers the spa, cover, lifter, steps and the electrical sub-panel.",
+    "For six people I'd look at the Paradise Makena or the Utopia Geneva - both seat six "
+    "comfortably with a lounger. Want me to compare them?",
+    "Delivery within 50 miles of Moore is free, and we handle the crane if access is tight.",
+]
+
+def make_user(turns: int) -> tuple:
+    now = datetime.now() - timedelta(days=random.randint(0, 30))
+    interactions, cta_attempts = [], []
+    for n in range(turns):
+        now += timedelta(seconds=random.randint(5, 120), microseconds=random.randint(0, 999999))
+        interactions.append({"timestamp": now.isoformat(), "user": random.choice(USER_LINES),
+                             "bot": random.choice(BOT_LINES)})
+        if n % 4 == 3:
+            cta_attempts.append({"type": random.choice(["showroom", "quote", "consultation"]),
+                                 "turn": n + 1, "timestamp": now.isoformat()})
+    return interactions, cta_attempts
+
+def timed(func, items) -> tuple:
+    started = time.perf_counter()
+    results = [func(*item) for item in items]
+    return results, (time.perf_counter() - started) / len(items) * 1e6
+
+def json_encode(interactions, cta_attempts):
+    return json.dumps(interactions), json.dumps(cta_attempts)
+
+def json_decode(interactions, cta_attempts):
+    return json.loads(interactions), json.loads(cta_attempts)
+
+def postgres_sizes(json_docs, blobs) -> tuple:
+    import psycopg2
+    with psycopg2.connect(os.environ["DATABASE_URL"]) as conn, conn.cursor() as cur:
+        sample = list(zip(json_docs, blobs))[:500]
+        json_total = blob_total = 0
+        for (interactions, cta_attempts), blob in sample:
+            cur.execute("SELECT pg_column_size(%s::jsonb) + pg_column_size(%s::jsonb), pg_column_size(%s::bytea)",
+                        (interactions, cta_attempts, psycopg2.Binary(blob)))
+            j, b = cur.fetchone()
+            json_total += j
+            blob_total += b
+    return json_total / len(sample), blob_total / len(sample)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=15)
+    args = parser.parse_args()
+
+    random.seed(7)
+    users = [make_user(args.turns) for _ in range(args.users)]
+
+    json_docs, json_enc = timed(json_encode, users)
+    _, json_dec = timed(json_decode, json_docs)
+    blobs, blob_enc = timed(encode_history, users)
+    decoded, blob_dec = timed(decode_history, [(b,) for b in blobs])
+    assert decoded == users, "compact codec did not round-trip"
+
+    json_bytes = sum(len(i) + len(c) for i, c in json_docs) / args.users
+    blob_bytes = sum(len(b) for b in blobs) / args.users
+    backend = "msgpack C extension" if memory_codec_spa.msgpack else "pure-Python msgpack subset"
+
+    print(f"{args.users} users x {args.turns} turns, compact codec via {backend}")
+    print(f"{'codec':<10}{'encode us':>11}{'decode us':>11}{'bytes/user':>12}")
+    print(f"{'json':<10}{json_enc:>11.1f}{json_dec:>11.1f}{json_bytes:>12.0f}")
+    print(f"{'compact':<10}{blob_enc:>11.1f}{blob_dec:>11.1f}{blob_bytes:>12.0f}  "
+          f"({(1 - blob_bytes / json_bytes) * 100:.0f}% smaller)")
+
+    if os.getenv("DATABASE_URL"):
+        pg_json, pg_blob = postgres_sizes(json_docs, blobs)
+        print(f"on disk (pg_column_size): jsonb {pg_json:.0f} B/user, bytea {pg_blob:.0f} B/user")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Memory Hot Path Benchmark
+=========================
+Per-turn database time (load_memory + save_memory) against Postgres, driven
+open-loop at a fixed request rate, for three EnhancedMemoryManager setups:
+
+- connect:  a fresh connection per call, statements parsed and planned each time
+- pooled:   connections reused from the per-process pool
+- prepared: pooled, with the load/save/notify statements PREPAREd per connection
+
+Usage:  DATABASE_URL=postgres://localhost/spa python benchmarks/bench_db_hot_path.py --rps 1000 --seconds 10
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enhanced_memory_manager_spa import EnhancedMemoryManager  # noqa: E402
+
+MODES = {
+    "connect": {"pool_size": 0, "prepare_statements": False},
+    "pooled": {"prepare_statements": False},
+    "prepared": {"prepare_statements": True},
+}
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1e3 if samples else 0.0
+
+def run(manager, rps: int, seconds: float, threads: int, users: int) -> dict:
+    """Schedule rps * seconds turns at fixed intervals; workers record DB time per turn"""
+    total = int(rps * seconds)
+    work = queue.Queue()
+    turn_times, late = [], []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            n, due = item
+            lag = time.perf_counter() - due
+            started = time.perf_counter()
+            memory = manager.load_memory(f"hotpath_{n % users}")
+            manager.add_interaction(memory, f"turn {n}", "ok")
+            manager.save_memory(memory)
+            elapsed = time.perf_counter() - started
+            with lock:
+                turn_times.append(elapsed)
+                late.append(lag)
+
+    pool = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+    for t in pool:
+        t.start()
+
+    started = time.perf_counter()
+    for n in range(total):
+        due = started + n / rps
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        work.put((n, due))
+    for _ in pool:
+        work.put(None)
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - started
+
+    return {
+        "rps": total / wall,
+        "p50": percentile(turn_times, 0.50),
+        "p95": percentile(turn_times, 0.95),
+        "p99": percentile(turn_times, 0.99),
+        "queue_p99": percentile(late, 0.99),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--modes", default="connect,pooled,prepared")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("DATABASE_URL is required")
+
+    print(f"{args.rps} turns/s for {args.seconds:.0f}s, {args.threads} threads, {args.users} users")
+    print(f"{'mode':<10}{'achieved/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queue p99':>11}")
+    baseline = None
+    for mode in args.modes.split(","):
+        manager = EnhancedMemoryManager(cache_ttl=0, notify_changes=True,
+                                        **dict(MODES[mode], pool_size=MODES[mode].get("pool_size", args.threads)))
+        r = run(manager, args.rps, args.seconds, args.threads, args.users)
+        manager.close()
+        baseline = baseline or r
+        change = f"  ({(1 - r['p50'] / baseline['p50']) * 100:.0f}% lower p50)" if r is not baseline else ""
+        print(f"{mode:<10}{r['rps']:>11.0f}{r['p50']:>9.2f}{r['p95']:>9.2f}{r['p99']:>9.2f}{r['queue_p99']:>11.2f}{change}")
+
+if __name__ == "__main__":
+    main()
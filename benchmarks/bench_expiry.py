@@ -0,0 +1,130 @@
+"""
+Expiry Benchmark
+================
+Time to expire old rows from a large turn log three ways, each on a fresh
+copy of the same data in a scratch schema:
+
+  delete     one DELETE ... WHERE turn_at < cutoff on a flat table
+  batched    the user_memories path: DELETE ... LIMIT n FOR UPDATE SKIP LOCKED,
+             committed per batch
+  partition  the conversation_turns path: monthly range partitions, expired
+             ones detached and dropped (turn_log_spa)
+
+Rows are spread evenly over the last 12 months; the cutoff expires the oldest
+6. Needs DATABASE_URL; the scratch schema is dropped afterwards.
+
+Usage:  python benchmarks/bench_expiry.py --rows 10000000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from turn_log_spa import add_months, drop_expired_turn_partitions, month_start, partition_name  # noqa: E402
+
+SCHEMA = "bench_expiry"
+COLUMNS = "user_id VARCHAR(255) NOT NULL, turn_at TIMESTAMP NOT NULL, user_message TEXT, bot_response TEXT"
+FILL_SQL = """
+    INSERT INTO {table} (user_id, turn_at, user_message, bot_response)
+    SELECT 'user_' || (n %% 100000), %s::timestamp + (n * %s) * INTERVAL '1 second',
+           'How much is the Utopia series?', 'The Utopia series runs from about $11,000 to $17,000.'
+    FROM generate_series(0, %s - 1) AS n
+"""
+
+def fill(cur, table: str, start: datetime, rows: int) -> None:
+    span = (datetime.now() - start).total_seconds()
+    cur.execute(FILL_SQL.format(table=table), (start, span / rows, rows))
+    cur.execute(f"CREATE INDEX ON {table} (turn_at)")
+    cur.execute(f"ANALYZE {table}")
+
+def bench_delete(conn, start: datetime, cutoff: datetime, rows: int) -> float:
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TABLE turns_flat ({COLUMNS})")
+        fill(cur, "turns_flat", start, rows)
+        conn.commit()
+
+        started = time.perf_counter()
+        cur.execute("DELETE FROM turns_flat WHERE turn_at < %s", (cutoff,))
+        conn.commit()
+        return time.perf_counter() - started
+
+def bench_batched(conn, start: datetime, cutoff: datetime, rows: int, batch_size: int) -> float:
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TABLE turns_batched (id BIGSERIAL PRIMARY KEY, {COLUMNS})")
+        fill(cur, "turns_batched", start, rows)
+        conn.commit()
+
+        started = time.perf_counter()
+        while True:
+            cur.execute("""
+                DELETE FROM turns_batched WHERE id IN (
+                    SELECT id FROM turns_batched WHERE turn_at < %s LIMIT %s FOR UPDATE SKIP LOCKED
+                )
+            """, (cutoff, batch_size))
+            deleted = cur.rowcount
+            conn.commit()
+            if deleted < batch_size:
+                break
+        return time.perf_counter() - started
+
+def bench_partition(conn, start: datetime, cutoff: datetime, rows: int) -> float:
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TABLE turns_part ({COLUMNS}) PARTITION BY RANGE (turn_at)")
+        month = month_start(start)
+        while month <= datetime.now().date():
+            cur.execute(f"CREATE TABLE {partition_name(month, 'turns_part')} PARTITION OF turns_part "
+                        f"FOR VALUES FROM (%s) TO (%s)", (month, add_months(month, 1)))
+            month = add_months(month, 1)
+        fill(cur, "turns_part", start, rows)
+        conn.commit()
+
+        started = time.perf_counter()
+        drop_expired_turn_partitions(cur, cutoff, table="turns_part")
+        conn.commit()
+        return time.perf_counter() - started
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("DATABASE_URL environment variable is required")
+
+    import psycopg2
+
+    now = datetime.now()
+    start = datetime.combine(add_months(month_start(now), -11), datetime.min.time())
+    cutoff = datetime.combine(add_months(month_start(now), -5), datetime.min.time())
+
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {SCHEMA}")
+            cur.execute(f"SET search_path TO {SCHEMA}")
+        conn.commit()
+
+        print(f"{args.rows:,} rows over 12 months, expiring everything before {cutoff:%Y-%m-%d}")
+        results = [
+            ("delete", bench_delete(conn, start, cutoff, args.rows)),
+            (f"batched ({args.batch_size})", bench_batched(conn, start, cutoff, args.rows, args.batch_size)),
+            ("partition", bench_partition(conn, start, cutoff, args.rows)),
+        ]
+        print(f"{'strategy':<20}{'seconds':>10}")
+        for name, seconds in results:
+            print(f"{name:<20}{seconds:>10.3f}")
+    finally:
+        with conn.cursor() as cur:
+            conn.rollback()
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Invalidation Bus Lag Benchmark
+==============================
+Starts several listener processes (one InvalidationBus each, like gunicorn
+workers) and a writer that saves memory documents through
+EnhancedMemoryManager. Each save NOTIFYs user_memories inside its transaction;
+the listeners timestamp every event and the writer reports commit-to-delivery
+lag (p50/p95/p99) and whether a cached copy in a listener was evicted.
+
+Usage:  DATABASE_URL=postgres://... python benchmarks/bench_invalidation.py --listeners 4 --saves 500
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enhanced_memory_manager_spa import EnhancedMemoryManager  # noqa: E402
+from invalidation_bus_spa import InvalidationBus, MEMORY_CHANNEL, parse_memory_event  # noqa: E402
+
+def listener(ready, results, expected: int) -> None:
+    """One worker: cache every benchmark visitor, evict on events, report receive times"""
+    manager = EnhancedMemoryManager(cache_ttl=3600)
+    bus = InvalidationBus(poll_timeout=0.5)
+    received = {}
+
+    def on_event(payload: str) -> None:
+        user_id, version = parse_memory_event(payload)
+        if user_id.startswith("lagbench_"):
+            received[f"{user_id}:{version}"] = time.time()
+
+    bus.subscribe(MEMORY_CHANNEL, on_event)
+    manager.attach_invalidation_bus(bus)
+    bus.start()
+    time.sleep(1)  # let LISTEN register before the writer starts
+    manager.load_memory("lagbench_0")
+    ready.release()
+
+    deadline = time.time() + 60
+    while len(received) < expected and time.time() < deadline:
+        time.sleep(0.05)
+    stale = manager.cache.get("lagbench_0") is not None
+    results.put((received, stale))
+    bus.stop()
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listeners", type=int, default=4)
+    parser.add_argument("--saves", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    writer = EnhancedMemoryManager(cache_ttl=0)
+    # Start from a clean slate so versions are predictable
+    for n in range(args.users):
+        memory = writer.load_memory(f"lagbench_{n}")
+        writer.save_memory(memory)
+
+    ready = multiprocessing.Semaphore(0)
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=listener, args=(ready, results, args.saves))
+             for _ in range(args.listeners)]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        ready.acquire()
+
+    committed = {}
+    started = time.perf_counter()
+    for n in range(args.saves):
+        memory = writer.load_memory(f"lagbench_{n % args.users}")
+        writer.add_interaction(memory, f"turn {n}", "ok")
+        writer.save_memory(memory)
+        committed[f"{memory['user_id']}:{memory['version']}"] = time.time()
+    elapsed = time.perf_counter() - started
+
+    lags, missing, stale = [], 0, 0
+    for _ in procs:
+        received, was_stale = results.get()
+        stale += was_stale
+        for event, sent_at in committed.items():
+            if event in received:
+                lags.append((received[event] - sent_at) * 1000)
+            else:
+                missing += 1
+    for p in procs:
+        p.join()
+
+    print(f"{args.saves} saves in {elapsed:.2f}s ({args.saves / elapsed:.0f}/s), {args.listeners} listeners")
+    if lags:
+        print(f"lag ms  p50={statistics.median(lags):.2f}  p95={percentile(lags, 0.95):.2f}  "
+              f"p99={percentile(lags, 0.99):.2f}  max={max(lags):.2f}")
+    print(f"events missed: {missing}   listeners still holding a stale cached copy: {stale}")
+
+if __name__ == "__main__":
+    main()
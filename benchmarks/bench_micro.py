@@ -0,0 +1,201 @@
+"""
+Hot-Path Microbenchmarks
+========================
+Per-call time of the pure-Python work a chat turn does besides I/O:
+
+  evaluate            ConversationFlowEngine.evaluate
+  intent              ConversationFlowEngine.analyze_conversation_intent
+  recommendation      ConversationFlowEngine.get_model_recommendation
+  pricing_quote       ConversationFlowEngine.get_pricing_quote
+  search_knowledge    SpaSystemManager.search_knowledge
+  extract_key_facts   chat_pipeline_spa.extract_key_facts (what spa_bot4 imports)
+  add_interaction     EnhancedMemoryManager.add_interaction (facts, stage, engagement)
+  context_summary     EnhancedMemoryManager.build_context_summary
+  memory_json         json.dumps + json.loads of a 15-turn memory document
+  memory_json_load    json.loads alone (what a JSONB/SQLite load decodes)
+
+Each case cycles through a fixed set of realistic inputs; timeit's autorange
+picks the loop count and the median of --repeats runs is reported in
+microseconds per call, with the spread ((max - min) / median) alongside.
+
+--save writes the results as a JSON baseline; --compare checks against one,
+reusing the baseline's loop counts so both sides time the same work. A case
+slower by more than --threshold (default 50%) is re-measured --confirm times
+and only fails the run (exit 1) if every re-run is still over. Baselines are
+machine-specific - compare on the host that saved them.
+
+Usage:  python benchmarks/bench_micro.py --save micro-baseline.json
+        python benchmarks/bench_micro.py --compare micro-baseline.json --threshold 0.5
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_pipeline_spa import extract_key_facts  # noqa: E402
+from conversation_flow_engine_spa import ConversationFlowEngine  # noqa: E402
+from spa_system_manager import SpaSystemManager  # noqa: E402
+from stage_replay_spa import ReplayMemoryManager  # noqa: E402
+
+MESSAGES = [
+    "Hi, just looking around",
+    "How much is the Utopia series?",
+    "We need something for 6 people, budget around 15k",
+    "Do you have a salt system option? My wife has sensitive skin",
+    "What electrical do I need for the Makena?",
+    "Can we schedule a wet test this weekend?",
+    "What's the difference between Vacanza and Paradise?",
+    "Mostly for relaxing after work and some therapy for my back",
+]
+MODELS = ["makena", "cantabria", "marino", "geneva", "aventine", "unknown"]
+NEEDS = [{"seats": 2, "budget_max": 10000}, {"seats": 6, "budget_max": 15000}, {"seats": 7, "budget_max": 99999}]
+
+def sample_memory(turns: int = 15) -> Dict[str, Any]:
+    """A mid-conversation memory document shaped like a real one"""
+    start = datetime(2026, 1, 1, 12, 0)
+    return {
+        "user_id": "bench-user",
+        "interactions": [
+            {"timestamp": (start + timedelta(minutes=n)).isoformat(),
+             "user": MESSAGES[n % len(MESSAGES)],
+             "bot": "The Paradise Makena seats six with a lounger and runs about $13,500 all-inclusive."}
+            for n in range(turns)
+        ],
+        "key_facts": {"name": "Dana", "preferred_seats": 6, "budget_range": "$15,000", "reason": "therapy",
+                      "features": ["jets", "lighting"], "focus": "relaxation"},
+        "conversation_summary": "",
+        "preferences": {},
+        "buyer_stage": "considering",
+        "engagement_level": 3,
+        "render_requested": False,
+        "render_status": None,
+        "render_details": {},
+        "contact_info": {},
+        "cta_attempts": [{"type": "showroom", "turn": 6, "timestamp": (start + timedelta(minutes=6)).isoformat()}],
+        "last_cta_attempt": None
+    }
+
+def cycling(func: Callable, inputs: List[Any]) -> Callable[[], Any]:
+    values = itertools.cycle(inputs)
+    return lambda: func(next(values))
+
+def build_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    engine = ConversationFlowEngine()
+    system = SpaSystemManager()
+    manager = ReplayMemoryManager()
+    memory = sample_memory()
+    growing = sample_memory()
+    facts_memory = {"key_facts": {}}
+    encoded = json.dumps(memory)
+
+    return [
+        ("evaluate", cycling(lambda m: engine.evaluate(memory, m), MESSAGES)),
+        ("intent", cycling(engine.analyze_conversation_intent, MESSAGES)),
+        ("recommendation", cycling(engine.get_model_recommendation, NEEDS)),
+        ("pricing_quote", cycling(engine.get_pricing_quote, MODELS)),
+        ("search_knowledge", cycling(system.search_knowledge, MESSAGES)),
+        ("extract_key_facts", cycling(lambda m: extract_key_facts(m, facts_memory), MESSAGES)),
+        # add_interaction prunes to max_interactions, so the document stays the same size
+        ("add_interaction", cycling(lambda m: manager.add_interaction(growing, m, "Happy to help!"), MESSAGES)),
+        ("context_summary", lambda: manager.build_context_summary(memory)),
+        ("memory_json", lambda: json.loads(json.dumps(memory))),
+        ("memory_json_load", lambda: json.loads(encoded)),
+    ]
+
+def run_cases(cases: List[Tuple[str, Callable[[], Any]]], repeats: int,
+              loops: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, Any]]:
+    """Median and spread per case; loops pins a case's loop count (e.g. from a baseline)"""
+    results = {}
+    for name, func in cases:
+        timer = timeit.Timer(func)
+        count = (loops or {}).get(name) or timer.autorange()[0]
+        times = [t / count * 1e6 for t in timer.repeat(repeats, count)]
+        median = statistics.median(times)
+        results[name] = {"us_per_call": round(median, 3), "spread": round((max(times) - min(times)) / median, 3),
+                         "loops": count}
+    return results
+
+def change_from(result: Dict[str, Any], before: Dict[str, Any]) -> float:
+    return result["us_per_call"] / before["us_per_call"] - 1
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print current vs baseline per case; returns the cases over threshold"""
+    flagged = []
+    print(f"{'case':<20}{'baseline us':>13}{'now us':>11}{'spread':>9}{'change':>9}")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before:
+            print(f"{name:<20}{'-':>13}{result['us_per_call']:>11.3f}{result['spread']:>9.1%}{'new':>9}")
+            continue
+        change = change_from(result, before)
+        flag = "  SLOWER" if change > threshold else ""
+        print(f"{name:<20}{before['us_per_call']:>13.3f}{result['us_per_call']:>11.3f}"
+              f"{result['spread']:>9.1%}{change:>+9.1%}{flag}")
+        if change > threshold:
+            flagged.append(name)
+    return flagged
+
+def confirm(cases: List[Tuple[str, Callable[[], Any]]], flagged: List[str], baseline: Dict[str, Any],
+            threshold: float, repeats: int, runs: int, loops: Dict[str, int]) -> List[str]:
+    """Re-measure flagged cases; only those over threshold on every re-run regressed"""
+    regressed = list(flagged)
+    for run in range(runs):
+        if not regressed:
+            break
+        rerun = run_cases([case for case in cases if case[0] in regressed], repeats, loops)
+        regressed = [name for name in regressed if change_from(rerun[name], baseline["results"][name]) > threshold]
+        print(f"re-run {run + 1}/{runs}: still slower: {', '.join(regressed) or 'none'}")
+    return regressed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--save", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check against")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown (0.5 = 50%%)")
+    parser.add_argument("--confirm", type=int, default=2, help="re-runs a slower case must fail too")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # the engine and managers log every call
+    cases = [(name, func) for name, func in build_cases() if not args.filter or args.filter in name]
+    environment = {"python": platform.python_version(), "machine": platform.machine(), "node": platform.node()}
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != environment:
+            print(f"warning: baseline from {baseline.get('environment')}, running on {environment}")
+        loops = {name: result["loops"] for name, result in baseline["results"].items()}
+        results = run_cases(cases, args.repeats, loops)
+        flagged = compare(results, baseline, args.threshold)
+        regressed = confirm(cases, flagged, baseline, args.threshold, args.repeats, args.confirm, loops)
+    else:
+        results = run_cases(cases, args.repeats)
+        regressed = []
+        print(f"{'case':<20}{'us/call':>11}{'spread':>9}{'loops':>10}")
+        for name, result in results.items():
+            print(f"{name:<20}{result['us_per_call']:>11.3f}{result['spread']:>9.1%}{result['loops']:>10}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"created": datetime.now().isoformat(), "environment": environment, "results": results},
+                      f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save}")
+
+    if regressed:
+        sys.exit(f"{len(regressed)} case(s) slower than baseline by more than {args.threshold:.0%}: "
+                 + ", ".join(regressed))
+
+if __name__ == "__main__":
+    main()
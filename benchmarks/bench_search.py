@@ -0,0 +1,134 @@
+"""
+Conversation Search Benchmark
+=============================
+Query latency of the admin full-text search (turn_log_spa.SEARCH_TURNS_SQL)
+over a synthetic turn corpus in a scratch schema: a monthly-partitioned copy
+of conversation_turns with the same generated tsvector column and GIN index
+as migration 0007, filled with generate_series from a spa-sales vocabulary.
+
+Reports p50/p95/max per query over --repeats runs (after one warm-up), for
+rare terms, common terms and phrases. Needs DATABASE_URL; the scratch schema
+is dropped afterwards.
+
+Usage:  python benchmarks/bench_search.py --turns 1000000 --repeats 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from turn_log_spa import add_months, create_turn_partition, month_start, search_turns_query  # noqa: E402
+
+SCHEMA = "bench_search"
+TABLE = "turns_search"
+
+USER_PHRASES = [
+    "How much is the Utopia series", "Do you have a salt system option", "What about Cantabria delivery",
+    "Can six people fit", "Is financing available", "We have a small patio", "Tell me about the Vacanza Marino",
+    "Do you install the electrical", "What is the warranty", "Can I visit the showroom this weekend",
+]
+BOT_PHRASES = [
+    "The Utopia series runs from about $11,000 to $17,000 all-inclusive",
+    "Our salt system keeps the water soft and cuts chemical handling",
+    "Delivery within 50 miles of Moore is free and we handle the crane",
+    "The Paradise Makena seats six comfortably with a lounger",
+    "We offer financing through our lending partner with approved credit",
+    "Every spa includes a cover, lifter, steps and the electrical sub-panel",
+]
+
+QUERIES = [
+    ("rare term", "cantabria"),
+    ("common term", "spa"),
+    ("two terms", "salt system"),
+    ("phrase", '"cantabria delivery"'),
+    ("or", "financing or warranty"),
+]
+
+def build_corpus(cur, turns: int) -> None:
+    cur.execute(f"""
+        CREATE TABLE {TABLE} (
+            user_id VARCHAR(50) NOT NULL,
+            turn_at TIMESTAMP NOT NULL,
+            user_message TEXT NOT NULL DEFAULT '',
+            bot_response TEXT NOT NULL DEFAULT '',
+            buyer_stage VARCHAR(50),
+            search tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(user_message, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(bot_response, '')), 'B')
+            ) STORED
+        ) PARTITION BY RANGE (turn_at)
+    """)
+    first = add_months(month_start(datetime.now()), -11)
+    for offset in range(13):
+        create_turn_partition(cur, add_months(first, offset), TABLE)
+
+    # Mostly filler; the rarer phrases land on a small slice of turns
+    cur.execute(f"""
+        INSERT INTO {TABLE} (user_id, turn_at, user_message, bot_response, buyer_stage)
+        SELECT 'user_' || (n %% 200000),
+               %s::timestamp + (n * %s) * INTERVAL '1 second',
+               (%s::text[])[1 + (n * 7919) %% %s] || CASE WHEN n %% 97 = 0 THEN ' near Cantabria' ELSE '' END,
+               (%s::text[])[1 + (n * 104729) %% %s],
+               (ARRAY['browsing', 'researching', 'comparing', 'ready'])[1 + n %% 4]
+        FROM generate_series(0, %s - 1) AS n
+    """, (first, (datetime.now() - datetime.combine(first, datetime.min.time())).total_seconds() / turns,
+          USER_PHRASES, len(USER_PHRASES), BOT_PHRASES, len(BOT_PHRASES), turns))
+    cur.execute(f"CREATE INDEX ON {TABLE} USING GIN (search)")
+    cur.execute(f"CREATE INDEX ON {TABLE} (user_id, turn_at)")
+    cur.execute(f"ANALYZE {TABLE}")
+
+def time_query(cur, query: str, limit: int, offset: int, repeats: int) -> tuple:
+    sql, params = search_turns_query(query, limit, offset, table=TABLE)
+    cur.execute(sql, params)
+    hits = len(cur.fetchall())
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return hits, statistics.median(samples), samples[int(len(samples) * 0.95) - 1], samples[-1]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("DATABASE_URL environment variable is required")
+
+    import psycopg2
+
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {SCHEMA}")
+            cur.execute(f"SET search_path TO {SCHEMA}")
+
+            started = time.perf_counter()
+            build_corpus(cur, args.turns)
+            print(f"Built {args.turns:,}-turn corpus with GIN index in {time.perf_counter() - started:.1f}s")
+
+            print(f"{'query':<14}{'text':<28}{'hits':>6}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+            for label, query in QUERIES:
+                for offset in (0, 100):
+                    hits, p50, p95, worst = time_query(cur, query, args.limit, offset, args.repeats)
+                    name = label if offset == 0 else f"  offset {offset}"
+                    print(f"{name:<14}{query:<28}{hits:>6}{p50:>9.1f}{p95:>9.1f}{worst:>9.1f}")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
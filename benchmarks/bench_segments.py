@@ -0,0 +1,122 @@
+"""
+Lead Segmentation Benchmark
+===========================
+Latency and query plan of representative sales segments (lead_segments_spa)
+on a synthetic user_memories table in a scratch schema, first with only the
+baseline indexes (last_updated, buyer_stage) and then with migrations 0008
+(stage + seats + budget expression index) and 0009 (GIN jsonb_path_ops on
+key_facts).
+
+Each segment is run through EXPLAIN (ANALYZE, FORMAT JSON); the script prints
+the execution time, the scan nodes and the indexes the plan used, and exits 1
+if a segment still needs a sequential scan after the indexes exist.
+
+Usage:  python benchmarks/bench_segments.py --users 1000000
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lead_segments_spa import LeadSegment, leads_query  # noqa: E402
+from schema_migrations_spa import load_migrations  # noqa: E402
+
+SCHEMA = "bench_segments"
+
+SEGMENTS = [
+    ("ready, 7+ seats, under $15k", LeadSegment(stages=["ready"], min_seats=7, max_budget=15000)),
+    ("considering, $20k+", LeadSegment(stages=["considering"], min_budget=20000)),
+    ("family reason", LeadSegment(facts={"reason": "family"})),
+    ("wants jets + lights", LeadSegment(facts={"features": ["jets", "lights"]})),
+    ("ready, therapy, 4-6 seats", LeadSegment(stages=["ready"], min_seats=4, max_seats=6,
+                                              facts={"reason": "therapy"})),
+]
+
+FILL_SQL = """
+    INSERT INTO user_memories (user_id, last_updated, buyer_stage, engagement_level, key_facts)
+    SELECT 'user_' || n,
+           now() - (n %% 7776000) * INTERVAL '1 second',
+           (ARRAY['browsing', 'browsing', 'browsing', 'interested', 'considering', 'ready'])[1 + n %% 6],
+           1 + n %% 5,
+           jsonb_strip_nulls(jsonb_build_object(
+               'preferred_seats', CASE WHEN n %% 3 = 0 THEN 2 + (n * 7) %% 7 END,
+               'budget_range', CASE WHEN n %% 4 = 0 THEN '$' || to_char(5000 + (n * 13) %% 25 * 1000, 'FM99,999') END,
+               'reason', (ARRAY['relaxation', 'therapy', 'family', 'entertaining', NULL])[1 + (n * 11) %% 5],
+               'features', CASE WHEN n %% 5 = 0 THEN '["jets", "lights"]'::jsonb
+                                WHEN n %% 5 = 1 THEN '["jets"]'::jsonb END
+           ))
+    FROM generate_series(1, %s) AS n
+"""
+
+def plan_summary(plan: dict) -> tuple:
+    """(scan node types, index names) anywhere in an EXPLAIN JSON plan"""
+    nodes, indexes = [], []
+
+    def walk(node: dict) -> None:
+        if "Scan" in node["Node Type"]:
+            nodes.append(node["Node Type"])
+        if node.get("Index Name"):
+            indexes.append(node["Index Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan["Plan"])
+    return nodes, indexes
+
+def run_segments(cur, label: str) -> bool:
+    """Print one line per segment; True if any segment fell back to a Seq Scan"""
+    print(f"\n{label}")
+    print(f"{'segment':<30}{'rows':>6}{'ms':>9}  plan")
+    seq_scan = False
+    for name, segment in SEGMENTS:
+        sql, params = leads_query(segment, 100)
+        cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0][0]
+        nodes, indexes = plan_summary(plan)
+        seq_scan |= "Seq Scan" in nodes
+        rows = plan["Plan"]["Actual Rows"]
+        print(f"{name:<30}{rows:>6}{plan['Execution Time']:>9.1f}  {', '.join(nodes)}"
+              f"{' via ' + ', '.join(sorted(set(indexes))) if indexes else ''}")
+    return seq_scan
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("DATABASE_URL environment variable is required")
+
+    import psycopg2
+
+    migrations = {m.version: m for m in load_migrations()}
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {SCHEMA}")
+            cur.execute(f"SET search_path TO {SCHEMA}")
+            cur.execute(migrations[1].sql)
+            cur.execute(FILL_SQL, (args.users,))
+            cur.execute("ANALYZE user_memories")
+            print(f"{args.users:,} synthetic visitors")
+
+            run_segments(cur, "baseline indexes (last_updated, buyer_stage)")
+
+            for version in (8, 9):
+                cur.execute(migrations[version].sql)
+            cur.execute("ANALYZE user_memories")
+            seq_scan = run_segments(cur, "with 0008 lead-fact expression index + 0009 GIN jsonb_path_ops")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+    if seq_scan:
+        sys.exit("A segment still used a sequential scan with the indexes in place")
+
+if __name__ == "__main__":
+    main()
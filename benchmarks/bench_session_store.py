@@ -0,0 +1,79 @@
+"""
+Shared Session Store Benchmark
+==============================
+Compares load/save latency of the per-process dict (InMemoryManager) with the
+host-shared SharedSessionStore, then runs several worker processes against the
+same visitors to check that no turn is lost across workers.
+
+Usage:  python benchmarks/bench_session_store.py --users 2000 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_backends_spa import InMemoryManager, SharedSessionStore  # noqa: E402
+
+def time_lookups(store, users: int) -> dict:
+    for n in range(users):
+        memory = store.load_memory(f"v{n}")
+        store.add_interaction(memory, "hello", "hi there")
+        store.save_memory(memory)
+
+    started = time.perf_counter()
+    for n in range(users):
+        store.load_memory(f"v{n}")
+    load_us = (time.perf_counter() - started) / users * 1e6
+
+    started = time.perf_counter()
+    for n in range(users):
+        memory = store.load_memory(f"v{n}")
+        store.save_memory(memory)
+    cycle_us = (time.perf_counter() - started) / users * 1e6
+    return {"load_us": load_us, "load_save_us": cycle_us}
+
+def worker(path: str, worker_id: int, users: int, turns: int) -> None:
+    store = SharedSessionStore(path)
+    for turn in range(turns):
+        for n in range(users):
+            memory = store.load_memory(f"shared{n}")
+            store.add_interaction(memory, f"w{worker_id} t{turn}", "ok")
+            store.save_memory(memory)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=2)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="spa_sessions_"), "sessions.db")
+    print(f"{'store':<10}{'load us':>10}{'load+save us':>14}")
+    for name, store in (("dict", InMemoryManager()), ("shared", SharedSessionStore(path))):
+        r = time_lookups(store, args.users)
+        print(f"{name:<10}{r['load_us']:>10.1f}{r['load_save_us']:>14.1f}")
+
+    # Cross-process: every worker adds turns for the same visitors
+    visitors = 50
+    started = time.perf_counter()
+    procs = [multiprocessing.Process(target=worker, args=(path, w, visitors, args.turns)) for w in range(args.workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    store = SharedSessionStore(path)
+    expected = min(args.workers * args.turns, store.max_interactions)
+    kept = [len(store.load_memory(f"shared{n}")["interactions"]) for n in range(visitors)]
+    saves = args.workers * args.turns * visitors
+    print(f"{args.workers} workers, {saves} saves in {elapsed:.2f}s ({saves / elapsed:.0f}/s); "
+          f"turns kept per visitor: min={min(kept)} expected={expected}")
+
+if __name__ == "__main__":
+    main()
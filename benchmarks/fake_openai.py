@@ -0,0 +1,89 @@
+"""
+Fake OpenAI Server
+==================
+Minimal stand-in for the Chat Completions API so load tests never hit the real
+service. Point the bot at it with OPENAI_API_BASE=http://127.0.0.1:8900/v1.
+
+Latency is --latency-ms, either fixed or drawn per request (--latency-dist
+uniform: +/- --latency-spread; lognormal: median latency-ms with sigma
+--latency-spread, for the long tail real APIs have). --error-rate of the
+requests fail with one of --error-statuses (the 429/5xx the client retries or
+surfaces), after the same latency.
+
+Usage:  python benchmarks/fake_openai.py --port 8900 --latency-ms 1500
+        python benchmarks/fake_openai.py --latency-dist lognormal --latency-spread 0.5 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from aiohttp import web
+
+def latency_sampler(latency_ms: float, dist: str = "fixed", spread: float = 0.0, seed: int = None):
+    """Seconds to wait for the next reply"""
+    rng = random.Random(seed)
+    if dist == "uniform":
+        return lambda: max(0.0, rng.uniform(latency_ms - spread, latency_ms + spread)) / 1000
+    if dist == "lognormal":
+        import math
+
+        mu = math.log(max(latency_ms, 1e-3))
+        return lambda: rng.lognormvariate(mu, spread) / 1000
+    return lambda: latency_ms / 1000
+
+def build_app(latency_ms: float, dist: str = "fixed", spread: float = 0.0, error_rate: float = 0.0,
+              error_statuses: List[int] = (500,), seed: int = None) -> web.Application:
+    """Create the fake API app with the given reply latency and error mix"""
+    next_latency = latency_sampler(latency_ms, dist, spread, seed)
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0}
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(next_latency())
+        if error_rate and rng.random() < error_rate:
+            stats["errors"] += 1
+            status = rng.choice(error_statuses)
+            return web.json_response({"error": {"message": f"fake upstream error {status}", "type": "server_error"}},
+                                     status=status)
+
+        last_user = next((m["content"] for m in reversed(body.get("messages", [])) if m["role"] == "user"), "")
+        return web.json_response({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"Thanks for asking about {last_user[:40]}!"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=1500)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--latency-spread", type=float, default=0.0,
+                        help="uniform: +/- ms; lognormal: sigma (0.5 gives p99 ~3x the median)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-statuses", default="500", help="comma-separated statuses, e.g. 429,500,503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    statuses = [int(status) for status in args.error_statuses.split(",")]
+    web.run_app(build_app(args.latency_ms, args.latency_dist, args.latency_spread, args.error_rate, statuses,
+                          args.seed), host="127.0.0.1", port=args.port, print=None)
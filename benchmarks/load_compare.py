@@ -0,0 +1,125 @@
+"""
+Sync vs Async Load Comparison
+=============================
+Starts the fake OpenAI server, then runs the same /chat load against:
+  - the current setup: gunicorn sync workers serving spa_bot4:app
+  - the async mode:    uvicorn serving spa_bot_async:app
+and prints throughput and latency percentiles for each.
+
+Usage:  python benchmarks/load_compare.py --concurrency 500 --duration 30
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MESSAGES = [
+    "Hi, just looking at hot tubs",
+    "How much is the Palatino?",
+    "We need something for 6 people",
+    "Is maintenance a lot of work?",
+]
+
+def start(cmd, env):
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            try:
+                async with http.get(url) as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up")
+
+async def virtual_user(base_url: str, stop_at: float, latencies: list, errors: list) -> None:
+    """One visitor with its own cookie jar sending turns back to back"""
+    jar = aiohttp.CookieJar(unsafe=True)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(cookie_jar=jar, timeout=timeout) as http:
+        turn = 0
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            try:
+                async with http.post(f"{base_url}/chat", json={"message": MESSAGES[turn % len(MESSAGES)]}) as resp:
+                    await resp.read()
+                    if resp.status == 200:
+                        latencies.append(time.monotonic() - started)
+                    else:
+                        errors.append(resp.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                errors.append(type(e).__name__)
+            turn += 1
+
+async def drive(base_url: str, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], []
+    stop_at = time.monotonic() + duration
+    await asyncio.gather(*(virtual_user(base_url, stop_at, latencies, errors) for _ in range(concurrency)))
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / duration,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=1500)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers (sync) / uvicorn workers (async)")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per sync worker")
+    args = parser.parse_args()
+
+    env = dict(os.environ, OPENAI_API_BASE="http://127.0.0.1:8900/v1", OPENAI_API_KEY="sk-fake")
+    fake = start([sys.executable, "benchmarks/fake_openai.py", "--port", "8900",
+                  "--latency-ms", str(args.llm_latency_ms)], env)
+    targets = {
+        "gunicorn-sync": ["gunicorn", "-w", str(args.workers), "--threads", str(args.threads),
+                          "-b", "127.0.0.1:8901", "spa_bot4:app"],
+        "uvicorn-async": ["uvicorn", "--workers", str(args.workers), "--port", "8902",
+                          "--log-level", "warning", "spa_bot_async:app"],
+    }
+    ports = {"gunicorn-sync": 8901, "uvicorn-async": 8902}
+
+    results = {}
+    try:
+        for name, cmd in targets.items():
+            server = start(cmd, env)
+            try:
+                base_url = f"http://127.0.0.1:{ports[name]}"
+                asyncio.run(wait_ready(f"{base_url}/ping"))
+                results[name] = asyncio.run(drive(base_url, args.concurrency, args.duration))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        fake.terminate()
+
+    print(f"concurrency={args.concurrency} duration={args.duration}s llm_latency={args.llm_latency_ms}ms")
+    print(f"{'mode':<16}{'req':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['requests']:>8}{r['errors']:>6}{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+End-to-End Load Test
+====================
+Sizes a production deploy: runs spa_bot4:app under gunicorn against the
+SQLite backend (a scratch file) or a local Postgres (DATABASE_URL), with the
+LLM client pointed at benchmarks/fake_openai.py, and drives it with virtual
+users.
+
+Each virtual user plays visitors one after another: open the tester page,
+then a scripted multi-turn conversation on /chat with think time between
+turns (cookies carry the session), sometimes ending with
+/reset-conversation; every visitor gets a fresh cookie jar. Users start
+evenly over --ramp-up seconds.
+
+Reports throughput and p50/p95/p99 per endpoint, status/error counts, the
+fake LLM's calls and injected errors, and per gunicorn worker the CPU time,
+average CPU % and peak RSS (sampled from /proc every second; Linux only).
+
+--seed-users pre-loads synthetic visitors with memory_loader_spa so queries
+run against a realistically sized store.
+
+Usage:  python benchmarks/load_e2e.py --users 200 --duration 60 --workers 4 --threads 8
+        python benchmarks/load_e2e.py --backend postgres --seed-users 100000 \\
+            --llm-latency-dist lognormal --llm-latency-spread 0.5 --llm-error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_compare import start, wait_ready  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Realistic visitor scripts; a session plays a prefix of one (at least two turns)
+SCRIPTS = [
+    ["Hi, just looking at hot tubs", "What's the difference between Caldera and Fantasy?",
+     "We need something for 6 people", "How much is the Paradise Makena?", "Is delivery included?",
+     "Can we come see it this weekend?"],
+    ["Do you have anything under 10k?", "What about maintenance, is it a lot of work?",
+     "Do you offer financing?", "How much is the Vacanza Marino?", "What electrical do I need?"],
+    ["My back has been killing me, do hot tubs help?", "Mostly for therapy and relaxing after work",
+     "Which one has the best jets?", "How much is the Utopia Cantabria?", "What's the warranty?",
+     "How soon could you install it?", "Ok, I'd like to schedule a visit"],
+    ["How much is the Palatino?", "Is maintenance a lot of work?", "Thanks, just researching for now"],
+]
+
+# ============================================================================
+# VIRTUAL USERS
+# ============================================================================
+
+class Recorder:
+    """Latencies and outcomes per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.sessions = 0
+
+    async def call(self, http: aiohttp.ClientSession, method: str, base_url: str, path: str, **kwargs) -> bool:
+        started = time.monotonic()
+        try:
+            async with http.request(method, base_url + path, **kwargs) as resp:
+                await resp.read()
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.outcomes[path][type(e).__name__] += 1
+            return False
+        self.latencies[path].append(time.monotonic() - started)
+        self.outcomes[path][status] += 1
+        return status < 400
+
+async def virtual_user(number: int, base_url: str, start_at: float, stop_at: float, recorder: Recorder,
+                       think_ms: float, reset_rate: float) -> None:
+    rng = random.Random(number)
+    await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+    timeout = aiohttp.ClientTimeout(total=120)
+    while time.monotonic() < stop_at:
+        jar = aiohttp.CookieJar(unsafe=True)
+        async with aiohttp.ClientSession(cookie_jar=jar, timeout=timeout) as http:
+            recorder.sessions += 1
+            await recorder.call(http, "GET", base_url, "/tester")
+            script = rng.choice(SCRIPTS)
+            for message in script[:rng.randint(2, len(script))]:
+                if time.monotonic() >= stop_at:
+                    return
+                await asyncio.sleep(rng.expovariate(1000 / think_ms) if think_ms else 0)
+                await recorder.call(http, "POST", base_url, "/chat", json={"message": message})
+            if rng.random() < reset_rate:
+                await recorder.call(http, "POST", base_url, "/reset-conversation")
+
+async def drive(base_url: str, users: int, duration: float, ramp_up: float, think_ms: float,
+                reset_rate: float, sampler: "WorkerSampler") -> Recorder:
+    recorder = Recorder()
+    now = time.monotonic()
+    stop_at = now + duration
+    sampling = asyncio.create_task(sampler.run(stop_at))
+    await asyncio.gather(*(
+        virtual_user(n, base_url, now + ramp_up * n / max(users, 1), stop_at, recorder, think_ms, reset_rate)
+        for n in range(users)
+    ))
+    await sampling
+    return recorder
+
+# ============================================================================
+# WORKER RESOURCES
+# ============================================================================
+
+class WorkerSampler:
+    """CPU time and RSS of the gunicorn master and its workers, from /proc"""
+
+    def __init__(self, master_pid: int, interval: float = 1.0):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        # pid -> {"first": (t, cpu), "last": (t, cpu), "peak_rss": bytes}
+        self.processes: Dict[int, Dict[str, Any]] = {}
+
+    def _stat(self, pid: int) -> Optional[tuple]:
+        """(ppid, cpu seconds, rss bytes) or None if the process is gone"""
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rpartition(")")[2].split()
+        except OSError:
+            return None
+        return int(fields[1]), (int(fields[11]) + int(fields[12])) / self.tick, int(fields[21]) * self.page
+
+    def sample(self) -> None:
+        if not os.path.isdir("/proc"):
+            return
+        now = time.monotonic()
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            stat = self._stat(pid)
+            if stat is None or (pid != self.master_pid and stat[0] != self.master_pid):
+                continue
+            _, cpu, rss = stat
+            record = self.processes.setdefault(pid, {"first": (now, cpu), "peak_rss": 0})
+            record["last"] = (now, cpu)
+            record["peak_rss"] = max(record["peak_rss"], rss)
+
+    async def run(self, stop_at: float) -> None:
+        while time.monotonic() < stop_at:
+            self.sample()
+            await asyncio.sleep(self.interval)
+        self.sample()
+
+    def report(self) -> List[Dict[str, Any]]:
+        rows = []
+        for pid, record in sorted(self.processes.items()):
+            (t0, cpu0), (t1, cpu1) = record["first"], record["last"]
+            rows.append({
+                "pid": pid,
+                "role": "master" if pid == self.master_pid else "worker",
+                "cpu_s": round(cpu1 - cpu0, 2),
+                "cpu_pct": round(100 * (cpu1 - cpu0) / (t1 - t0), 1) if t1 > t0 else 0.0,
+                "peak_rss_mb": round(record["peak_rss"] / 2 ** 20, 1)
+            })
+        return rows
+
+# ============================================================================
+# SETUP
+# ============================================================================
+
+def prepare_store(args, workdir: str) -> Dict[str, str]:
+    """App environment for the chosen backend, migrated and seeded"""
+    from memory_loader_spa import bulk_load, open_source, open_target
+
+    if args.backend == "postgres":
+        if not os.getenv("DATABASE_URL"):
+            sys.exit("DATABASE_URL environment variable is required for --backend postgres")
+        import psycopg2
+        from schema_migrations_spa import apply_migrations
+
+        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        try:
+            apply_migrations(conn)
+        finally:
+            conn.close()
+        env, target = {"MEMORY_BACKEND": "postgres"}, "postgres"
+    else:
+        path = os.path.join(workdir, "memory.db")
+        env, target = {"MEMORY_BACKEND": "sqlite", "SQLITE_MEMORY_PATH": path}, f"sqlite:{path}"
+
+    if args.seed_users:
+        loader = open_target(target, database_url=os.getenv("DATABASE_URL"))
+        try:
+            totals = bulk_load(open_source(f"synthetic:{args.seed_users}"), loader)
+        finally:
+            loader.close()
+        print(f"Seeded {totals['read']:,} synthetic visitors ({totals['rows_per_sec']:,} rows/s)")
+    return env
+
+def percentile(samples: List[float], p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000 if samples else 0.0
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Dict[str, Any]]:
+    endpoints = {}
+    for path in sorted(set(recorder.latencies) | set(recorder.outcomes)):
+        samples = sorted(recorder.latencies[path])
+        outcomes = recorder.outcomes[path]
+        ok = sum(count for status, count in outcomes.items() if isinstance(status, int) and status < 400)
+        endpoints[path] = {
+            "requests": sum(outcomes.values()),
+            "ok": ok,
+            "rps": round(ok / duration, 1),
+            "p50_ms": round(percentile(samples, 0.50), 1),
+            "p95_ms": round(percentile(samples, 0.95), 1),
+            "p99_ms": round(percentile(samples, 0.99), 1),
+            "mean_ms": round(statistics.mean(samples) * 1000, 1) if samples else 0.0,
+            "outcomes": {str(status): count for status, count in sorted(outcomes.items(), key=str)}
+        }
+    return endpoints
+
+async def fetch_json(url: str) -> Optional[Dict[str, Any]]:
+    try:
+        async with aiohttp.ClientSession() as http:
+            async with http.get(url) as resp:
+                return await resp.json()
+    except aiohttp.ClientError:
+        return None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--seed-users", type=int, default=0, help="synthetic visitors to load first")
+    parser.add_argument("--users", type=int, default=100, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--ramp-up", type=float, default=5)
+    parser.add_argument("--think-ms", type=float, default=1000, help="mean pause between turns (exponential)")
+    parser.add_argument("--reset-rate", type=float, default=0.1, help="fraction of sessions ending in a reset")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--gunicorn-args", default="", help="extra gunicorn arguments")
+    parser.add_argument("--port", type=int, default=8911)
+    parser.add_argument("--llm-port", type=int, default=8910)
+    parser.add_argument("--llm-latency-ms", type=float, default=1500)
+    parser.add_argument("--llm-latency-dist", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--llm-latency-spread", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-statuses", default="500")
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="spa-load-") as workdir:
+        env = dict(os.environ, OPENAI_API_BASE=f"http://127.0.0.1:{args.llm_port}/v1", OPENAI_API_KEY="sk-fake",
+                   **prepare_store(args, workdir))
+        fake = start([sys.executable, "benchmarks/fake_openai.py", "--port", str(args.llm_port),
+                      "--latency-ms", str(args.llm_latency_ms), "--latency-dist", args.llm_latency_dist,
+                      "--latency-spread", str(args.llm_latency_spread), "--error-rate", str(args.llm_error_rate),
+                      "--error-statuses", args.llm_error_statuses, "--seed", "0"], env)
+        server = start(["gunicorn", "-w", str(args.workers), "--threads", str(args.threads),
+                        "-b", f"127.0.0.1:{args.port}", *shlex.split(args.gunicorn_args), "spa_bot4:app"], env)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(wait_ready(f"{base_url}/ping"))
+            sampler = WorkerSampler(server.pid)
+            recorder = asyncio.run(drive(base_url, args.users, args.duration, args.ramp_up, args.think_ms,
+                                         args.reset_rate, sampler))
+            llm = asyncio.run(fetch_json(f"http://127.0.0.1:{args.llm_port}/stats"))
+        finally:
+            server.terminate()
+            server.wait()
+            fake.terminate()
+            fake.wait()
+
+    endpoints = summarize(recorder, args.duration)
+    workers = sampler.report()
+    total_ok = sum(e["ok"] for e in endpoints.values())
+
+    print(f"{args.backend}, {args.workers} workers x {args.threads} threads, {args.users} users, "
+          f"{args.duration:.0f}s, llm {args.llm_latency_dist} {args.llm_latency_ms:.0f}ms "
+          f"({args.llm_error_rate:.0%} errors)")
+    print(f"{recorder.sessions:,} sessions, {total_ok:,} ok requests, {total_ok / args.duration:,.1f} req/s")
+    print(f"\n{'endpoint':<22}{'req':>8}{'ok':>8}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}  outcomes")
+    for path, e in endpoints.items():
+        outcomes = " ".join(f"{status}:{count}" for status, count in e["outcomes"].items())
+        print(f"{path:<22}{e['requests']:>8}{e['ok']:>8}{e['rps']:>8.1f}"
+              f"{e['p50_ms']:>9.0f}{e['p95_ms']:>9.0f}{e['p99_ms']:>9.0f}  {outcomes}")
+    if llm:
+        print(f"\nfake LLM: {llm['requests']:,} calls, {llm['errors']:,} injected errors")
+    if workers:
+        print(f"\n{'pid':>8}  {'role':<8}{'cpu s':>8}{'cpu %':>8}{'peak rss MB':>13}")
+        for w in workers:
+            print(f"{w['pid']:>8}  {w['role']:<8}{w['cpu_s']:>8.1f}{w['cpu_pct']:>8.1f}{w['peak_rss_mb']:>13.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "sessions": recorder.sessions, "endpoints": endpoints,
+                       "llm": llm, "workers": workers}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Chat Replay Harness
+===================
+Feeds recorded or synthetic conversations through the real /chat turn
+sequence - load_memory, ChatPipeline.prepare_turn, call_llm, complete_turn,
+save_memory - on a chosen memory backend, with openai.ChatCompletion.create
+replaced by a deterministic local fake.
+
+Reports per-stage latency (p50/p95/mean ms per turn):
+
+  load      memory_backend.load_memory
+  facts     extract_key_facts
+  evaluate  ConversationFlowEngine.evaluate
+  prompt    the rest of prepare_turn (intent, context summary, pricing, CTA)
+  llm       call_llm against the fake (add --llm-latency-ms to simulate the API)
+  record    complete_turn (add_interaction, CTA tracking, funnel events)
+  save      memory_backend.save_memory
+
+and writes a transcript - one JSON line per turn with the stage, intent, CTA
+and a hash of the prompt sent to the model - that is identical across runs
+of the same code, so --baseline can flag behaviour drift (exit 1).
+
+Conversations: synthetic (default), or --conversations PATH with NDJSON of
+memory documents (an "interactions" list) or of per-turn records from
+conversation_export_spa (user_id + user_message).
+
+Usage:  python benchmarks/replay_chat.py --backend sqlite --conversations 200 --transcript replay.ndjson
+        python benchmarks/replay_chat.py --backend sqlite --baseline replay.ndjson
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openai  # noqa: E402
+
+import chat_pipeline_spa  # noqa: E402
+from chat_pipeline_spa import CHAT_MEMORY_FIELDS, ChatPipeline  # noqa: E402
+from conversation_flow_engine_spa import ConversationFlowEngine  # noqa: E402
+from memory_loader_spa import synthetic_memory  # noqa: E402
+
+STAGES = ["load", "facts", "evaluate", "prompt", "llm", "record", "save"]
+
+# ============================================================================
+# FAKE LLM
+# ============================================================================
+
+def fake_completion(latency_ms: float = 0):
+    """Deterministic ChatCompletion.create: the reply depends only on the messages"""
+
+    def create(model: str = None, messages: List[Dict[str, str]] = None, **kwargs) -> Any:
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        messages = messages or []
+        last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        digest = hashlib.sha1(json.dumps(messages, sort_keys=True).encode()).hexdigest()[:8]
+        content = f"[{digest}] Happy to help with that - {last_user[:60]}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content))])
+
+    return create
+
+# ============================================================================
+# CONVERSATIONS
+# ============================================================================
+
+def synthetic_conversations(count: int, seed: int) -> Iterator[List[str]]:
+    for index in range(count):
+        yield [turn["user"] for turn in synthetic_memory(index, seed)["interactions"]]
+
+def recorded_conversations(path: str) -> Iterator[List[str]]:
+    """User messages per conversation from memory documents or per-turn export records"""
+    current_user, messages = None, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "interactions" in record:
+                yield [turn.get("user") or "" for turn in record["interactions"]]
+                continue
+            if record["user_id"] != current_user and messages:
+                yield messages
+                messages = []
+            current_user = record["user_id"]
+            messages.append(record["user_message"])
+    if messages:
+        yield messages
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+def open_backend(name: str, workdir: str):
+    """A fresh memory backend; shared/sqlite live in workdir"""
+    from memory_backends_spa import InMemoryManager, SharedSessionStore, SQLiteMemoryManager
+
+    if name == "memory":
+        return InMemoryManager()
+    if name == "shared":
+        return SharedSessionStore(path=os.path.join(workdir, "sessions.db"))
+    if name == "sqlite":
+        return SQLiteMemoryManager(db_path=os.path.join(workdir, "memory.db"), cache_ttl=0)
+    if name == "postgres":
+        from enhanced_memory_manager_spa import EnhancedMemoryManager
+
+        return EnhancedMemoryManager(cache_ttl=0)
+    raise ValueError(f"Unknown backend {name!r}")
+
+def drop_replay_rows(memory, run_id: str) -> None:
+    """Remove this run's visitors from a shared Postgres database"""
+    with memory._get_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM user_memories WHERE user_id LIKE %s", (f"replay_{run_id}_%",))
+        if memory.turn_log:
+            cur.execute("DELETE FROM conversation_turns WHERE user_id LIKE %s", (f"replay_{run_id}_%",))
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+class StageTimer:
+    """Per-turn stage durations, filled by wrapped calls"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.turn: Dict[str, float] = {}
+
+    def wrap(self, name: str, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.turn[name] = self.turn.get(name, 0) + time.perf_counter() - started
+        return timed
+
+    def commit(self) -> None:
+        for name, seconds in self.turn.items():
+            self.samples[name].append(seconds * 1000)
+        self.turn = {}
+
+def replay(conversations: Iterator[List[str]], memory, timer: StageTimer, run_id: str) -> Iterator[Dict[str, Any]]:
+    """Run every turn the way /chat does; yields one transcript record per turn"""
+    engine = ConversationFlowEngine()
+    engine.evaluate = timer.wrap("evaluate", engine.evaluate)
+    pipeline = ChatPipeline(memory, engine)
+    load = timer.wrap("load", memory.load_memory)
+    prepare = timer.wrap("prepare", pipeline.prepare_turn)
+    call_llm = timer.wrap("llm", pipeline.call_llm)
+    complete = timer.wrap("record", pipeline.complete_turn)
+    save = timer.wrap("save", memory.save_memory)
+
+    for number, messages in enumerate(conversations):
+        random.seed(number)  # the flow engine picks phrasings at random
+        user_id = f"replay_{run_id}_{number:06d}"
+        for index, user_message in enumerate(messages):
+            memory_doc = load(user_id, fields=CHAT_MEMORY_FIELDS)
+            turn = prepare(memory_doc, user_message)
+            bot_response = call_llm(turn["messages"])
+            payload = complete(memory_doc, user_message, turn, bot_response)
+            save(memory_doc)
+
+            timer.turn["prompt"] = timer.turn.pop("prepare") - timer.turn["facts"] - timer.turn["evaluate"]
+            timer.commit()
+            yield {
+                "conversation": number,
+                "turn": index,
+                "user": user_message,
+                "stage": payload["buyer_stage"],
+                "intent": sorted(k for k, v in (payload["intent"] or {}).items() if v),
+                "cta": (payload["cta"] or {}).get("type"),
+                "prompt": hashlib.sha1(json.dumps(turn["messages"], sort_keys=True).encode()).hexdigest()[:12],
+                "reply": bot_response
+            }
+
+def compare_transcripts(path: str, records: List[Dict[str, Any]], show: int = 5) -> int:
+    """Print the first differences from a baseline transcript; returns the number of differing turns"""
+    with open(path, encoding="utf-8") as f:
+        baseline = [json.loads(line) for line in f if line.strip()]
+    differing = 0
+    for expected, actual in zip(baseline, records):
+        if expected != actual:
+            differing += 1
+            if differing <= show:
+                fields = [k for k in actual if expected.get(k) != actual[k]]
+                print(f"  conversation {actual['conversation']} turn {actual['turn']}: "
+                      + ", ".join(f"{k} {expected.get(k)!r} -> {actual[k]!r}" for k in fields))
+    differing += abs(len(baseline) - len(records))
+    return differing
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "shared", "sqlite", "postgres"], default="memory")
+    parser.add_argument("--conversations", default="100",
+                        help="number of synthetic conversations, or an NDJSON file of recorded ones")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0)
+    parser.add_argument("--transcript", help="write the transcript (NDJSON) here")
+    parser.add_argument("--baseline", help="compare against this transcript; exit 1 on drift")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    openai.ChatCompletion.create = fake_completion(args.llm_latency_ms)
+    timer = StageTimer()
+    chat_pipeline_spa.extract_key_facts = timer.wrap("facts", chat_pipeline_spa.extract_key_facts)
+
+    if args.conversations.isdigit():
+        conversations = synthetic_conversations(int(args.conversations), args.seed)
+    else:
+        conversations = recorded_conversations(args.conversations)
+
+    with tempfile.TemporaryDirectory(prefix="spa-replay-") as workdir:
+        memory = open_backend(args.backend, workdir)
+        run_id = uuid.uuid4().hex[:8]
+        started = time.perf_counter()
+        try:
+            records = list(replay(conversations, memory, timer, run_id))
+            elapsed = time.perf_counter() - started
+        finally:
+            if args.backend == "postgres":
+                drop_replay_rows(memory, run_id)
+            if hasattr(memory, "close"):
+                memory.close()
+
+    print(f"{args.backend}: {len(records):,} turns in {elapsed:.2f}s ({len(records) / elapsed:,.0f} turns/s)")
+    print(f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for stage in STAGES:
+        samples = sorted(timer.samples[stage])
+        if samples:
+            p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+            print(f"{stage:<10}{statistics.median(samples):>10.3f}{p95:>10.3f}{statistics.mean(samples):>10.3f}")
+
+    if args.transcript:
+        with open(args.transcript, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, sort_keys=True) + "\n")
+    if args.baseline:
+        differing = compare_transcripts(args.baseline, records)
+        print(f"{differing} turn(s) differ from {args.baseline}")
+        if differing:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
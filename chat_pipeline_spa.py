@@ -0,0 +1,471 @@
+"""
+Chat Pipeline - Shared Turn Processing
+======================================
+The per-turn chat logic (fact extraction, flow evaluation, prompt building,
+LLM call and CTA tracking) shared by the Flask app and the async server.
+"""
+
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import openai
+
+from funnel_analytics_spa import cta_event, stage_event
+from memory_backends_spa import MemoryBackend
+from spa_system_manager import STORE_INFO
+
+logger = logging.getLogger(__name__)
+
+# Memory columns a turn reads or writes (projected loads skip preferences,
+# render_details and created_at), and the ones reset_memory overwrites.
+# reset_at rides along so a save that races a reset can tell which side is newer.
+CHAT_MEMORY_FIELDS = (
+    "interactions", "key_facts", "buyer_stage", "engagement_level", "render_requested",
+    "render_status", "contact_info", "cta_attempts", "last_cta_attempt", "conversation_summary", "reset_at"
+)
+RESET_MEMORY_FIELDS = (
+    "interactions", "key_facts", "conversation_summary", "buyer_stage", "engagement_level", "cta_attempts",
+    "reset_at"
+)
+
+# Recent turns replayed into every prompt
+HISTORY_TURNS = 3
+
+# ============================================================================
+# IMPROVED SYSTEM PROMPT
+# ============================================================================
+
+SYSTEM_PROMPT = """You are Country Leisure's friendly spa sales expert in Moore, Oklahoma. You're knowledgeable, helpful, and conversational without being pushy.
+
+KEY FACTS TO REMEMBER:
+- All prices mentioned are ALL-INCLUSIVE (spa, cover, lifter, steps, electrical sub-panel, local delivery)
+- Local delivery within 50 miles is FREE
+- We offer 0% financing for qualified buyers
+- Caldera Spas are our premium line (Vacanza, Paradise, Utopia series)
+- Fantasy Spas are our budget-friendly option
+- Showroom: 3001 N. I-35 Service Rd., Moore, OK 73160
+
+YOUR PERSONALITY:
+- Friendly and approachable, like a helpful neighbor
+- Patient - don't rush customers through the process
+- Focus on education and value, not aggressive selling
+- Build rapport before pushing for visits or sales
+- Answer questions directly without always adding a sales pitch
+
+CONVERSATION GUIDELINES:
+- Keep responses concise (2-3 sentences usually)
+- Use the customer's name naturally when you learn it
+- Match the customer's energy - if they're casual, be casual
+- Only suggest visits/CTAs when it feels natural
+- If discussing price, be accurate with the numbers
+
+CRITICAL PRICING RULES:
+- ALWAYS use the exact pricing provided by the system
+- NEVER make up or estimate prices
+- If pricing is not provided for something (like salt system add-on), say "I'll need to check on that specific pricing"
+- PRICE RANGES (all-inclusive with spa, cover, lifter, steps, electrical panel, local delivery):
+  * Fantasy Spas: $4,649 - $8,149
+  * Caldera Vacanza: $8,747 - $12,747
+  * Caldera Paradise: $12,847 - $16,847
+  * Caldera Utopia: $16,247 - $24,747
+- Models and their series:
+  * Vacanza: Aventine, Celio, Tarino, Vanto, Marino, Palatino
+  * Paradise: Kauai, Martinique, Seychelles, Reunion, Salina, Makena
+  * Utopia: Ravello, Florence, Tahitian, Niagara, Geneva, Cantabria
+  * Fantasy: Aspire, Drift, Embrace, Enamor, Entice, Enamor Premier, Entice Premier
+- When discussing general pricing, use the ranges above
+- When a specific model is requested, wait for the system to provide the exact price
+- All prices quoted are all-inclusive - always emphasize this value point
+  
+CLICKABLE CTAs:
+When appropriate based on the conversation, naturally include ONE of these clickable links (use markdown format [text](url)):
+- When they ask about pricing/budget: "Want to know your budget? [Get pre-approved in minutes](https://www.countryleisuremfg.com/preapproval)"
+- When they want to compare models: "You can [download our full brochure](https://hottubs.countryleisuremfg.com/download-a-brochure/) to see all options"
+- When they ask about maintenance/care: "Check out the [Caldera owner's manual](https://hottubs.countryleisuremfg.com/caldera-spas-owners-manual/) for all the details"
+- When they need help with space/placement: "Let's [schedule a free consultation](https://hottubs.countryleisuremfg.com/free-home-consultation/) at your place"
+- When they're ready to see/try spas: "Come test soak! Call us at [405-799-7745](tel:405-799-7745) or visit our [Moore showroom](https://maps.google.com/?q=3001+N+I-35+Service+Rd+Moore+OK+73160)"
+- For general questions: "Feel free to [contact our team](https://www.countryleisuremfg.com/contact) anytime"
+
+CTA GUIDELINES:
+- Only include a CTA when it naturally fits the conversation
+- Don't force CTAs in browsing/early stages unless they ask
+- Use CTAs more frequently in considering/ready stages
+- Vary the CTA text to sound natural, but keep the exact URLs
+- Never use more than one CTA per response
+
+Remember: You're helping them find their perfect spa, not pushing for a quick sale
+
+IMPORTANT:
+- Be accurate with pricing - always use the exact prices provided
+- Respect the buyer's journey - don't push too hard too fast
+- If customer seems overwhelmed or jokes about being pushy, back off immediately
+CRITICAL PRICING RULES:
+- ALWAYS use the exact prices provided by the system
+- NEVER guess or estimate prices
+- All prices are all-inclusive (spa, cover, lifter, steps, electrical panel, local delivery)
+- If you don't have a price, ask me to check rather than guessing or tell you are sorry and unsure have them fill a contact us form so that we can get back to them"""
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def extract_key_facts(message: str, memory: Dict[str, Any]) -> None:
+    """Extract and update key facts from user message"""
+    msg_lower = message.lower()
+    key_facts = memory.get("key_facts", {})
+    
+    # Extract name
+    name_patterns = [
+        r"(?:i'm|i am|my name is|name's|call me)\s+([A-Z][a-z]+)",
+        r"(?:this is)\s+([A-Z][a-z]+)"
+    ]
+    for pattern in name_patterns:
+        if match := re.search(pattern, message, re.IGNORECASE):
+            key_facts['name'] = match.group(1)
+    
+    # Extract budget
+    if match := re.search(r"(\d+)k|(\d+),?(\d+)", message, re.IGNORECASE):
+        if match.group(1):
+            budget = int(match.group(1)) * 1000
+            key_facts['budget_range'] = f"${budget:,}"
+    
+    # Extract seating preference
+    if match := re.search(r"(\d+)\s*(?:person|people|seat)", message, re.IGNORECASE):
+        key_facts['preferred_seats'] = int(match.group(1))
+    
+    # Extract priority/reason
+    if 'relax' in msg_lower:
+        key_facts['reason'] = 'relaxation'
+    elif 'therap' in msg_lower:
+        key_facts['reason'] = 'therapy'
+    elif 'family' in msg_lower:
+        key_facts['reason'] = 'family'
+    elif 'entertain' in msg_lower:
+        key_facts['reason'] = 'entertaining'
+    
+    memory['key_facts'] = key_facts
+
+def should_show_cta_naturally(memory: Dict[str, Any], flow_evaluation: Dict) -> bool:
+    """Determine if we should naturally show a CTA based on flow engine recommendation"""
+    turn_count = len(memory.get("interactions", []))
+    last_cta_turn = memory.get("last_cta_turn", 0)
+    turns_since_cta = turn_count - last_cta_turn
+    stage = flow_evaluation.get("buyer_stage", "browsing")
+    
+    # Never show CTA in first 2 interactions
+    if turn_count < 2:
+        return False
+    
+    # Follow flow engine's suggestion but moderate frequency
+    if flow_evaluation.get("suggested_cta"):
+        # Stage-based minimum spacing
+        min_spacing = {
+            "browsing": 6,
+            "researching": 4,
+            "considering": 3,
+            "ready": 2
+        }
+        return turns_since_cta >= min_spacing.get(stage, 4)
+    
+    return False
+
+# ============================================================================
+# MODEL MENTION DATA
+# ============================================================================
+
+MODELS_TO_CHECK = [
+    "palatino", "tarino", "marino", "vanto", "celio", "aventine",  # Vacanza
+    "kauai", "martinique", "seychelles", "reunion", "salina", "makena",  # Paradise
+    "ravello", "florence", "tahitian", "niagara", "geneva", "cantabria",  # Utopia
+    "aspire", "drift", "embrace", "enamor", "entice"  # Fantasy
+]
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+class ChatPipeline:
+    """Runs one chat turn against a memory manager and ConversationFlowEngine"""
+    
+    def __init__(self, memory_manager: MemoryBackend, flow_engine, model: str = "gpt-4",
+                 temperature: float = 0.7, max_tokens: int = 150):
+        """
+        Initialize the chat pipeline
+        
+        Args:
+            memory_manager: Memory manager used for context summaries and interactions
+            flow_engine: ConversationFlowEngine instance
+            model: OpenAI chat model
+            temperature: Sampling temperature for replies
+            max_tokens: Reply length cap
+        """
+        self.memory: MemoryBackend = memory_manager
+        self.flow_engine = flow_engine
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def evaluate_turn(self, memory: Dict[str, Any], user_message: str) -> Tuple[Dict[str, Any], str]:
+        """
+        Apply the user message's facts and flow-engine stage to memory
+        
+        Also used by stage_replay_spa to re-derive stored stages offline.
+        
+        Returns:
+            (flow_evaluation, stage before the message)
+        """
+        # Extract facts from message
+        extract_key_facts(user_message, memory)
+        
+        # ========== USE FLOW ENGINE'S EVALUATE METHOD ==========
+        flow_evaluation = self.flow_engine.evaluate(memory, user_message)
+        
+        # Update memory with flow engine's stage
+        old_stage = memory.get("buyer_stage", "browsing")
+        memory["buyer_stage"] = flow_evaluation.get("buyer_stage", old_stage)
+        
+        # Track follow-ups that have been asked
+        if flow_evaluation.get("followups"):
+            memory.setdefault("asked_followups", []).extend(flow_evaluation["followups"])
+        
+        return flow_evaluation, old_stage
+
+    def prepare_turn(self, memory: Dict[str, Any], user_message: str,
+                     history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        Update memory from the user message and build the OpenAI messages
+        
+        Args:
+            history: Prepared recent-turn messages (see history_messages); rebuilt from memory if None
+        
+        Returns:
+            Turn state: messages, flow_evaluation, intent, cta_message
+        """
+        flow_evaluation, old_stage = self.evaluate_turn(memory, user_message)
+        new_stage = memory["buyer_stage"]
+        
+        logger.info(f"Flow Engine Evaluation: Stage {old_stage} -> {new_stage}, CTA: {flow_evaluation.get('suggested_cta')}")
+        
+        # ========== ANALYZE INTENT ==========
+        intent_analysis = self.flow_engine.analyze_conversation_intent(user_message)
+        logger.debug(f"Intent Analysis: {intent_analysis}")
+        
+        # Build base messages for OpenAI
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        
+        # Add context
+        if context := self.memory.build_context_summary(memory):
+            messages.append({
+                "role": "system",
+                "content": f"CONVERSATION CONTEXT: {context}"
+            })
+        
+        # Add recent conversation history
+        messages.extend(self.history_messages(memory) if history is None else history)
+        
+        # ========== HANDLE SPECIFIC INTENTS ==========
+        
+        # ========== ALWAYS CHECK FOR MODEL MENTIONS ==========
+        # Check for ANY specific model mention (not just during price inquiries)
+        for model in MODELS_TO_CHECK:
+            if model in user_message.lower():
+                price_quote = self.flow_engine.get_pricing_quote(model)
+                if price_quote:
+                    messages.append({
+                        "role": "system",
+                        "content": f"IMPORTANT - EXACT PRICING: {price_quote} Use this exact information. Do NOT make up prices."
+                    })
+                    
+                    # Add series context
+                    if model in ["aventine", "celio", "tarino", "vanto", "marino", "palatino"]:
+                        series_info = "Vacanza series - entry-level Caldera"
+                    elif model in ["kauai", "martinique", "seychelles", "reunion", "salina", "makena"]:
+                        series_info = "Paradise series - mid-tier with salt system compatibility"
+                    elif model in ["ravello", "florence", "tahitian", "niagara", "geneva", "cantabria"]:
+                        series_info = "Utopia series - premium with salt system included"
+                    else:
+                        series_info = "Fantasy series - budget-friendly plug-and-play"
+                    
+                    messages.append({
+                        "role": "system",
+                        "content": f"SERIES: {series_info}"
+                    })
+                break
+        
+        # Size question
+        if intent_analysis.get("size_question"):
+            if match := re.search(r"(\d+)\s*(?:person|people|seat)", user_message, re.IGNORECASE):
+                seats = int(match.group(1))
+                # Get models WITH PRICES
+                recommendations = self.flow_engine.get_model_recommendation({'seats': seats, 'budget_max': 99999})
+                if recommendations:
+                    messages.append({
+                        "role": "system",
+                        "content": f"IMPORTANT - Use these exact prices for {seats}-person spas:\n{recommendations}"
+                })
+        
+        # Maintenance concern
+        if intent_analysis.get("maintenance_concern"):
+            maintenance_info = self.flow_engine.get_knowledge_answer("maintenance")
+            if maintenance_info:
+                messages.append({
+                    "role": "system",
+                    "content": f"MAINTENANCE INFO: {maintenance_info}"
+                })
+        
+        # Electrical question
+        if intent_analysis.get("electrical_question"):
+            electrical_info = self.flow_engine.get_knowledge_answer("electrical")
+            if electrical_info:
+                messages.append({
+                    "role": "system",
+                    "content": f"ELECTRICAL INFO: {electrical_info}"
+                })
+        
+        # ========== ADD FOLLOW-UP QUESTION IF APPROPRIATE ==========
+        if flow_evaluation.get("followups") and len(memory.get("interactions", [])) % 3 == 0:
+            followup = flow_evaluation["followups"][0] if flow_evaluation["followups"] else None
+            if followup:
+                messages.append({
+                    "role": "system",
+                    "content": f"End your response with this natural follow-up: {followup}"
+                })
+        
+        # ========== HANDLE CTA SUGGESTION ==========
+        cta_message = None
+        if should_show_cta_naturally(memory, flow_evaluation):
+            suggested_cta = flow_evaluation.get("suggested_cta")
+            if suggested_cta:
+                cta_message = self.flow_engine.get_cta_message(memory, suggested_cta)
+                if cta_message:
+                    messages.append({
+                        "role": "system",
+                        "content": f"If it fits naturally, mention: {cta_message}"
+                    })
+        
+        # Add current user message
+        messages.append({"role": "user", "content": user_message})
+        
+        return {
+            "messages": messages,
+            "flow_evaluation": flow_evaluation,
+            "intent": intent_analysis,
+            "cta_message": cta_message,
+            "previous_stage": old_stage,
+            "first_turn": not memory.get("interactions")
+        }
+
+    @staticmethod
+    def history_messages(memory: Dict[str, Any]) -> List[Dict[str, str]]:
+        """The recent turns every prompt replays, as OpenAI messages"""
+        messages = []
+        for interaction in memory.get("interactions", [])[-HISTORY_TURNS:]:
+            messages.append({"role": "user", "content": interaction["user"]})
+            messages.append({"role": "assistant", "content": interaction["bot"]})
+        return messages
+
+    @staticmethod
+    def remember_turn(history: List[Dict[str, str]], user_message: str, bot_response: str) -> None:
+        """Append a finished turn to prepared history, keeping the last HISTORY_TURNS"""
+        history.append({"role": "user", "content": user_message})
+        history.append({"role": "assistant", "content": bot_response})
+        del history[:-2 * HISTORY_TURNS]
+
+    def _completion_params(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Shared OpenAI request parameters"""
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+
+    def call_llm(self, messages: List[Dict[str, str]]) -> str:
+        """Blocking OpenAI call (Flask workers)"""
+        response = openai.ChatCompletion.create(**self._completion_params(messages))
+        return response.choices[0].message.content.strip()
+
+    async def acall_llm(self, messages: List[Dict[str, str]]) -> str:
+        """Non-blocking OpenAI call (async server)"""
+        response = await openai.ChatCompletion.acreate(**self._completion_params(messages))
+        return response.choices[0].message.content.strip()
+
+    async def astream_llm(self, messages: List[Dict[str, str]]):
+        """Stream the reply as text deltas (WebSocket channel)"""
+        stream = await openai.ChatCompletion.acreate(stream=True, **self._completion_params(messages))
+        async for chunk in stream:
+            if text := chunk["choices"][0]["delta"].get("content"):
+                yield text
+
+    def complete_turn(self, memory: Dict[str, Any], user_message: str, turn: Dict[str, Any],
+                      bot_response: str) -> Dict[str, Any]:
+        """
+        Record the bot reply in memory and build the /chat response body
+        
+        The caller is responsible for saving the memory afterwards.
+        """
+        flow_evaluation = turn["flow_evaluation"]
+        
+        # Track CTA if one was shown
+        cta_data = None
+        if turn["cta_message"]:
+            memory["last_cta_turn"] = len(memory.get("interactions", []))
+            memory.setdefault("cta_attempts", []).append({
+                "type": flow_evaluation.get("suggested_cta"),
+                "turn": len(memory.get("interactions", [])),
+                "timestamp": datetime.now().isoformat()
+            })
+            
+            # Add CTA data for response
+            if flow_evaluation.get("suggested_cta") in ["showroom", "consultation", "quote"]:
+                cta_data = {
+                    "type": flow_evaluation.get("suggested_cta"),
+                    "stage": memory["buyer_stage"]
+                }
+        
+        # Save interaction
+        self.memory.add_interaction(memory, user_message, bot_response)
+        
+        # Funnel events (add_interaction can move the stage too, so compare after it)
+        if getattr(self.memory, "funnel_events", False):
+            self._record_funnel_events(memory, turn)
+        
+        return {
+            "reply": bot_response,
+            "buyer_stage": memory.get("buyer_stage"),
+            "stage": memory.get("buyer_stage"),
+            "user_id": memory.get("user_id"),
+            "intent": turn["intent"],
+            "cta": cta_data,
+            "store_info": STORE_INFO if cta_data else None
+        }
+
+    @staticmethod
+    def _record_funnel_events(memory: Dict[str, Any], turn: Dict[str, Any]) -> None:
+        """Queue stage transitions / CTA impressions; the memory manager writes them with the save"""
+        events = memory.setdefault("pending_events", [])
+        previous_stage = turn.get("previous_stage") or "browsing"
+        stage = memory.get("buyer_stage", "browsing")
+        
+        if turn.get("first_turn"):
+            events.append(stage_event(None, previous_stage))
+        if stage != previous_stage:
+            events.append(stage_event(previous_stage, stage))
+        if turn["cta_message"] and turn["flow_evaluation"].get("suggested_cta"):
+            events.append(cta_event(stage, turn["flow_evaluation"]["suggested_cta"]))
+
+    @staticmethod
+    def reset_memory(memory: Dict[str, Any]) -> None:
+        """Reset conversation fields for /reset-conversation"""
+        memory["interactions"] = []
+        memory["key_facts"] = {}
+        memory["conversation_summary"] = ""
+        memory["buyer_stage"] = "browsing"
+        memory["engagement_level"] = 1
+        memory["cta_attempts"] = []
+        memory["asked_followups"] = []
+        memory["last_cta_turn"] = 0
+        # A concurrent save that conflicts with this one must not merge the old turns back
+        memory["reset_at"] = datetime.now().isoformat()
@@ -0,0 +1,222 @@
+"""
+Conversation Export
+===================
+
+Streams every stored conversation out of ``user_memories`` as one record per
+turn - NDJSON or CSV, optionally gzipped on the fly - for analysis and CRM
+imports, without ever holding more than one fetch batch in memory.
+
+Rows are read through a server-side (named) cursor on a dedicated connection,
+so a multi-gigabyte export neither loads the table into the process nor ties
+up a slot in the chat pool. Histories are flattened in Python rather than with
+``COPY (SELECT ... jsonb_array_elements ...) TO STDOUT`` because compact rows
+keep their turns in the ``history`` blob (memory_codec_spa), which only the
+application can decode.
+
+Filters: ``since``/``until`` bound the turn timestamps (rows are pre-filtered
+on last_updated/created_at so the scan can use the last_updated index) and
+``stages`` restricts to the visitor's current buyer_stage.
+
+Usage:  python conversation_export_spa.py --format csv --since 2026-01-01 --stage ready --gzip -o ready.csv.gz
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from memory_codec_spa import decode_history
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_COLUMNS = ["user_id", "turn", "turn_at", "user_message", "bot_response",
+                  "buyer_stage", "engagement_level", "key_facts"]
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_SQL = """
+    SELECT user_id, buyer_stage, engagement_level, key_facts, interactions, history
+    FROM user_memories
+    WHERE {where}
+"""
+
+def export_query(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 stages: Optional[List[str]] = None) -> Tuple[str, Tuple]:
+    """EXPORT_SQL and its parameters for the given filters"""
+    clauses, params = [], []
+    if since:
+        # A row last written before since can't hold a turn after it
+        clauses.append("last_updated >= %s")
+        params.append(since)
+    if until:
+        clauses.append("created_at < %s")
+        params.append(until)
+    if stages:
+        clauses.append("buyer_stage = ANY(%s)")
+        params.append(list(stages))
+    return EXPORT_SQL.format(where=" AND ".join(clauses) or "TRUE"), tuple(params)
+
+def flatten_turns(row: Tuple, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """One export record per turn of a fetched user_memories row, inside [since, until)"""
+    user_id, buyer_stage, engagement_level, key_facts, interactions, history = row
+    if history is not None:
+        interactions = decode_history(bytes(history))[0]
+    elif isinstance(interactions, str):
+        interactions = json.loads(interactions)
+
+    for index, turn in enumerate(interactions or []):
+        timestamp = turn.get("timestamp")
+        if since or until:
+            try:
+                turn_at = datetime.fromisoformat(timestamp)
+            except (TypeError, ValueError):
+                continue
+            if (since and turn_at < since) or (until and turn_at >= until):
+                continue
+        yield {
+            "user_id": user_id,
+            "turn": index,
+            "turn_at": timestamp,
+            "user_message": turn.get("user", ""),
+            "bot_response": turn.get("bot", ""),
+            "buyer_stage": buyer_stage,
+            "engagement_level": engagement_level,
+            "key_facts": key_facts or {}
+        }
+
+def iter_export_rows(database_url: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                     stages: Optional[List[str]] = None, batch_size: int = 2000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream export records from Postgres
+
+    Opens its own connection and a named cursor that fetches batch_size rows
+    per round trip; both are closed when the iterator is exhausted or closed.
+    """
+    import psycopg2
+
+    sql, params = export_query(since, until, stages)
+    conn = psycopg2.connect(database_url)
+    try:
+        conn.set_session(readonly=True)
+        with conn.cursor(name=f"spa_export_{uuid.uuid4().hex[:12]}") as cur:
+            cur.itersize = batch_size
+            cur.execute(sql, params)
+            exported = 0
+            for row in cur:
+                for record in flatten_turns(row, since, until):
+                    exported += 1
+                    yield record
+        logger.info(f"Exported {exported} turns")
+    finally:
+        conn.rollback()
+        conn.close()
+
+def export_lines(records: Iterable[Dict[str, Any]], fmt: str = "ndjson") -> Iterator[str]:
+    """Encode export records as NDJSON lines or CSV rows (header first)"""
+    if fmt == "ndjson":
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for record in records:
+        writer.writerow([json.dumps(record[c], ensure_ascii=False) if c == "key_facts" else record[c]
+                         for c in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_chunks(lines: Iterable[str], compress: bool = False, level: int = 6,
+                  chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Group encoded lines into ~chunk_bytes byte chunks, gzipping on the fly
+
+    Compression is streamed through one zlib object (gzip container), so
+    memory stays at one chunk plus the compressor window.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    pending, size = [], 0
+    for line in lines:
+        data = line.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            chunk = b"".join(pending)
+            pending, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    tail = b"".join(pending)
+    if compressor:
+        tail = compressor.compress(tail) + compressor.flush()
+    if tail:
+        yield tail
+
+def export_filename(fmt: str, compress: bool) -> str:
+    return f"conversations-{datetime.now():%Y%m%d-%H%M%S}.{fmt}{'.gz' if compress else ''}"
+
+def export_args(args) -> Dict[str, Any]:
+    """
+    Query-string/CLI filters -> iter_export_rows kwargs (dates with an offset
+    become naive local time, like the stored turns)
+
+    Raises:
+        ValueError: a date isn't ISO-8601
+    """
+    def when(name: str) -> Optional[datetime]:
+        value = args.get(name)
+        if not value:
+            return None
+        parsed = datetime.fromisoformat(value)
+        # Turn timestamps are naive local time; comparing an aware bound with them raises mid-export
+        return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+    stages = [stage.strip() for stage in (args.get("stage") or "").split(",") if stage.strip()]
+    return {"since": when("since"), "until": when("until"), "stages": stages or None}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export stored conversations, one record per turn")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--since", help="ISO date/time; turns at or after")
+    parser.add_argument("--until", help="ISO date/time; turns before")
+    parser.add_argument("--stage", help="comma-separated buyer stages")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("-o", "--output", help="file to write (default stdout)")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    if not args.database_url:
+        sys.exit("DATABASE_URL environment variable is required")
+    try:
+        filters = export_args(vars(args))
+    except ValueError as e:
+        sys.exit(str(e))
+
+    records = iter_export_rows(args.database_url, batch_size=args.batch_size, **filters)
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        written = 0
+        for chunk in export_chunks(export_lines(records, args.format), compress=args.gzip):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+    logger.info(f"Wrote {written:,} bytes{' to ' + args.output if args.output else ''}")
+
+if __name__ == "__main__":
+    main()
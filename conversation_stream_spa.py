@@ -0,0 +1,214 @@
+"""
+Live Conversation Stream
+========================
+
+Pushes every saved chat turn to admin dashboards over Server-Sent Events
+(/admin/conversations/stream), so the dashboard doesn't have to poll the feed.
+
+ConversationHub fans events out to in-process subscribers. Each subscriber
+has a bounded buffer: a dashboard that stops reading loses its oldest
+events, not the worker's memory, and is told how many it missed so it can
+refetch /admin/conversations.json. With Postgres, turns are announced with
+``NOTIFY conversation_turns`` and every worker's InvalidationBus listener
+feeds its own hub, so a dashboard on any worker sees turns saved on all of
+them. The stream itself never queries the database.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TURN_CHANNEL = "conversation_turns"
+
+# Dashboard previews are clipped to this many UTF-8 bytes per message
+MAX_TEXT_BYTES = 3000
+# NOTIFY payloads must stay under 8000 bytes; the budget applies to the encoded JSON
+MAX_NOTIFY_BYTES = 7500
+TEXT_FIELDS = ("user_message", "bot_response")
+
+def _clip(text: str, limit: int = MAX_TEXT_BYTES) -> str:
+    encoded = (text or "").encode()
+    return text if len(encoded) <= limit else encoded[:limit].decode(errors="ignore") + "…"
+
+def notify_payload(event: Dict[str, Any], limit: int = MAX_NOTIFY_BYTES) -> str:
+    """
+    JSON for NOTIFY, with the message texts clipped further until it fits
+
+    JSON escaping (quotes, backslashes, control characters) can grow text
+    past its UTF-8 size, so the budget is checked on the final payload rather
+    than on the texts.
+    """
+    event = dict(event)
+    while True:
+        payload = json.dumps(event, ensure_ascii=False)
+        excess = len(payload.encode()) - limit
+        if excess <= 0:
+            return payload
+        field = max(TEXT_FIELDS, key=lambda f: len(json.dumps(event.get(f) or "", ensure_ascii=False)))
+        text = event.get(field) or ""
+        size, encoded_size = len(text.encode()), len(json.dumps(text, ensure_ascii=False).encode())
+        if size <= len("…".encode()):
+            raise ValueError(f"Turn event for {event.get('user_id')} doesn't fit in a NOTIFY payload")
+        # Scale the cut by how much this text grows when escaped
+        keep = int((encoded_size - excess) * size / encoded_size) - len("…".encode())
+        event[field] = _clip(text, max(0, min(keep, size - 1)))
+
+def turn_event(memory: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Feed item (same shape as /admin/conversations.json) for the turn just saved"""
+    interactions = memory.get("interactions") or []
+    if not interactions:
+        return None
+    last = interactions[-1]
+    return {
+        "id": f"{memory['user_id']}_{len(interactions)}",
+        "ts": last.get("timestamp", ""),
+        "user_id": memory["user_id"],
+        "user_message": _clip(last.get("user", "")),
+        "bot_response": _clip(last.get("bot", "")),
+        "buyer_stage": memory.get("buyer_stage")
+    }
+
+def sse_message(data: Dict[str, Any], event: str = "turn", event_id: str = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+SSE_KEEPALIVE = ": keepalive\n\n"
+
+class Subscription:
+    """One dashboard connection: a bounded buffer readable from a thread or an event loop"""
+
+    def __init__(self, hub: "ConversationHub", max_buffer: int, loop: asyncio.AbstractEventLoop = None):
+        self.hub = hub
+        self.dropped = 0
+        self.stale = False
+        self._buffer = deque(maxlen=max_buffer)
+        self._cond = threading.Condition()
+        self._loop = loop
+        self._ready = asyncio.Event() if loop else None
+
+    def push(self, event: Dict[str, Any]) -> None:
+        with self._cond:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(event)
+            self._cond.notify()
+        if self._loop:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # Loop already closed; the connection is gone
+                self.close()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        events = list(self._buffer)
+        self._buffer.clear()
+        return events
+
+    def mark_stale(self) -> None:
+        """Events may have been missed upstream (listener reconnected)"""
+        with self._cond:
+            self.stale = True
+            self._cond.notify()
+        if self._loop:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                self.close()
+
+    def take_resync(self) -> Optional[Dict[str, Any]]:
+        """{"dropped": n} if this subscriber missed events since the last call, else None"""
+        with self._cond:
+            dropped, stale = self.dropped, self.stale
+            self.dropped, self.stale = 0, False
+        return {"dropped": dropped} if dropped or stale else None
+
+    def get(self, timeout: float) -> List[Dict[str, Any]]:
+        """Every buffered event, waiting up to timeout for one ([] on timeout)"""
+        with self._cond:
+            if not self._buffer:
+                self._cond.wait(timeout)
+            return self._drain()
+
+    async def get_async(self, timeout: float) -> List[Dict[str, Any]]:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+        with self._cond:
+            return self._drain()
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+class ConversationHub:
+    """In-process fan-out of saved turns to stream subscribers"""
+
+    def __init__(self, max_buffer: int = 256, max_subscribers: int = 100):
+        """
+        Args:
+            max_buffer: Events buffered per subscriber before the oldest are dropped
+            max_subscribers: Concurrent stream connections allowed per worker
+        """
+        self.max_buffer = max_buffer
+        self.max_subscribers = max_subscribers
+        self.bus = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "delivered": 0, "rejected": 0}
+
+    def attach_bus(self, bus) -> None:
+        """Receive turns announced by every worker (subscribe before bus.start())"""
+        self.bus = bus
+        bus.subscribe(TURN_CHANNEL, self._on_notify)
+        bus.on_reconnect(self._on_reconnect)
+
+    def _on_reconnect(self) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.mark_stale()
+
+    def _on_notify(self, payload: str) -> None:
+        self.publish(json.loads(payload))
+
+    def announce(self, event: Optional[Dict[str, Any]]) -> None:
+        """A turn was saved: tell every worker's subscribers (or just ours, without a bus)"""
+        if not event or (not self._subscribers and not self.bus):
+            return
+        if self.bus:
+            self.bus.publish(TURN_CHANNEL, notify_payload(event))
+        else:
+            self.publish(event)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.stats["published"] += 1
+            self.stats["delivered"] += len(subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop = None) -> Optional[Subscription]:
+        """New subscription (pass the running loop from async servers); None when full"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.stats["rejected"] += 1
+                return None
+            subscription = Subscription(self, self.max_buffer, loop)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, subscribers=len(self._subscribers), cross_worker=self.bus is not None)
@@ -6,20 +6,373 @@ Database-based memory system with smart conversation flow detection,
 render tracking, and progressive engagement logic.
 """
 
+import base64
+import copy
 import json
 import uuid
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+try:
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.pool
+    from psycopg2.extras import RealDictCursor
+except ImportError:  # SQLite and in-memory backends work without the Postgres driver
+    psycopg2 = None
+    RealDictCursor = None
 import os
 import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from funnel_analytics_spa import INSERT_FUNNEL_EVENT_SQL, funnel_event_rows, funnel_report, rollup_funnel
+from invalidation_bus_spa import MEMORY_CHANNEL, parse_memory_event
+from lead_segments_spa import LeadSegment, lead_row, leads_query
+from memory_cache_spa import MemoryReadCache
+from memory_codec_spa import HISTORY_FIELDS, apply_history_blob, decode_history, encode_history, history_codec
+from schema_migrations_spa import ensure_schema
+from turn_log_spa import (
+    INSERT_TURN_SQL, create_turn_partition, drop_expired_turn_partitions, ensure_turn_partitions,
+    search_turns_query, turn_months, turn_rows
+)
 
 logger = logging.getLogger(__name__)
 
+# ============================================================================
+# SQL - shared by the sync manager and the async manager
+# ============================================================================
+
+# Schema DDL lives in migrations/ (see schema_migrations_spa)
+
+# Compare-and-swap upsert: only lands if the stored version matches (last parameter)
+SAVE_MEMORY_SQL = """
+    INSERT INTO user_memories 
+    (user_id, last_updated, interactions, key_facts, conversation_summary, 
+     preferences, buyer_stage, engagement_level, render_requested, 
+     render_status, render_details, contact_info, cta_attempts, last_cta_attempt, reset_at, history, version)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1)
+    ON CONFLICT (user_id) DO UPDATE SET
+        last_updated = EXCLUDED.last_updated,
+        interactions = EXCLUDED.interactions,
+        key_facts = EXCLUDED.key_facts,
+        conversation_summary = EXCLUDED.conversation_summary,
+        preferences = EXCLUDED.preferences,
+        buyer_stage = EXCLUDED.buyer_stage,
+        engagement_level = EXCLUDED.engagement_level,
+        render_requested = EXCLUDED.render_requested,
+        render_status = EXCLUDED.render_status,
+        render_details = EXCLUDED.render_details,
+        contact_info = EXCLUDED.contact_info,
+        cta_attempts = EXCLUDED.cta_attempts,
+        last_cta_attempt = EXCLUDED.last_cta_attempt,
+        reset_at = EXCLUDED.reset_at,
+        history = EXCLUDED.history,
+        version = user_memories.version + 1
+    WHERE user_memories.version = %s
+    RETURNING version
+"""
+
+# Expiry in short batches: each statement locks at most batch-size rows and never
+# waits on a row a chat save is holding
+CLEANUP_EXPIRED_SQL = """
+    DELETE FROM user_memories WHERE user_id IN (
+        SELECT user_id FROM user_memories
+        WHERE last_updated < %s
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+# Admin feed: only the last message pair and the turn count leave the database.
+# Compact-codec rows keep their history in the blob, so that comes back instead.
+# Keyset pagination on (last_updated, user_id) - see migration 0006.
+RECENT_CONVERSATIONS_SQL = """
+    SELECT user_id,
+           last_updated,
+           jsonb_array_length(interactions),
+           interactions->-1->>'user',
+           interactions->-1->>'bot',
+           history
+    FROM user_memories
+    WHERE (jsonb_array_length(interactions) > 0 OR history IS NOT NULL){before}
+    ORDER BY last_updated DESC, user_id DESC
+    LIMIT %s
+"""
+FEED_BEFORE_CLAUSE = "\n      AND (last_updated, user_id) < (%s::timestamp, %s)"
+FEED_MAX_LIMIT = 500
+
+JSONB_COLUMNS = ("interactions", "key_facts", "preferences", "render_details", "contact_info", "cta_attempts")
+TIMESTAMP_COLUMNS = ("created_at", "last_updated", "last_cta_attempt", "reset_at")
+MEMORY_COLUMNS = (
+    "user_id", "created_at", "last_updated", "interactions", "key_facts", "conversation_summary",
+    "preferences", "buyer_stage", "engagement_level", "render_requested", "render_status",
+    "render_details", "contact_info", "cta_attempts", "last_cta_attempt", "reset_at", "version"
+)
+# Explicit columns, not *: a prepared statement (or asyncpg's statement cache) fails
+# with "cached plan must not change result type" once a migration adds a column
+LOAD_MEMORY_SQL = f"SELECT {', '.join(MEMORY_COLUMNS)}, history FROM user_memories WHERE user_id = %s"
+# Written together: the JSONB arrays and the compact blob must never disagree
+HISTORY_COLUMNS = ("interactions", "cta_attempts", "history")
+# Columns a partial save may write (identity, creation time and version are managed by SQL)
+UPDATABLE_COLUMNS = tuple(c for c in MEMORY_COLUMNS if c not in ("user_id", "created_at", "last_updated", "version"))
+
+@lru_cache(maxsize=32)
+def projected_load_sql(fields: Tuple[str, ...]) -> str:
+    """
+    SELECT for a subset of columns with the expiry check in the predicate
+
+    An expired row still returns its version (so a fresh memory can overwrite
+    it) but none of its data; ``live`` tells the two cases apart. JSONB columns
+    come back as text so they are only decoded if the caller touches them.
+    Both histories must be projected together, since a save writes them together.
+    """
+    unknown = set(fields) - set(MEMORY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown memory fields: {sorted(unknown)}")
+    if len(set(fields) & set(HISTORY_FIELDS)) == 1:
+        raise ValueError(f"Project both history fields or neither: {HISTORY_FIELDS}")
+    columns = ", ".join(f"m.{f}::text AS {f}" if f in JSONB_COLUMNS else f"m.{f}"
+                        for f in fields if f not in ("user_id", "version", "last_updated"))
+    if set(fields) & set(HISTORY_FIELDS):
+        columns += ", m.history"
+    return f"""
+        SELECT m.version, p.*
+        FROM user_memories m
+        LEFT JOIN LATERAL (
+            SELECT TRUE AS live, m.last_updated{", " + columns if columns else ""}
+            WHERE m.last_updated >= %s
+        ) p ON TRUE
+        WHERE m.user_id = %s
+    """
+
+def partial_save_sql(columns: Tuple[str, ...]) -> str:
+    """Compare-and-swap UPDATE of only the given columns (params: last_updated, *columns, user_id, version)"""
+    assignments = "".join(f", {c} = %s" for c in columns)
+    return f"""
+        UPDATE user_memories SET last_updated = %s{assignments}, version = version + 1
+        WHERE user_id = %s AND version = %s
+        RETURNING version
+    """
+
+# Cache invalidation event, sent in the saving transaction (see invalidation_bus_spa)
+NOTIFY_MEMORY_SQL = "SELECT pg_notify('user_memories', %s)"
+
+def to_numbered_sql(sql: str) -> str:
+    """Rewrite %s placeholders as $1..$n (PREPARE / asyncpg syntax)"""
+    counter = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", sql)
+
+# Hot-path statements, prepared once per pooled connection
+PREPARED_STATEMENTS = {
+    "spa_load_memory": LOAD_MEMORY_SQL,
+    "spa_save_memory": SAVE_MEMORY_SQL,
+    "spa_notify_memory": NOTIFY_MEMORY_SQL,
+}
+
+def execute_prepared_sql(name: str) -> str:
+    """EXECUTE statement for a prepared name, with %s placeholders for psycopg2"""
+    params = ", ".join(["%s"] * PREPARED_STATEMENTS[name].count("%s"))
+    return f"EXECUTE {name} ({params})"
+
+EXECUTE_LOAD_SQL = execute_prepared_sql("spa_load_memory")
+EXECUTE_SAVE_SQL = execute_prepared_sql("spa_save_memory")
+EXECUTE_NOTIFY_SQL = execute_prepared_sql("spa_notify_memory")
+
+def encode_feed_cursor(ts: str, user_id: str) -> str:
+    """Opaque 'before' cursor for the admin feed from the last item of a page"""
+    return base64.urlsafe_b64encode(f"{ts}|{user_id}".encode()).decode().rstrip("=")
+
+def decode_feed_cursor(cursor: str) -> Tuple[str, str]:
+    """'before' cursor -> (last_updated ISO string, user_id)"""
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except Exception:
+        raise ValueError("Invalid feed cursor")
+    ts, sep, user_id = decoded.partition("|")
+    if not sep or not ts:
+        raise ValueError("Invalid feed cursor")
+    return ts, user_id
+
+if psycopg2 is not None:
+    class PreparedConnection(psycopg2.extensions.connection):
+        """Pooled connection that remembers whether the hot-path statements are prepared"""
+        prepared = False
+
+def new_memory_document(user_id: str) -> Dict[str, Any]:
+    """Fresh memory document - the dict shape every storage backend returns"""
+    return {
+        "user_id": user_id,
+        "created_at": datetime.now().isoformat(),
+        "last_updated": datetime.now().isoformat(),
+        "interactions": [],
+        "key_facts": {},
+        "conversation_summary": "",
+        "preferences": {},
+        "buyer_stage": "browsing",
+        "engagement_level": 1,
+        "render_requested": False,
+        "render_status": None,
+        "render_details": {},
+        "contact_info": {},
+        "cta_attempts": [],
+        "last_cta_attempt": None,
+        "reset_at": None,
+        "version": 0
+    }
+
+class LazyMemory(dict):
+    """
+    Memory document from a projected load
+
+    JSONB fields stay as JSON text until first read, and only the projected
+    columns are present. Saving writes back just the fields that were decoded
+    or assigned, so columns that were never loaded (or never touched) are left
+    as stored.
+    """
+
+    def __init__(self, values: Dict[str, Any], raw: Dict[str, Optional[str]], defaults: Dict[str, Any]):
+        super().__init__(values)
+        self._raw = raw
+        self._defaults = defaults
+
+    def _decode(self, key: str) -> Any:
+        text = self._raw.pop(key)
+        value = json.loads(text) if text is not None else copy.deepcopy(self._defaults[key])
+        dict.__setitem__(self, key, value)
+        return value
+
+    def __missing__(self, key: str) -> Any:
+        if key in self._raw:
+            return self._decode(key)
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._raw or dict.__contains__(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._raw.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._raw:
+            return self._decode(key)
+        return dict.get(self, key, default)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key in self._raw:
+            return self._decode(key)
+        return dict.setdefault(self, key, default)
+
+    def materialize(self) -> "LazyMemory":
+        """Decode every remaining JSON field"""
+        for key in list(self._raw):
+            self._decode(key)
+        return self
+
+    # Whole-document views (json.dumps, dict(), iteration) see decoded values
+    def keys(self):
+        return dict.keys(self.materialize())
+
+    def items(self):
+        return dict.items(self.materialize())
+
+    def values(self):
+        return dict.values(self.materialize())
+
+    def __iter__(self):
+        return dict.__iter__(self.materialize())
+
+    def __len__(self) -> int:
+        return dict.__len__(self) + len(self._raw)
+
+    def __deepcopy__(self, memo) -> Dict[str, Any]:
+        return copy.deepcopy(dict(self.materialize()), memo)
+
+    def dirty_columns(self) -> Tuple[str, ...]:
+        """Updatable columns that were decoded or assigned since the load"""
+        columns = tuple(c for c in UPDATABLE_COLUMNS if dict.__contains__(self, c))
+        if set(columns) & set(HISTORY_FIELDS):
+            # Either history changing rewrites both arrays and the blob, in whichever codec is active
+            columns = tuple(c for c in columns if c not in HISTORY_FIELDS) + HISTORY_COLUMNS
+        return columns
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    """datetime from a stored column or an ISO string (None if missing or malformed)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def merge_concurrent_memory(memory: Dict[str, Any], stored: Dict[str, Any], max_interactions: int) -> None:
+    """
+    Fold a concurrently saved memory document into the in-flight one
+    
+    Interactions and CTA attempts from both sides are kept (deduplicated by
+    timestamp), fact dictionaries are unioned with the in-flight values winning,
+    and the version is advanced to the stored one so the next save can land.
+
+    A reset (reset_at) is never undone by the merge: turns from before the
+    newest reset on either side are dropped, and if the stored side holds a
+    reset the in-flight document hasn't seen, its cleared facts, summary,
+    stage and engagement replace the in-flight ones.
+    """
+    def union(theirs: List[Dict], ours: List[Dict], key_fields: Tuple[str, ...]) -> List[Dict]:
+        seen = {tuple(item.get(f) for f in key_fields) for item in theirs}
+        merged = list(theirs)
+        for item in ours:
+            if tuple(item.get(f) for f in key_fields) not in seen:
+                merged.append(item)
+        return sorted(merged, key=lambda item: item.get("timestamp") or "")
+
+    def since(items: List[Dict], cutoff: Optional[datetime]) -> List[Dict]:
+        if cutoff is None:
+            return items
+        return [item for item in items if (_as_datetime(item.get("timestamp")) or cutoff) > cutoff]
+
+    our_reset, their_reset = _as_datetime(memory.get("reset_at")), _as_datetime(stored.get("reset_at"))
+    newest_reset = max((r for r in (our_reset, their_reset) if r), default=None)
+
+    interactions = since(union(stored.get("interactions") or [], memory.get("interactions", []), ("timestamp", "user")),
+                         newest_reset)
+    memory["interactions"] = interactions[-max_interactions:]
+    memory["cta_attempts"] = since(
+        union(stored.get("cta_attempts") or [], memory.get("cta_attempts", []), ("timestamp", "type")), newest_reset
+    )
+    memory["contact_info"] = {**(stored.get("contact_info") or {}), **memory.get("contact_info", {})}
+    memory["version"] = stored.get("version") or 0
+
+    if their_reset and (our_reset is None or their_reset > our_reset):
+        # Reset since we loaded: the reset document is authoritative
+        memory["reset_at"] = their_reset.isoformat()
+        memory["key_facts"] = stored.get("key_facts") or {}
+        memory["conversation_summary"] = stored.get("conversation_summary") or ""
+        memory["buyer_stage"] = stored.get("buyer_stage") or "browsing"
+        memory["engagement_level"] = stored.get("engagement_level") or 1
+        return
+    if our_reset and (their_reset is None or our_reset > their_reset):
+        # We are the reset: keep our cleared fields
+        return
+
+    stored_facts = stored.get("key_facts") or {}
+    key_facts = {**stored_facts, **memory.get("key_facts", {})}
+    features = list(stored_facts.get("features", []))
+    for feature in memory.get("key_facts", {}).get("features", []):
+        if feature not in features:
+            features.append(feature)
+    if features:
+        key_facts["features"] = features
+    memory["key_facts"] = key_facts
+    memory["engagement_level"] = max(memory.get("engagement_level", 1), stored.get("engagement_level") or 1)
+
 class EnhancedMemoryManager:
-    def __init__(self, database_url: str = None, max_interactions: int = 15, expiry_days: int = 90):
+    def __init__(self, database_url: str = None, max_interactions: int = 15, expiry_days: int = 90,
+                 max_save_retries: int = 3, cache_ttl: float = None, notify_changes: bool = None,
+                 pool_size: int = None, prepare_statements: bool = None, turn_log: bool = None,
+                 cleanup_batch_size: int = 5000, funnel_events: bool = None):
         """
         Initialize Enhanced Memory Manager with buyer journey intelligence
         
@@ -27,59 +380,130 @@ class EnhancedMemoryManager:
             database_url: PostgreSQL connection URL
             max_interactions: Maximum interactions to keep per user
             expiry_days: Days after which user memory expires
+            max_save_retries: Merge-and-retry attempts when a save hits a version conflict
+            cache_ttl: Seconds to serve loads from the read cache (default MEMORY_CACHE_TTL, 0 = off)
+            notify_changes: NOTIFY user_memories on every save (default MEMORY_NOTIFY, on)
+            pool_size: Pooled connections per process (default MEMORY_DB_POOL_SIZE, 10; 0 = connect per call).
+                Threads beyond this wait up to MEMORY_DB_POOL_TIMEOUT seconds (30) for a free connection
+            prepare_statements: PREPARE the load/save statements on each pooled connection
+                (default MEMORY_DB_PREPARE, on; turn off behind a transaction-mode pgbouncer)
+            turn_log: Append every turn to the partitioned conversation_turns log (default MEMORY_TURN_LOG, on)
+            cleanup_batch_size: Rows per DELETE when expiring memories
+            funnel_events: Record stage transitions / CTA impressions for /admin/funnel
+                (default MEMORY_FUNNEL_EVENTS, on)
         """
-        self.database_url = database_url or os.getenv("DATABASE_URL")
-        self.max_interactions = max_interactions
-        self.expiry_days = expiry_days
+        self._configure(database_url=database_url, max_interactions=max_interactions, expiry_days=expiry_days,
+                        max_save_retries=max_save_retries, cache_ttl=cache_ttl, notify_changes=notify_changes,
+                        pool_size=pool_size, turn_log=turn_log, cleanup_batch_size=cleanup_batch_size,
+                        funnel_events=funnel_events)
+        if prepare_statements is None:
+            prepare_statements = os.getenv("MEMORY_DB_PREPARE", "1") == "1"
+        self.prepare_statements = prepare_statements and self.pool_size > 0
+        self.pool_timeout = float(os.getenv("MEMORY_DB_POOL_TIMEOUT", 30))
+        self._pool = None
+        self._pool_pid = None
+        self._pool_slots = None
+        self._pool_lock = threading.Lock()
         
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable is required")
+        if psycopg2 is None:
+            raise ImportError("psycopg2 is required for the Postgres memory backend")
             
         self._init_database()
         logger.info("EnhancedMemoryManager initialized successfully")
 
-    def _get_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.database_url)
+    def _configure(self, database_url: Optional[str] = None, max_interactions: int = 15, expiry_days: int = 90,
+                   max_save_retries: int = 3, cache_ttl: Optional[float] = None, notify_changes: Optional[bool] = None,
+                   pool_size: Optional[int] = None, turn_log: Optional[bool] = None, cleanup_batch_size: int = 5000,
+                   funnel_events: Optional[bool] = None) -> None:
+        """Options every manager shares (sync, async, SQLite); None falls back to the environment"""
+        self.database_url = database_url or os.getenv("DATABASE_URL")
+        self.max_interactions = max_interactions
+        self.expiry_days = expiry_days
+        self.max_save_retries = max_save_retries
+        self.pool_size = int(os.getenv("MEMORY_DB_POOL_SIZE", 10)) if pool_size is None else pool_size
+        self.history_codec = history_codec()
+        self.turn_log = os.getenv("MEMORY_TURN_LOG", "1") == "1" if turn_log is None else turn_log
+        self.cleanup_batch_size = cleanup_batch_size
+        self.funnel_events = os.getenv("MEMORY_FUNNEL_EVENTS", "1") == "1" if funnel_events is None else funnel_events
+        self.notify_changes = os.getenv("MEMORY_NOTIFY", "1") == "1" if notify_changes is None else notify_changes
+
+        # Optimistic concurrency counters (see save_memory)
+        self._stats_lock = threading.Lock()
+        self.conflict_stats = {"conflicts": 0, "merged": 0, "failed": 0}
+        self.turn_log_stats = {"repaired": 0, "failed": 0}
+        self._init_cache(cache_ttl)
+
+    def _init_cache(self, cache_ttl: Optional[float]) -> None:
+        """Optional per-process read cache in front of the store"""
+        if cache_ttl is None:
+            cache_ttl = float(os.getenv("MEMORY_CACHE_TTL", 0))
+        self.cache = (MemoryReadCache(cache_ttl, int(os.getenv("MEMORY_CACHE_SIZE", 10000)), MEMORY_COLUMNS)
+                      if cache_ttl > 0 else None)
+
+    def _get_pool(self):
+        """Connection pool for this process (recreated after a fork)"""
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        1, self.pool_size, self.database_url, connection_factory=PreparedConnection
+                    )
+                    # getconn() raises PoolError when every connection is out; callers queue here instead
+                    self._pool_slots = threading.BoundedSemaphore(self.pool_size)
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _prepare(self, conn) -> None:
+        """PREPARE the hot-path statements once per session"""
+        with conn.cursor() as cur:
+            for name, sql in PREPARED_STATEMENTS.items():
+                cur.execute(f"PREPARE {name} AS {to_numbered_sql(sql)}")
+        conn.commit()
+        conn.prepared = True
+
+    @contextmanager
+    def _get_connection(self, prepare: bool = True):
+        """Database connection (pooled), committed on success and rolled back on error"""
+        if not self.pool_size:
+            conn = psycopg2.connect(self.database_url)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+            return
+
+        pool = self._get_pool()
+        slots = self._pool_slots
+        if not slots.acquire(timeout=self.pool_timeout):
+            raise psycopg2.pool.PoolError(f"No pooled connection free after {self.pool_timeout:g}s")
+        try:
+            conn = pool.getconn()
+            try:
+                if prepare and self.prepare_statements and not conn.prepared:
+                    self._prepare(conn)
+                with conn:
+                    yield conn
+            finally:
+                pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            slots.release()
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.closeall()
+        self._pool = None
 
     def _init_database(self):
-        """Create necessary database tables"""
+        """Verify the schema version (migrations apply once per deploy)"""
         try:
-            with self._get_connection() as conn:
-                with conn.cursor() as cur:
-                    # Enhanced user_memories table
-                    cur.execute("""
-                        CREATE TABLE IF NOT EXISTS user_memories (
-                            user_id VARCHAR(50) PRIMARY KEY,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            interactions JSONB DEFAULT '[]',
-                            key_facts JSONB DEFAULT '{}',
-                            conversation_summary TEXT DEFAULT '',
-                            preferences JSONB DEFAULT '{}',
-                            buyer_stage VARCHAR(50) DEFAULT 'browsing',
-                            engagement_level INT DEFAULT 1,
-                            render_requested BOOLEAN DEFAULT FALSE,
-                            render_status VARCHAR(50) DEFAULT NULL,
-                            render_details JSONB DEFAULT '{}',
-                            contact_info JSONB DEFAULT '{}',
-                            cta_attempts JSONB DEFAULT '[]',
-                            last_cta_attempt TIMESTAMP DEFAULT NULL
-                        )
-                    """)
-                    
-                    # Create indexes
-                    cur.execute("""
-                        CREATE INDEX IF NOT EXISTS idx_user_memories_last_updated 
-                        ON user_memories(last_updated)
-                    """)
-                    cur.execute("""
-                        CREATE INDEX IF NOT EXISTS idx_user_memories_buyer_stage 
-                        ON user_memories(buyer_stage)
-                    """)
-                    
-                conn.commit()
-                logger.info("Enhanced database tables initialized")
+            # Not prepared yet: on a fresh database the table doesn't exist until migrations run
+            with self._get_connection(prepare=False) as conn:
+                version = ensure_schema(conn)
+                logger.info(f"Enhanced database schema at version {version}")
                 
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
@@ -89,113 +513,365 @@ class EnhancedMemoryManager:
         """Generate a unique user ID"""
         return str(uuid.uuid4())[:8]
 
-    def load_memory(self, user_id: Optional[str] = None) -> Dict[str, Any]:
-        """Load enhanced user memory from database"""
+    def _default_memory(self, user_id: str) -> Dict[str, Any]:
+        """Fresh memory document for a new (or expired) user"""
+        return new_memory_document(user_id)
+
+    def _row_to_memory(self, result: Optional[Dict[str, Any]], default_memory: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a stored row into a memory document (expiry check, ISO dates, defaults)"""
+        if not result:
+            return default_memory
+            
+        user_id = default_memory["user_id"]
+        
+        # Check if memory has expired
+        if datetime.now() - result['last_updated'] > timedelta(days=self.expiry_days):
+            logger.info(f"Memory expired for user {user_id}")
+            # Keep the stored version so the fresh memory can overwrite the row
+            default_memory["version"] = result.get("version") or 0
+            return default_memory
+            
+        memory = dict(result)
+        # Convert datetime objects to ISO strings
+        for key in TIMESTAMP_COLUMNS:
+            if isinstance(memory.get(key), datetime):
+                memory[key] = memory[key].isoformat()
+        
+        # Ensure defaults for new fields
+        for key, default_value in default_memory.items():
+            if key not in memory or memory[key] is None:
+                memory[key] = default_value
+                
+        logger.info(f"Loaded memory for user {user_id}: stage={memory.get('buyer_stage')}, engagement={memory.get('engagement_level')}")
+        return memory
+
+    def load_memory(self, user_id: Optional[str] = None, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """
+        Load enhanced user memory (read cache first, then the database)
+        
+        Args:
+            user_id: Visitor id (generated if missing)
+            fields: Only load these columns (e.g. chat_pipeline_spa.CHAT_MEMORY_FIELDS) as a LazyMemory;
+                None loads the full document
+        """
         if not user_id:
             user_id = self._generate_user_id()
             logger.info(f"Generated new user_id: {user_id}")
 
-        default_memory = {
-            "user_id": user_id,
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat(),
-            "interactions": [],
-            "key_facts": {},
-            "conversation_summary": "",
-            "preferences": {},
-            "buyer_stage": "browsing",
-            "engagement_level": 1,
-            "render_requested": False,
-            "render_status": None,
-            "render_details": {},
-            "contact_info": {},
-            "cta_attempts": [],
-            "last_cta_attempt": None
-        }
+        if cached := self._from_cache(user_id, fields):
+            return cached
+            
+        memory = self._load_from_store(user_id, fields)
+        self._cache_loaded(memory)
+        return memory
+
+    def _from_cache(self, user_id: str, fields: Optional[Tuple[str, ...]]) -> Optional[Dict[str, Any]]:
+        """Cached document holding fields, or None"""
+        if not self.cache or not (cached := self.cache.get(user_id, fields)):
+            return None
+        if not self.cache.is_full(cached):
+            # Partial entry: saving it must only write the columns it holds
+            return LazyMemory(cached, {}, self._default_memory(user_id))
+        return cached
+
+    def _cache_loaded(self, memory: Dict[str, Any]) -> None:
+        # Projected loads are cached by their save, once the turn has decoded what it needs
+        if self.cache and memory.get("version") and not isinstance(memory, LazyMemory):
+            self.cache.put(memory)
+
+    def _cache_saved(self, memory: Dict[str, Any], saved: bool) -> None:
+        if self.cache:
+            if saved:
+                self.cache.put(memory)
+            else:
+                self.cache.evict(memory["user_id"])
+
+    def _load_from_store(self, user_id: str, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """Load enhanced user memory from database"""
+        default_memory = self._default_memory(user_id)
 
         try:
             with self._get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT * FROM user_memories WHERE user_id = %s", (user_id,))
-                    result = cur.fetchone()
-                    
-                    if result:
-                        # Check if memory has expired
-                        if datetime.now() - result['last_updated'] > timedelta(days=self.expiry_days):
-                            logger.info(f"Memory expired for user {user_id}")
-                            return default_memory
-                            
-                        memory = dict(result)
-                        # Convert datetime objects to ISO strings
-                        for key in ['created_at', 'last_updated', 'last_cta_attempt']:
-                            if memory[key]:
-                                memory[key] = memory[key].isoformat() if isinstance(memory[key], datetime) else memory[key]
-                        
-                        # Ensure defaults for new fields
-                        for key, default_value in default_memory.items():
-                            if key not in memory or memory[key] is None:
-                                memory[key] = default_value
-                                
-                        logger.info(f"Loaded memory for user {user_id}: stage={memory.get('buyer_stage')}, engagement={memory.get('engagement_level')}")
-                        return memory
-                    else:
-                        return default_memory
+                    if fields:
+                        return self._load_projected(cur, user_id, tuple(fields), default_memory)
+                    return self._row_to_memory(self._fetch_row(cur, user_id), default_memory)
                         
         except Exception as e:
             logger.error(f"Error loading memory for {user_id}: {e}")
             return default_memory
 
-    def save_memory(self, memory: Dict[str, Any]) -> None:
-        """Save enhanced user memory to database"""
+    def _load_projected(self, cur, user_id: str, fields: Tuple[str, ...],
+                        default_memory: Dict[str, Any]) -> Dict[str, Any]:
+        """Column-projected load; expiry is decided by the database"""
+        cur.execute(projected_load_sql(fields), (datetime.now() - timedelta(days=self.expiry_days), user_id))
+        return self._projected_memory(cur.fetchone(), user_id, fields, default_memory)
+
+    def _projected_memory(self, row: Optional[Dict[str, Any]], user_id: str, fields: Tuple[str, ...],
+                          default_memory: Dict[str, Any]) -> Dict[str, Any]:
+        """LazyMemory from a projected_load_sql row (default_memory if there is none or it expired)"""
+        if not row:
+            return default_memory
+        if not row["live"]:
+            logger.info(f"Memory expired for user {user_id}")
+            default_memory["version"] = row["version"]
+            return default_memory
+
+        values = {"user_id": user_id, "version": row["version"]}
+        raw = {}
+        for key in fields:
+            value = row.get(key)
+            if key in JSONB_COLUMNS:
+                raw[key] = value
+            elif isinstance(value, datetime):
+                values[key] = value.isoformat()
+            elif value is None:
+                values[key] = default_memory.get(key)
+            else:
+                values[key] = value
+        if row.get("history") is not None:
+            values["interactions"], values["cta_attempts"] = decode_history(row["history"])
+            for key in HISTORY_FIELDS:
+                raw.pop(key, None)
+        values["last_updated"] = row["last_updated"].isoformat()
+        return LazyMemory(values, raw, default_memory)
+
+    def _fetch_row(self, cur, user_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch the raw stored row for a user (no expiry check)"""
+        cur.execute(EXECUTE_LOAD_SQL if self.prepare_statements else LOAD_MEMORY_SQL, (user_id,))
+        return apply_history_blob(cur.fetchone())
+
+    def save_memory(self, memory: Dict[str, Any]) -> bool:
+        """
+        Save enhanced user memory to database with optimistic concurrency control
+        
+        The write only lands if the stored row still has the version the memory was
+        loaded with. On a conflict the stored row is re-read, the concurrent changes
+        are merged in and the save is retried (bounded by max_save_retries).
+        
+        Returns:
+            True if the memory was persisted
+        """
         user_id = memory.get("user_id")
         if not user_id:
             logger.error("Cannot save memory without user_id")
-            return
+            return False
+
+        saved = self._save_to_store(memory)
+        self._cache_saved(memory, saved)
+        return saved
 
+    def _save_to_store(self, memory: Dict[str, Any]) -> bool:
+        """Compare-and-swap write with bounded merge-and-retry"""
+        user_id = memory["user_id"]
         try:
             with self._get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        INSERT INTO user_memories 
-                        (user_id, last_updated, interactions, key_facts, conversation_summary, 
-                         preferences, buyer_stage, engagement_level, render_requested, 
-                         render_status, render_details, contact_info, cta_attempts, last_cta_attempt)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (user_id) DO UPDATE SET
-                            last_updated = EXCLUDED.last_updated,
-                            interactions = EXCLUDED.interactions,
-                            key_facts = EXCLUDED.key_facts,
-                            conversation_summary = EXCLUDED.conversation_summary,
-                            preferences = EXCLUDED.preferences,
-                            buyer_stage = EXCLUDED.buyer_stage,
-                            engagement_level = EXCLUDED.engagement_level,
-                            render_requested = EXCLUDED.render_requested,
-                            render_status = EXCLUDED.render_status,
-                            render_details = EXCLUDED.render_details,
-                            contact_info = EXCLUDED.contact_info,
-                            cta_attempts = EXCLUDED.cta_attempts,
-                            last_cta_attempt = EXCLUDED.last_cta_attempt
-                    """, (
-                        user_id,
-                        datetime.now(),
-                        json.dumps(memory.get("interactions", [])),
-                        json.dumps(memory.get("key_facts", {})),
-                        memory.get("conversation_summary", ""),
-                        json.dumps(memory.get("preferences", {})),
-                        memory.get("buyer_stage", "browsing"),
-                        memory.get("engagement_level", 1),
-                        memory.get("render_requested", False),
-                        memory.get("render_status"),
-                        json.dumps(memory.get("render_details", {})),
-                        json.dumps(memory.get("contact_info", {})),
-                        json.dumps(memory.get("cta_attempts", [])),
-                        datetime.fromisoformat(memory["last_cta_attempt"]) if memory.get("last_cta_attempt") else None
-                    ))
-                conn.commit()
-                logger.info(f"Saved memory for user {user_id}")
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    for attempt in range(self.max_save_retries + 1):
+                        new_version = self._compare_and_swap(cur, memory)
+                        if new_version is not None:
+                            self._log_turns(cur, memory)
+                            self._log_funnel_events(cur, memory)
+                            if self.notify_changes:
+                                cur.execute(EXECUTE_NOTIFY_SQL if self.prepare_statements else NOTIFY_MEMORY_SQL,
+                                            (f"{user_id}:{new_version}",))
+                            conn.commit()
+                            memory.pop("pending_turns", None)
+                            memory.pop("pending_events", None)
+                            memory["version"] = new_version
+                            logger.info(f"Saved memory for user {user_id} (version {new_version})")
+                            return True
+                        
+                        # Someone else saved since we loaded - merge their changes and retry
+                        self._handle_conflict(memory, self._fetch_row(cur, user_id), attempt)
+                        
+                conn.rollback()
+                self._give_up_save(user_id)
+                return False
                 
         except Exception as e:
             logger.error(f"Error saving memory for {user_id}: {e}")
+            return False
+
+    def _log_turns(self, cur, memory: Dict[str, Any]) -> None:
+        """Append this save's new turns to conversation_turns (same transaction)"""
+        pending = memory.get("pending_turns")
+        if not pending:
+            return
+        rows = turn_rows(memory["user_id"], memory.get("buyer_stage"), pending)
+        # A turn log failure must not cost the visitor their memory save
+        cur.execute("SAVEPOINT turn_log")
+        try:
+            cur.executemany(INSERT_TURN_SQL, rows)
+        except Exception as first_error:
+            cur.execute("ROLLBACK TO SAVEPOINT turn_log")
+            # Usually the month's partition is missing because partition upkeep didn't run
+            try:
+                for month in turn_months(pending):
+                    create_turn_partition(cur, month)
+                cur.executemany(INSERT_TURN_SQL, rows)
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT turn_log")
+                self._turn_log_failed(memory["user_id"], len(pending), e)
+                return
+            self._turn_log_repaired(memory["user_id"], first_error)
+        cur.execute("RELEASE SAVEPOINT turn_log")
+
+    def _turn_log_repaired(self, user_id: str, error: Exception) -> None:
+        with self._stats_lock:
+            self.turn_log_stats["repaired"] += 1
+        logger.warning(f"Turn log insert for {user_id} failed ({error}); created the missing partition(s)")
+
+    def _turn_log_failed(self, user_id: str, count: int, error: Exception) -> None:
+        with self._stats_lock:
+            self.turn_log_stats["failed"] += 1
+        logger.error(f"Could not log {count} turn(s) for {user_id}: {error}")
+
+    def get_turn_log_stats(self) -> Dict[str, int]:
+        """Turn log inserts that needed a partition created / that were dropped, for this process"""
+        with self._stats_lock:
+            return dict(self.turn_log_stats)
+
+    def _log_funnel_events(self, cur, memory: Dict[str, Any]) -> None:
+        """Queue this save's stage transitions / CTA impressions for the funnel rollup (same transaction)"""
+        pending = memory.get("pending_events")
+        if not pending:
+            return
+        cur.execute("SAVEPOINT funnel_events")
+        try:
+            cur.executemany(INSERT_FUNNEL_EVENT_SQL, funnel_event_rows(pending))
+            cur.execute("RELEASE SAVEPOINT funnel_events")
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT funnel_events")
+            logger.warning(f"Could not record {len(pending)} funnel event(s) for {memory['user_id']}: {e}")
+
+    def _save_params(self, memory: Dict[str, Any]) -> Tuple:
+        """Parameters for SAVE_MEMORY_SQL"""
+        interactions = memory.get("interactions", [])
+        cta_attempts = memory.get("cta_attempts", [])
+        history = None
+        if self.history_codec == "compact":
+            history = encode_history(interactions, cta_attempts)
+            interactions, cta_attempts = [], []
+        return (
+            memory["user_id"],
+            datetime.now(),
+            json.dumps(interactions),
+            json.dumps(memory.get("key_facts", {})),
+            memory.get("conversation_summary", ""),
+            json.dumps(memory.get("preferences", {})),
+            memory.get("buyer_stage", "browsing"),
+            memory.get("engagement_level", 1),
+            memory.get("render_requested", False),
+            memory.get("render_status"),
+            json.dumps(memory.get("render_details", {})),
+            json.dumps(memory.get("contact_info", {})),
+            json.dumps(cta_attempts),
+            datetime.fromisoformat(memory["last_cta_attempt"]) if memory.get("last_cta_attempt") else None,
+            datetime.fromisoformat(memory["reset_at"]) if memory.get("reset_at") else None,
+            history,
+            memory.get("version", 0)
+        )
+
+    def _partial_save_params(self, memory: "LazyMemory", columns: Tuple[str, ...]) -> Tuple:
+        """Parameters for partial_save_sql(columns)"""
+        values = []
+        compact = self.history_codec == "compact"
+        for column in columns:
+            if column == "history":
+                values.append(encode_history(memory.get("interactions", []), memory.get("cta_attempts", []))
+                              if compact else None)
+                continue
+            value = memory[column]
+            if column in HISTORY_FIELDS and compact:
+                value = []
+            if column in JSONB_COLUMNS:
+                value = json.dumps(value)
+            elif column in TIMESTAMP_COLUMNS and value:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return (datetime.now(), *values, memory["user_id"], memory.get("version", 0))
+
+    def _partial_save(self, memory: "LazyMemory") -> Tuple[str, Tuple]:
+        """partial_save_sql and its parameters for the columns a projected memory changed"""
+        columns = memory.dirty_columns()
+        return partial_save_sql(columns), self._partial_save_params(memory, columns)
+
+    def _compare_and_swap(self, cur, memory: Dict[str, Any]) -> Optional[int]:
+        """
+        Insert or update the row only if its version matches memory["version"]
+        
+        Returns:
+            The new row version, or None if another writer got there first
+        """
+        if isinstance(memory, LazyMemory):
+            cur.execute(*self._partial_save(memory))
+        else:
+            cur.execute(EXECUTE_SAVE_SQL if self.prepare_statements else SAVE_MEMORY_SQL, self._save_params(memory))
+        row = cur.fetchone()
+        return row["version"] if row else None
+
+    def _handle_conflict(self, memory: Dict[str, Any], stored: Optional[Dict[str, Any]], attempt: int) -> None:
+        """Count a version conflict and merge the stored row into the in-flight memory"""
+        self._bump_stat("conflicts")
+        if stored:
+            self._merge_concurrent(memory, stored)
+            self._bump_stat("merged")
+        logger.info(f"Version conflict saving {memory['user_id']} (attempt {attempt + 1}), merged and retrying")
+
+    def _give_up_save(self, user_id: str) -> None:
+        self._bump_stat("failed")
+        logger.warning(f"Giving up saving memory for {user_id} after {self.max_save_retries} retries")
+
+    def _merge_concurrent(self, memory: Dict[str, Any], stored: Dict[str, Any]) -> None:
+        """Fold a concurrently saved row into the in-flight memory"""
+        merge_concurrent_memory(memory, stored, self.max_interactions)
+
+    def _bump_stat(self, name: str) -> None:
+        """Increment an optimistic concurrency counter"""
+        with self._stats_lock:
+            self.conflict_stats[name] += 1
+
+    def get_conflict_stats(self) -> Dict[str, int]:
+        """Snapshot of save conflict counters for this process"""
+        with self._stats_lock:
+            return dict(self.conflict_stats)
+
+    def attach_invalidation_bus(self, bus) -> None:
+        """Evict read-cache entries when any worker saves a newer version"""
+        if not self.cache:
+            return
+
+        def on_memory_event(payload: str) -> None:
+            self.cache.evict(*parse_memory_event(payload))
+
+        bus.subscribe(MEMORY_CHANNEL, on_memory_event)
+        bus.on_reconnect(self.cache.clear)
+
+    def snapshot_sessions(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Live session documents for MemorySnapshotter (the read cache, if any)"""
+        return self.cache.recent(limit) if self.cache else []
+
+    def warm_sessions(self, memories: List[Dict[str, Any]]) -> int:
+        """Seed the read cache from a snapshot, skipping rows saved since it was taken"""
+        if not self.cache or not memories:
+            return 0
+
+        try:
+            versions = self._stored_versions([memory["user_id"] for memory in memories])
+        except Exception as e:
+            logger.error(f"Error revalidating snapshot sessions: {e}")
+            return 0
+
+        current = [memory for memory in memories if versions.get(memory["user_id"]) == memory.get("version")]
+        return self.cache.warm(current)
+
+    def _stored_versions(self, user_ids: List[str]) -> Dict[str, int]:
+        """user_id -> stored row version, for the users that have a row"""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT user_id, version FROM user_memories WHERE user_id = ANY(%s)", (user_ids,))
+                return dict(cur.fetchall())
 
     def add_interaction(self, memory: Dict[str, Any], user_message: str, bot_response: str) -> None:
         """Add interaction and update buyer intelligence"""
@@ -206,6 +882,9 @@ class EnhancedMemoryManager:
         }
         
         memory["interactions"].append(interaction)
+        if self.turn_log:
+            # Written to the turn log by the next successful save
+            memory.setdefault("pending_turns", []).append(interaction)
         
         # Prune old interactions
         if len(memory["interactions"]) > self.max_interactions:
@@ -514,24 +1193,100 @@ class EnhancedMemoryManager:
         return messages
 
     def cleanup_expired_memories(self) -> int:
-        """Clean up expired user memory records"""
+        """
+        Clean up expired user memory records and turn log partitions
+        
+        Memories are deleted in short batches (cleanup_batch_size rows per
+        transaction); the turn log drops whole monthly partitions past the
+        cutoff and creates the upcoming ones.
+        
+        Returns:
+            Number of expired memory rows deleted
+        """
+        cutoff_date = datetime.now() - timedelta(days=self.expiry_days)
+        cleaned = 0
         try:
-            cutoff_date = datetime.now() - timedelta(days=self.expiry_days)
-            
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute("DELETE FROM user_memories WHERE last_updated < %s", (cutoff_date,))
-                    cleaned = cur.rowcount
-                    conn.commit()
-                    
-                    if cleaned > 0:
-                        logger.info(f"Cleaned {cleaned} expired memory records")
+                    while True:
+                        cur.execute(CLEANUP_EXPIRED_SQL, (cutoff_date, self.cleanup_batch_size))
+                        batch = cur.rowcount
+                        conn.commit()
+                        cleaned += batch
+                        if batch < self.cleanup_batch_size:
+                            break
+                            
+                    if self.turn_log:
+                        drop_expired_turn_partitions(cur, cutoff_date)
+                        ensure_turn_partitions(cur)
+                        conn.commit()
                         
-                    return cleaned
+            if cleaned > 0:
+                logger.info(f"Cleaned {cleaned} expired memory records")
+            return cleaned
                     
         except Exception as e:
             logger.error(f"Error cleaning up expired memories: {e}")
-            return 0
+            return cleaned
+
+    def rollup_funnel_events(self) -> int:
+        """Background job: fold queued funnel events into funnel_hourly"""
+        with self._get_connection() as conn:
+            return rollup_funnel(conn)
+
+    def get_funnel(self, hours: int = 720, series: bool = False) -> Dict[str, Any]:
+        """Funnel report for the last hours, read from the hourly counters only"""
+        with self._get_connection() as conn:
+            return funnel_report(conn, hours, series)
+
+    def find_leads(self, segment: LeadSegment, limit: int = 100,
+                   before: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        One page of visitors matching a sales segment, most recently active first
+
+        Args:
+            segment: Stage / seats / budget / fact filters
+            limit: Page size (capped at LEADS_MAX_LIMIT)
+            before: (last_updated ISO, user_id) of the previous page's last lead
+        """
+        sql, params = leads_query(segment, limit, before)
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return [lead_row(row) for row in cur.fetchall()]
+
+    def search_conversations(self, query: str, limit: int = 20, offset: int = 0,
+                             user_id: Optional[str] = None, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Full-text search over every logged turn, best match first
+
+        Args:
+            query: websearch syntax - words, "quoted phrases", -excluded, or
+            limit: Page size (capped at SEARCH_MAX_LIMIT)
+            offset: Hits to skip (capped at SEARCH_MAX_OFFSET)
+            user_id: Only this visitor's turns
+            since: Only turns on or after this time
+
+        Returns:
+            Hits with rank and «highlighted» snippets of both sides of the turn
+        """
+        if not self.turn_log:
+            raise RuntimeError("Conversation search needs the turn log (MEMORY_TURN_LOG=1)")
+
+        sql, params = search_turns_query(query, limit, offset, user_id, since)
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+
+        return [{
+            "user_id": user_id,
+            "ts": turn_at.isoformat(),
+            "buyer_stage": buyer_stage,
+            "rank": round(rank, 4),
+            "user_snippet": user_snippet,
+            "bot_snippet": bot_snippet
+        } for user_id, turn_at, buyer_stage, rank, user_snippet, bot_snippet in rows]
 
     def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Get comprehensive statistics about a user"""
@@ -548,4 +1303,53 @@ class EnhancedMemoryManager:
             "cta_attempts": len(memory.get("cta_attempts", [])),
             "last_active": memory.get("last_updated"),
             "context_summary": self.build_context_summary(memory)
-        }
\ No newline at end of file
+        }
+
+    def get_recent_conversations(self, limit: int = 100, before: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """Most recent message pair per user, newest first (admin conversation feed)"""
+        return list(self.iter_recent_conversations(limit, before))
+
+    def iter_recent_conversations(self, limit: int = 100,
+                                  before: Optional[Tuple[str, str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream one page of the admin conversation feed
+
+        Args:
+            limit: Page size (capped at FEED_MAX_LIMIT)
+            before: (last_updated ISO, user_id) of the previous page's last item
+
+        Yields exactly limit items unless the feed runs out. The connection is
+        released before anything is yielded, so a slow client never holds it.
+        """
+        remaining = max(1, min(limit, FEED_MAX_LIMIT))
+        while remaining > 0:
+            requested = remaining
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    if before:
+                        cur.execute(RECENT_CONVERSATIONS_SQL.format(before=FEED_BEFORE_CLAUSE),
+                                    (before[0], before[1], requested))
+                    else:
+                        cur.execute(RECENT_CONVERSATIONS_SQL.format(before=""), (requested,))
+                    rows = cur.fetchall()
+
+            for user_id, ts, turns, user_message, bot_response, history in rows:
+                before = (ts.isoformat(), user_id)
+                if history is not None:
+                    interactions = decode_history(history)[0]
+                    if not interactions:
+                        # Compact row with an empty history; refill from the next rows
+                        continue
+                    turns, last = len(interactions), interactions[-1]
+                    user_message, bot_response = last.get("user", ""), last.get("bot", "")
+                remaining -= 1
+                yield {
+                    "id": f"{user_id}_{turns}",
+                    "ts": ts.isoformat(),
+                    "user_id": user_id,
+                    "user_message": user_message or "",
+                    "bot_response": bot_response or ""
+                }
+
+            if len(rows) < requested:
+                break
@@ -0,0 +1,132 @@
+"""
+Funnel Analytics
+================
+
+Buyer-journey counters that never scan user_memories.
+
+When a chat turn moves a visitor's ``buyer_stage`` (or is their first turn)
+or shows a CTA, ChatPipeline queues an event on the memory document
+(``pending_events``); the memory manager inserts the queued events into
+``funnel_events`` in the same transaction as the save. A background job
+(``rollup_funnel``) drains that queue into ``funnel_hourly`` counters in
+batches - DELETE ... RETURNING feeding an upsert, so an event is counted
+exactly once even with several runners. ``funnel_report`` then reads only the
+hourly rows for the window, whose size depends on the window and the number
+of stages/CTAs, not on the number of visitors.
+
+Event keys: ``stage`` events go from_key -> to_key (from_key '' for a new
+visitor); ``cta`` events are from_key = stage shown in, to_key = CTA type.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STAGE_ORDER = ["browsing", "researching", "interested", "considering", "ready"]
+
+INSERT_FUNNEL_EVENT_SQL = """
+    INSERT INTO funnel_events (occurred_at, kind, from_key, to_key) VALUES (%s, %s, %s, %s)
+"""
+
+ROLLUP_FUNNEL_SQL = """
+    WITH drained AS (
+        DELETE FROM funnel_events WHERE id IN (
+            SELECT id FROM funnel_events ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+        )
+        RETURNING date_trunc('hour', occurred_at) AS hour, kind, from_key, to_key
+    ), counted AS (
+        INSERT INTO funnel_hourly (hour, kind, from_key, to_key, count)
+        SELECT hour, kind, from_key, to_key, count(*) FROM drained
+        GROUP BY hour, kind, from_key, to_key
+        ON CONFLICT (hour, kind, from_key, to_key) DO UPDATE SET count = funnel_hourly.count + EXCLUDED.count
+    )
+    SELECT count(*) FROM drained
+"""
+
+FUNNEL_REPORT_SQL = """
+    SELECT kind, from_key, to_key, sum(count)::bigint
+    FROM funnel_hourly
+    WHERE hour >= %s
+    GROUP BY kind, from_key, to_key
+"""
+
+FUNNEL_SERIES_SQL = """
+    SELECT hour, to_key, sum(count)::bigint
+    FROM funnel_hourly
+    WHERE hour >= %s AND kind = 'stage'
+    GROUP BY hour, to_key
+    ORDER BY hour
+"""
+
+def stage_event(from_stage: Optional[str], to_stage: str) -> Dict[str, Any]:
+    return {"kind": "stage", "from": from_stage or "", "to": to_stage, "at": datetime.now().isoformat()}
+
+def cta_event(stage: str, cta_type: str) -> Dict[str, Any]:
+    return {"kind": "cta", "from": stage, "to": cta_type, "at": datetime.now().isoformat()}
+
+def funnel_event_rows(events: List[Dict[str, Any]]) -> List[Tuple]:
+    """Queued events -> INSERT_FUNNEL_EVENT_SQL parameters"""
+    return [(datetime.fromisoformat(e["at"]), e["kind"], e["from"] or "", e["to"] or "") for e in events]
+
+def rollup_funnel(conn, batch_size: int = 10000) -> int:
+    """
+    Fold queued funnel events into the hourly counters
+
+    Returns:
+        Number of events rolled up
+    """
+    total = 0
+    with conn.cursor() as cur:
+        while True:
+            cur.execute(ROLLUP_FUNNEL_SQL, (batch_size,))
+            rolled = cur.fetchone()[0]
+            conn.commit()
+            total += rolled
+            if rolled < batch_size:
+                break
+    if total:
+        logger.info(f"Rolled up {total} funnel events")
+    return total
+
+def _stage_rank(stage: str) -> Tuple[int, str]:
+    return (STAGE_ORDER.index(stage) if stage in STAGE_ORDER else len(STAGE_ORDER), stage)
+
+def funnel_report(conn, hours: int = 720, series: bool = False) -> Dict[str, Any]:
+    """Stage entries, transitions and CTA impressions over the last hours (from funnel_hourly only)"""
+    since = (datetime.now() - timedelta(hours=hours)).replace(minute=0, second=0, microsecond=0)
+    with conn.cursor() as cur:
+        cur.execute(FUNNEL_REPORT_SQL, (since,))
+        rows = cur.fetchall()
+        hourly = []
+        if series:
+            cur.execute(FUNNEL_SERIES_SQL, (since,))
+            hourly = [{"hour": hour.isoformat(), "stage": stage, "entered": count} for hour, stage, count in cur.fetchall()]
+
+    entered, transitions, ctas = {}, [], []
+    for kind, from_key, to_key, count in rows:
+        if kind == "stage":
+            entered[to_key] = entered.get(to_key, 0) + count
+            transitions.append({"from": from_key or None, "to": to_key, "count": count})
+        elif kind == "cta":
+            ctas.append({"cta": to_key, "stage": from_key, "count": count})
+
+    stages = []
+    previous = None
+    for stage in sorted(entered, key=_stage_rank):
+        stages.append({
+            "stage": stage,
+            "entered": entered[stage],
+            "from_previous": round(entered[stage] / entered[previous], 3) if previous and entered[previous] else None
+        })
+        previous = stage
+
+    return {
+        "since": since.isoformat(),
+        "window_hours": hours,
+        "stages": stages,
+        "transitions": sorted(transitions, key=lambda t: -t["count"]),
+        "ctas": sorted(ctas, key=lambda c: -c["count"]),
+        "hourly": hourly if series else None
+    }
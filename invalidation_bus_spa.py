@@ -0,0 +1,168 @@
+"""
+Cache Invalidation Bus
+======================
+
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY. Writers publish
+a small event on a channel (memory saves send
+``NOTIFY user_memories, '<user_id>:<version>'`` inside the saving
+transaction, so the event is delivered exactly when the row is visible);
+every worker runs one listener thread that dispatches events to the
+callbacks subscribed to that channel, e.g. evicting a read-cache entry.
+
+If the listener loses its connection it reconnects and calls the
+``on_reconnect`` callbacks, since anything published meanwhile was missed.
+"""
+
+import logging
+import os
+import select
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Any, Tuple
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CHANNEL = "user_memories"
+NOTIFY_SQL = "SELECT pg_notify(%s, %s)"
+
+def memory_event(user_id: str, version: int) -> str:
+    return f"{user_id}:{version}"
+
+def parse_memory_event(payload: str) -> Tuple[str, int]:
+    """'<user_id>:<version>' -> (user_id, version)"""
+    user_id, _, version = payload.rpartition(":")
+    return user_id, int(version)
+
+class InvalidationBus:
+    """LISTEN/NOTIFY fan-out to in-process subscribers"""
+
+    def __init__(self, database_url: str = None, poll_timeout: float = 5.0, reconnect_delay: float = 1.0):
+        """
+        Args:
+            database_url: PostgreSQL connection URL
+            poll_timeout: Seconds the listener waits on the socket before re-checking for stop
+            reconnect_delay: Initial back-off after a dropped connection (doubles, max 30s)
+        """
+        if psycopg2 is None:
+            raise ImportError("psycopg2 is required for the invalidation bus")
+
+        self.database_url = database_url or os.getenv("DATABASE_URL")
+        self.poll_timeout = poll_timeout
+        self.reconnect_delay = reconnect_delay
+        self._subscribers = defaultdict(list)
+        self._reconnect_callbacks = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"received": 0, "published": 0, "reconnects": 0, "callback_errors": 0}
+
+        if not self.database_url:
+            raise ValueError("DATABASE_URL environment variable is required")
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        """Call ``callback(payload)`` for every event on channel (from the listener thread)"""
+        self._subscribers[channel].append(callback)
+
+    def on_reconnect(self, callback: Callable[[], None]) -> None:
+        self._reconnect_callbacks.append(callback)
+
+    def publish(self, channel: str, payload: str) -> None:
+        """Send an event outside any transaction (for writers that don't hold one)"""
+        with self._publish_lock:
+            try:
+                if self._publish_conn is None or self._publish_conn.closed:
+                    self._publish_conn = psycopg2.connect(self.database_url)
+                    self._publish_conn.autocommit = True
+                with self._publish_conn.cursor() as cur:
+                    cur.execute(NOTIFY_SQL, (channel, payload))
+            except Exception as e:
+                logger.error(f"Error publishing {channel} event: {e}")
+                if self._publish_conn is not None:
+                    self._publish_conn.close()
+                self._publish_conn = None
+                return
+        self._bump("published")
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self.stats, channels=sorted(self._subscribers))
+
+    # ------------------------------------------------------------------
+    # Listener
+    # ------------------------------------------------------------------
+
+    def _bump(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _listen(self):
+        conn = psycopg2.connect(self.database_url)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for channel in self._subscribers:
+                cur.execute(f'LISTEN "{channel}"')
+        return conn
+
+    def _dispatch(self, channel: str, payload: str) -> None:
+        self._bump("received")
+        for callback in self._subscribers.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                self._bump("callback_errors")
+                logger.error(f"Invalidation callback failed for {channel} '{payload}': {e}")
+
+    def _run(self) -> None:
+        delay = self.reconnect_delay
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                conn = self._listen()
+            except Exception as e:
+                logger.error(f"Invalidation listener can't connect: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, 30)
+                continue
+
+            if connected_before:
+                # Events sent while we were away are lost - let subscribers resync
+                self._bump("reconnects")
+                for callback in self._reconnect_callbacks:
+                    try:
+                        callback()
+                    except Exception:
+                        self._bump("callback_errors")
+                        logger.exception("Invalidation reconnect callback failed")
+            connected_before = True
+            delay = self.reconnect_delay
+            logger.info(f"Invalidation listener on {sorted(self._subscribers)}")
+
+            try:
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._dispatch(notify.channel, notify.payload)
+            except Exception as e:
+                logger.error(f"Invalidation listener dropped: {e}")
+            finally:
+                conn.close()
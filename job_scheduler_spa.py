@@ -0,0 +1,369 @@
+"""
+Background Job Scheduler
+========================
+
+In-process scheduler for maintenance work (expiry cleanup, partition upkeep,
+rollups, cache warmers). Every gunicorn worker runs one; jobs are registered
+with an interval ("30s", "15m", "6h", "1d", "@hourly", "@daily" or seconds)
+and a jitter fraction so workers and nodes don't fire in lockstep.
+
+Exactly one worker runs each exclusive job: before running, a worker takes
+``pg_try_advisory_lock(JOB_LOCK_NAMESPACE, <job key>)`` on its own connection
+and skips the run if another worker holds it or has finished it within the
+interval (cluster-wide last run lives in ``scheduled_jobs``, migration 0005).
+Without Postgres the same check uses a non-blocking flock per job, which
+covers the workers of one host.
+
+Jobs run on a small dedicated thread pool, never on request threads.
+``status()`` reports the last run, duration and outcome per job for the admin
+endpoint.
+"""
+
+import fcntl
+import logging
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Union
+
+try:
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+except ImportError:
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+# Any constant works; it only has to be the same in every process
+JOB_LOCK_NAMESPACE = 0x5ba5
+
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+INTERVAL_ALIASES = {"@hourly": 3600, "@daily": 86400, "@weekly": 7 * 86400}
+
+LAST_FINISHED_SQL = "SELECT last_finished_at FROM scheduled_jobs WHERE job_name = %s"
+RECORD_START_SQL = """
+    INSERT INTO scheduled_jobs (job_name, last_started_at, last_status, last_runner)
+    VALUES (%s, %s, 'running', %s)
+    ON CONFLICT (job_name) DO UPDATE SET
+        last_started_at = EXCLUDED.last_started_at,
+        last_status = EXCLUDED.last_status,
+        last_runner = EXCLUDED.last_runner
+"""
+RECORD_FINISH_SQL = """
+    UPDATE scheduled_jobs
+    SET last_finished_at = %s, last_status = %s, last_duration_ms = %s, last_error = %s
+    WHERE job_name = %s
+"""
+CLUSTER_STATUS_SQL = "SELECT * FROM scheduled_jobs ORDER BY job_name"
+
+def parse_interval(every: Union[str, int, float]) -> float:
+    """'90s', '15m', '1h30m', '1d', '@daily' or a number of seconds -> seconds"""
+    if isinstance(every, (int, float)):
+        seconds = float(every)
+    elif every in INTERVAL_ALIASES:
+        seconds = float(INTERVAL_ALIASES[every])
+    else:
+        parts = re.findall(r"(\d+(?:\.\d+)?)([smhd])", every)
+        if not parts or "".join(n + u for n, u in parts) != every.replace(" ", ""):
+            raise ValueError(f"Unrecognised job interval: {every!r}")
+        seconds = sum(float(n) * INTERVAL_UNITS[u] for n, u in parts)
+    if seconds <= 0:
+        raise ValueError(f"Job interval must be positive: {every!r}")
+    return seconds
+
+def job_lock_key(name: str) -> int:
+    """Stable signed int4 advisory-lock key for a job name"""
+    key = zlib.crc32(name.encode())
+    return key - 2 ** 32 if key >= 2 ** 31 else key
+
+def _iso(epoch: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(epoch).isoformat() if epoch else None
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Any]
+    interval: float
+    jitter: float = 0.1
+    exclusive: bool = True
+    next_run: float = 0.0
+    running: bool = False
+    runs: int = 0
+    failures: int = 0
+    skips: int = 0
+    last_run: Optional[float] = None
+    last_status: Optional[str] = None
+    last_duration_ms: Optional[float] = None
+    last_error: Optional[str] = None
+    last_result: Any = field(default=None, repr=False)
+
+    def schedule_next(self, now: float) -> None:
+        self.next_run = now + self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def recently_finished(self, finished_at: Optional[float], now: float) -> bool:
+        """Another runner finished this job within (the jittered lower bound of) the interval"""
+        return finished_at is not None and now - finished_at < self.interval * (1 - self.jitter)
+
+    def status(self) -> Dict[str, Any]:
+        result = self.last_result
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval,
+            "exclusive": self.exclusive,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skips,
+            "last_run": _iso(self.last_run),
+            "last_status": self.last_status,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+            "last_result": result if isinstance(result, (int, float, str, bool, type(None))) else repr(result),
+            "next_run": _iso(self.next_run),
+        }
+
+class JobScheduler:
+    """Interval scheduler with cross-worker leader election per job"""
+
+    def __init__(self, database_url: str = None, max_workers: int = 2, tick: float = 1.0, lock_dir: str = None):
+        """
+        Args:
+            database_url: PostgreSQL connection URL for advisory locks and run history;
+                None uses host-local file locks instead
+            max_workers: Size of the job thread pool
+            tick: Seconds between due-job checks
+            lock_dir: Directory for the file locks (no-Postgres mode)
+        """
+        if database_url and psycopg2 is None:
+            raise ImportError("psycopg2 is required for Postgres job locks")
+
+        self.database_url = database_url
+        self.max_workers = max_workers
+        self.tick = tick
+        self.lock_dir = lock_dir or os.getenv("JOB_LOCK_DIR") or tempfile.gettempdir()
+        self.runner = f"{socket.gethostname()}:{os.getpid()}"
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def add_job(self, name: str, func: Callable[[], Any], every: Union[str, int, float],
+                jitter: float = 0.1, exclusive: bool = True) -> Job:
+        """
+        Register a job
+
+        Args:
+            name: Unique job name (also its lock key and scheduled_jobs row)
+            func: Zero-argument callable; its return value is shown in status()
+            every: Interval between runs (see parse_interval)
+            jitter: +/- fraction of the interval added to each run time
+            exclusive: Run on one worker cluster-wide (False: on every worker)
+        """
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be in [0, 1)")
+        job = Job(name, func, parse_interval(every), jitter, exclusive)
+        # First run lands somewhere in the first jitter window rather than at boot
+        job.next_run = time.time() + job.interval * random.uniform(0, jitter)
+        with self._lock:
+            self.jobs[name] = job
+        return job
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="spa-job")
+        self._thread = threading.Thread(target=self._run, name="job-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Job scheduler started ({len(self.jobs)} jobs, {self.max_workers} threads)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def run_now(self, name: str) -> bool:
+        """
+        Run a job immediately, ignoring its recent-run window (still lock-guarded)
+
+        Returns:
+            False if the job is unknown or already running in this worker
+        """
+        with self._lock:
+            job = self.jobs.get(name)
+            if job is None or job.running or self._executor is None:
+                return False
+            job.running = True
+        self._executor.submit(self._execute, job, True)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = [job.status() for job in self.jobs.values()]
+        return {
+            "runner": self.runner,
+            "leader_lock": "postgres" if self.database_url else "file",
+            "running": bool(self._thread and self._thread.is_alive()),
+            "jobs": jobs,
+        }
+
+    def cluster_status(self) -> List[Dict[str, Any]]:
+        """Last run of every job across all workers ([] without Postgres)"""
+        if not self.database_url:
+            return []
+        conn = psycopg2.connect(self.database_url)
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(CLUSTER_STATUS_SQL)
+                rows = cur.fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            for key in ("last_started_at", "last_finished_at"):
+                if row[key]:
+                    row[key] = row[key].isoformat()
+        return rows
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.tick):
+            now = time.time()
+            with self._lock:
+                due = [job for job in self.jobs.values() if not job.running and now >= job.next_run]
+                for job in due:
+                    job.running = True
+                    job.schedule_next(now)
+            for job in due:
+                try:
+                    self._executor.submit(self._execute, job, False)
+                except RuntimeError:
+                    # Executor shut down by stop()
+                    job.running = False
+
+    def _execute(self, job: Job, force: bool) -> None:
+        lease = None
+        try:
+            lease = self._acquire(job, force)
+            if lease is None:
+                # Another worker holds the lock or ran it within the interval
+                job.skips += 1
+                return
+
+            job.last_run = time.time()
+            started = time.perf_counter()
+            try:
+                job.last_result = job.func()
+                job.last_status, job.last_error = "ok", None
+            except Exception as e:
+                job.failures += 1
+                job.last_status, job.last_error = "error", str(e)
+                logger.exception(f"Job {job.name} failed")
+            job.runs += 1
+            job.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(f"Job {job.name}: {job.last_status} in {job.last_duration_ms}ms")
+        except Exception as e:
+            # Lock/bookkeeping trouble (e.g. database down); try again next interval
+            job.last_status, job.last_error = "error", f"lock: {e}"
+            logger.error(f"Job {job.name} could not acquire its lock: {e}")
+        finally:
+            if lease is not None:
+                self._release(job, lease)
+            job.running = False
+
+    def _acquire(self, job: Job, force: bool):
+        """Leader lease for job (truthy), or None if another worker owns this run"""
+        if not job.exclusive:
+            return True
+        if self.database_url:
+            return self._acquire_postgres(job, force)
+        return self._acquire_file(job, force)
+
+    def _release(self, job: Job, lease) -> None:
+        try:
+            if lease is True:
+                return
+            if isinstance(lease, tuple):
+                self._release_file(job, lease)
+            else:
+                self._release_postgres(job, lease)
+        except Exception as e:
+            logger.error(f"Error releasing lock for job {job.name}: {e}")
+
+    # Postgres: session-level advisory lock held on a dedicated connection
+
+    def _acquire_postgres(self, job: Job, force: bool):
+        conn = psycopg2.connect(self.database_url)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (JOB_LOCK_NAMESPACE, job_lock_key(job.name)))
+                if not cur.fetchone()[0]:
+                    conn.close()
+                    return None
+
+                cur.execute(LAST_FINISHED_SQL, (job.name,))
+                row = cur.fetchone()
+                finished_at = row[0].timestamp() if row and row[0] else None
+                if not force and job.recently_finished(finished_at, time.time()):
+                    conn.close()
+                    return None
+
+                cur.execute(RECORD_START_SQL, (job.name, datetime.now(), self.runner))
+            return conn
+        except Exception:
+            conn.close()
+            raise
+
+    def _release_postgres(self, job: Job, conn) -> None:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(RECORD_FINISH_SQL, (datetime.now(), job.last_status, job.last_duration_ms,
+                                                job.last_error, job.name))
+                cur.execute("SELECT pg_advisory_unlock(%s, %s)", (JOB_LOCK_NAMESPACE, job_lock_key(job.name)))
+        finally:
+            conn.close()
+
+    # No Postgres: non-blocking flock; the file holds the last finish time
+
+    def _acquire_file(self, job: Job, force: bool):
+        path = os.path.join(self.lock_dir, f"spa-job-{job.name}.lock")
+        lock_file = open(path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+
+        lock_file.seek(0)
+        try:
+            finished_at = float(lock_file.read().strip())
+        except ValueError:
+            finished_at = None
+        if not force and job.recently_finished(finished_at, time.time()):
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+            return None
+        return (lock_file,)
+
+    def _release_file(self, job: Job, lease) -> None:
+        lock_file = lease[0]
+        try:
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(str(time.time()))
+            lock_file.flush()
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            lock_file.close()
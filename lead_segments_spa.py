@@ -0,0 +1,109 @@
+"""
+Lead Segmentation
+=================
+
+Sales queries over the facts the bot extracts into ``user_memories.key_facts``
+("ready visitors wanting 7+ seats with a budget under $15k").
+
+The numeric facts are read through fixed typed expressions - LEAD_SEATS_SQL
+and LEAD_BUDGET_SQL - that an expression index covers together with
+buyer_stage (migration 0008). Everything matched by equality (reason, focus,
+features, ...) becomes one ``key_facts @> {...}`` containment test, served by
+a GIN jsonb_path_ops index (migration 0009). Both are built CONCURRENTLY, so
+unlike generated columns they don't rewrite or lock the table.
+
+Results are newest-first and keyset-paginated with the admin feed's cursor.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Must match migration 0008 exactly or the planner won't use the index.
+# Guarded so an odd value in key_facts can never fail a chat save.
+LEAD_SEATS_SQL = (
+    "(CASE WHEN jsonb_typeof(key_facts->'preferred_seats') = 'number' "
+    "THEN (key_facts->>'preferred_seats')::numeric END)"
+)
+LEAD_BUDGET_SQL = "(NULLIF(regexp_replace(key_facts->>'budget_range', '[^0-9]', '', 'g'), '')::numeric)"
+
+LEADS_SQL = f"""
+    SELECT user_id, last_updated, buyer_stage, engagement_level,
+           {LEAD_SEATS_SQL} AS seats, {LEAD_BUDGET_SQL} AS budget, key_facts, contact_info
+    FROM user_memories
+    WHERE {{where}}
+    ORDER BY last_updated DESC, user_id DESC
+    LIMIT %s
+"""
+LEADS_MAX_LIMIT = 500
+
+@dataclass
+class LeadSegment:
+    """Filter for find_leads; every field is optional and they AND together"""
+    stages: List[str] = field(default_factory=list)
+    min_seats: Optional[float] = None
+    max_seats: Optional[float] = None
+    min_budget: Optional[float] = None
+    max_budget: Optional[float] = None
+    facts: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_args(cls, args) -> "LeadSegment":
+        """
+        Build from query-string args
+
+        ?stage=ready,considering&min_seats=7&max_budget=15000&reason=family&feature=jets,lights
+
+        Raises:
+            ValueError: a numeric bound isn't a number
+        """
+        def number(name: str) -> Optional[float]:
+            value = args.get(name)
+            return float(value) if value not in (None, "") else None
+
+        def listed(name: str) -> List[str]:
+            return [item.strip() for item in (args.get(name) or "").split(",") if item.strip()]
+
+        facts = {name: args.get(name) for name in ("reason", "focus", "pool_type", "preferred_size") if args.get(name)}
+        if listed("feature"):
+            facts["features"] = listed("feature")
+        return cls(listed("stage"), number("min_seats"), number("max_seats"),
+                   number("min_budget"), number("max_budget"), facts)
+
+    def where(self) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if self.stages:
+            clauses.append("buyer_stage = ANY(%s)")
+            params.append(self.stages)
+        for expression, op, value in (
+            (LEAD_SEATS_SQL, ">=", self.min_seats), (LEAD_SEATS_SQL, "<=", self.max_seats),
+            (LEAD_BUDGET_SQL, ">=", self.min_budget), (LEAD_BUDGET_SQL, "<=", self.max_budget),
+        ):
+            if value is not None:
+                clauses.append(f"{expression} {op} %s")
+                params.append(value)
+        if self.facts:
+            clauses.append("key_facts @> %s::jsonb")
+            params.append(json.dumps(self.facts))
+        return " AND ".join(clauses) or "TRUE", params
+
+def leads_query(segment: LeadSegment, limit: int, before: Optional[Tuple[str, str]] = None) -> Tuple[str, Tuple]:
+    """LEADS_SQL and its parameters for one page"""
+    where, params = segment.where()
+    if before:
+        where += " AND (last_updated, user_id) < (%s::timestamp, %s)"
+        params += list(before)
+    return LEADS_SQL.format(where=where), (*params, max(1, min(limit, LEADS_MAX_LIMIT)))
+
+def lead_row(row: Tuple) -> Dict[str, Any]:
+    user_id, last_updated, buyer_stage, engagement_level, seats, budget, key_facts, contact_info = row
+    return {
+        "user_id": user_id,
+        "ts": last_updated.isoformat(),
+        "buyer_stage": buyer_stage,
+        "engagement_level": engagement_level,
+        "preferred_seats": int(seats) if seats is not None else None,
+        "budget": int(budget) if budget is not None else None,
+        "key_facts": key_facts,
+        "contact_info": contact_info
+    }
@@ -0,0 +1,590 @@
+"""
+Memory Storage Backends
+=======================
+
+The storage protocol every memory manager satisfies, plus the two backends
+that don't need Postgres:
+
+- InMemoryManager: volatile per-process dict (no DATABASE_URL fallback)
+- SharedSessionStore: EnhancedMemoryManager's per-turn rules, with documents
+  in a host-local SQLite file shared by every gunicorn worker
+- SQLiteMemoryManager: durable local file in WAL mode, same schema, same
+  buyer-journey logic and same compare-and-swap saves as EnhancedMemoryManager
+
+All backends return the same memory dict shape (see new_memory_document).
+"""
+
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Any, Protocol, Tuple, runtime_checkable
+
+from enhanced_memory_manager_spa import (
+    EnhancedMemoryManager, FEED_MAX_LIMIT, new_memory_document, merge_concurrent_memory
+)
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# STORAGE PROTOCOL
+# ============================================================================
+
+@runtime_checkable
+class MemoryBackend(Protocol):
+    """What the chat pipeline and routes need from a memory store"""
+
+    def load_memory(self, user_id: Optional[str] = None, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]: ...
+
+    def save_memory(self, memory: Dict[str, Any]) -> bool: ...
+
+    def add_interaction(self, memory: Dict[str, Any], user_message: str, bot_response: str) -> None: ...
+
+    def build_context_summary(self, memory: Dict[str, Any]) -> str: ...
+
+    def cleanup_expired_memories(self) -> int: ...
+
+    def get_recent_conversations(self, limit: int = 100, before: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]: ...
+
+    def iter_recent_conversations(self, limit: int = 100,
+                                  before: Optional[Tuple[str, str]] = None) -> Iterator[Dict[str, Any]]: ...
+
+def _feed_rows(rows) -> List[Dict[str, Any]]:
+    """(user_id, last_updated, turns, user_message, bot_response) rows -> feed items"""
+    return [{
+        "id": f"{r[0]}_{r[2]}",
+        "ts": r[1],
+        "user_id": r[0],
+        "user_message": r[3] or "",
+        "bot_response": r[4] or ""
+    } for r in rows]
+
+def _feed_query(sql: str, limit: int, before: Optional[Tuple[str, str]]) -> Tuple[str, Tuple]:
+    """Fill the {before} keyset clause of a SQLite feed query"""
+    limit = max(1, min(limit, FEED_MAX_LIMIT))
+    if before:
+        return sql.format(before="AND (last_updated, user_id) < (?, ?)"), (before[0], before[1], limit)
+    return sql.format(before=""), (limit,)
+
+class _PostgresOnlyQueries:
+    """Refuses the reports EnhancedMemoryManager runs as Postgres queries (JSONB, funnel_* tables)"""
+
+    def rollup_funnel_events(self) -> int:
+        raise RuntimeError("Funnel analytics need the Postgres backend")
+
+    def get_funnel(self, hours: int = 720, series: bool = False) -> Dict[str, Any]:
+        raise RuntimeError("Funnel analytics need the Postgres backend")
+
+    def find_leads(self, segment, limit: int = 100, before: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        raise RuntimeError("Lead segmentation needs the Postgres backend")
+
+# ============================================================================
+# IN-MEMORY BACKEND
+# ============================================================================
+
+class InMemoryManager:
+    """Simple in-memory storage for when DB not available"""
+    def __init__(self, expiry_days: int = 90):
+        self.memories = {}
+        self.expiry_days = expiry_days
+        logger.info("InMemory Manager initialized")
+
+    def load_memory(self, user_id: str, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        if user_id not in self.memories:
+            memory = new_memory_document(user_id)
+            memory["asked_followups"] = []
+            memory["last_cta_turn"] = 0
+            self.memories[user_id] = memory
+        return self.memories[user_id]
+
+    def save_memory(self, memory: Dict[str, Any]) -> bool:
+        memory["last_updated"] = datetime.now().isoformat()
+        self.memories[memory["user_id"]] = memory
+        return True
+
+    def add_interaction(self, memory: Dict[str, Any], user_msg: str, bot_msg: str) -> None:
+        memory["interactions"].append({
+            "timestamp": datetime.now().isoformat(),
+            "user": user_msg,
+            "bot": bot_msg
+        })
+        # Keep only last 10 interactions
+        if len(memory["interactions"]) > 10:
+            memory["interactions"] = memory["interactions"][-10:]
+
+    def build_context_summary(self, memory: Dict[str, Any]) -> str:
+        facts = memory.get("key_facts", {})
+        parts = []
+
+        if facts.get("name"):
+            parts.append(f"Name: {facts['name']}")
+        if facts.get("family_size"):
+            parts.append(f"Family size: {facts['family_size']}")
+        if facts.get("preferred_seats"):
+            parts.append(f"Looking for: {facts['preferred_seats']}-seater")
+        if facts.get("budget_range"):
+            parts.append(f"Budget: {facts['budget_range']}")
+        if memory.get("buyer_stage"):
+            parts.append(f"Stage: {memory['buyer_stage']}")
+
+        return " | ".join(parts) if parts else ""
+
+    def cleanup_expired_memories(self) -> int:
+        cutoff = (datetime.now() - timedelta(days=self.expiry_days)).isoformat()
+        expired = [uid for uid, memory in self.memories.items() if memory.get("last_updated", "") < cutoff]
+        for uid in expired:
+            del self.memories[uid]
+        return len(expired)
+
+    def snapshot_sessions(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Live documents, most recently updated first (see MemorySnapshotter)"""
+        recent = sorted(self.memories.values(), key=lambda m: m.get("last_updated", ""), reverse=True)
+        return recent[:limit] if limit else recent
+
+    def warm_sessions(self, memories: List[Dict[str, Any]]) -> int:
+        """Restore snapshot documents without overwriting anything newer"""
+        warmed = 0
+        for memory in memories:
+            if memory["user_id"] not in self.memories:
+                self.memories[memory["user_id"]] = memory
+                warmed += 1
+        return warmed
+
+    def get_recent_conversations(self, limit: int = 100, before: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        def key(m):
+            return m.get("last_updated", ""), m["user_id"]
+
+        recent = sorted(self.memories.values(), key=key, reverse=True)
+        items = []
+        for memory in recent:
+            if len(items) >= max(1, min(limit, FEED_MAX_LIMIT)):
+                break
+            interactions = memory.get("interactions", [])
+            if interactions and (not before or key(memory) < tuple(before)):
+                last = interactions[-1]
+                items.append({
+                    "id": f"{memory['user_id']}_{len(interactions)}",
+                    "ts": memory.get("last_updated", ""),
+                    "user_id": memory["user_id"],
+                    "user_message": last.get("user", ""),
+                    "bot_response": last.get("bot", "")
+                })
+        return items
+
+    def iter_recent_conversations(self, limit: int = 100,
+                                  before: Optional[Tuple[str, str]] = None) -> Iterator[Dict[str, Any]]:
+        return iter(self.get_recent_conversations(limit, before))
+
+# ============================================================================
+# SHARED SESSION STORE (no database, several workers)
+# ============================================================================
+
+SESSION_SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        user_id TEXT PRIMARY KEY,
+        doc TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        last_updated TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sessions_last_updated ON sessions(last_updated)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_feed ON sessions(last_updated, user_id)",
+]
+
+def default_session_path() -> str:
+    """RAM-backed /dev/shm when the host has it: survives worker recycling, not reboots"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "spa_sessions.db")
+
+class SharedSessionStore(_PostgresOnlyQueries, EnhancedMemoryManager):
+    """
+    Session store shared by all workers on one host, for running without DATABASE_URL
+
+    Same per-turn rules as the database backends (facts, stage, engagement,
+    context summary - EnhancedMemoryManager's, as in SQLiteMemoryManager and
+    stage_replay_spa.ReplayMemoryManager), but each document is one JSON row
+    in a local SQLite file. Writers for the same visitor are serialized by a
+    per-key lock (a striped fcntl byte-range lock on a sidecar file plus a
+    thread lock), so a save re-reads, merges and writes atomically without
+    holding a database-wide write transaction.
+    """
+    def __init__(self, path: str = None, expiry_days: int = 90, max_interactions: int = 15,
+                 lock_stripes: int = 1024):
+        # No read cache (the store is local already), turn log, funnel tables or NOTIFY
+        self._configure(max_interactions=max_interactions, expiry_days=expiry_days, cache_ttl=0,
+                        notify_changes=False, pool_size=0, turn_log=False, funnel_events=False)
+        self.path = path or os.getenv("SESSION_STORE_PATH") or default_session_path()
+        self.lock_stripes = lock_stripes
+        self._thread_locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        self._local = threading.local()
+
+        conn = self._get_connection()
+        for statement in SESSION_SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        logger.info(f"Shared session store at {self.path}")
+
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # Never reuse a connection inherited across a gunicorn fork
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def user_lock(self, user_id: str):
+        """Exclusive lock for one visitor across threads and worker processes"""
+        stripe = zlib.crc32(user_id.encode()) % self.lock_stripes
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _fetch(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._get_connection().execute(
+            "SELECT doc, version FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        memory = json.loads(row[0])
+        memory["version"] = row[1]
+        return memory
+
+    def load_memory(self, user_id: Optional[str] = None, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """Stored document, or a fresh one if there is none or it expired (always the full document)"""
+        if not user_id:
+            user_id = self._generate_user_id()
+        memory = self._fetch(user_id)
+        cutoff = (datetime.now() - timedelta(days=self.expiry_days)).isoformat(timespec="microseconds")
+        if memory is not None and memory.get("last_updated", "") >= cutoff:
+            return memory
+
+        fresh = new_memory_document(user_id)
+        fresh["asked_followups"] = []
+        fresh["last_cta_turn"] = 0
+        if memory is not None:
+            # Expired: start over, but at the stored version so the save replaces it instead of merging
+            logger.info(f"Memory expired for user {user_id}")
+            fresh["version"] = memory["version"]
+        return fresh
+
+    def save_memory(self, memory: Dict[str, Any]) -> bool:
+        user_id = memory["user_id"]
+        with self.user_lock(user_id):
+            stored = self._fetch(user_id)
+            if stored and stored["version"] != memory.get("version", 0):
+                # Another worker saved since we loaded - keep both sides' turns
+                merge_concurrent_memory(memory, stored, self.max_interactions)
+                with self._stats_lock:
+                    self.conflict_stats["conflicts"] += 1
+                    self.conflict_stats["merged"] += 1
+            memory["version"] = (stored["version"] if stored else 0) + 1
+            memory["last_updated"] = datetime.now().isoformat(timespec="microseconds")
+            self._get_connection().execute(
+                "INSERT OR REPLACE INTO sessions (user_id, doc, version, last_updated) VALUES (?, ?, ?, ?)",
+                (user_id, json.dumps(memory), memory["version"], memory["last_updated"])
+            )
+        return True
+
+    def get_conflict_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self.conflict_stats)
+
+    def snapshot_sessions(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recently updated documents (the store itself is lost on reboot: /dev/shm)"""
+        rows = self._get_connection().execute(
+            "SELECT doc, version FROM sessions ORDER BY last_updated DESC LIMIT ?", (limit or -1,)
+        ).fetchall()
+        memories = []
+        for doc, version in rows:
+            memory = json.loads(doc)
+            memory["version"] = version
+            memories.append(memory)
+        return memories
+
+    def warm_sessions(self, memories: List[Dict[str, Any]]) -> int:
+        """Restore snapshot documents; rows already in the store are newer and win"""
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            warmed = conn.executemany(
+                "INSERT OR IGNORE INTO sessions (user_id, doc, version, last_updated) VALUES (?, ?, ?, ?)",
+                [(m["user_id"], json.dumps(m), m.get("version", 0), m.get("last_updated", "")) for m in memories]
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return warmed
+
+    def cleanup_expired_memories(self) -> int:
+        cutoff = (datetime.now() - timedelta(days=self.expiry_days)).isoformat(timespec="microseconds")
+        return self._get_connection().execute("DELETE FROM sessions WHERE last_updated < ?", (cutoff,)).rowcount
+
+    def get_recent_conversations(self, limit: int = 100, before: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        sql, params = _feed_query("""
+            SELECT user_id, last_updated, json_array_length(doc, '$.interactions'),
+                   json_extract(doc, '$.interactions[#-1].user'), json_extract(doc, '$.interactions[#-1].bot')
+            FROM sessions
+            WHERE json_array_length(doc, '$.interactions') > 0 {before}
+            ORDER BY last_updated DESC, user_id DESC
+            LIMIT ?
+        """, limit, before)
+        return _feed_rows(self._get_connection().execute(sql, params).fetchall())
+
+    def iter_recent_conversations(self, limit: int = 100,
+                                  before: Optional[Tuple[str, str]] = None) -> Iterator[Dict[str, Any]]:
+        return iter(self.get_recent_conversations(limit, before))
+
+# ============================================================================
+# SQLITE BACKEND
+# ============================================================================
+
+SQLITE_SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS user_memories (
+        user_id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        last_updated TEXT NOT NULL,
+        interactions TEXT NOT NULL DEFAULT '[]' CHECK (json_valid(interactions)),
+        key_facts TEXT NOT NULL DEFAULT '{}' CHECK (json_valid(key_facts)),
+        conversation_summary TEXT DEFAULT '',
+        preferences TEXT NOT NULL DEFAULT '{}' CHECK (json_valid(preferences)),
+        buyer_stage TEXT DEFAULT 'browsing',
+        engagement_level INTEGER DEFAULT 1,
+        render_requested INTEGER DEFAULT 0,
+        render_status TEXT DEFAULT NULL,
+        render_details TEXT NOT NULL DEFAULT '{}' CHECK (json_valid(render_details)),
+        contact_info TEXT NOT NULL DEFAULT '{}' CHECK (json_valid(contact_info)),
+        cta_attempts TEXT NOT NULL DEFAULT '[]' CHECK (json_valid(cta_attempts)),
+        last_cta_attempt TEXT DEFAULT NULL,
+        reset_at TEXT DEFAULT NULL,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_user_memories_last_updated ON user_memories(last_updated)",
+    "CREATE INDEX IF NOT EXISTS idx_user_memories_feed ON user_memories(last_updated, user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_memories_buyer_stage ON user_memories(buyer_stage)",
+]
+
+SQLITE_JSON_COLUMNS = ("interactions", "key_facts", "preferences", "render_details", "contact_info", "cta_attempts")
+SQLITE_TIME_COLUMNS = ("created_at", "last_updated", "last_cta_attempt", "reset_at")
+# Columns added after the first release; files created before them get an ALTER TABLE
+SQLITE_ADDED_COLUMNS = {"reset_at": "TEXT DEFAULT NULL"}
+
+SQLITE_LOAD_SQL = "SELECT * FROM user_memories WHERE user_id = ?"
+# Bound parameters per statement on older SQLite builds (SQLITE_MAX_VARIABLE_NUMBER)
+SQLITE_MAX_PARAMS = 999
+
+SQLITE_SAVE_SQL = """
+    INSERT INTO user_memories
+    (user_id, last_updated, interactions, key_facts, conversation_summary,
+     preferences, buyer_stage, engagement_level, render_requested,
+     render_status, render_details, contact_info, cta_attempts, last_cta_attempt, reset_at, version, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        last_updated = excluded.last_updated,
+        interactions = excluded.interactions,
+        key_facts = excluded.key_facts,
+        conversation_summary = excluded.conversation_summary,
+        preferences = excluded.preferences,
+        buyer_stage = excluded.buyer_stage,
+        engagement_level = excluded.engagement_level,
+        render_requested = excluded.render_requested,
+        render_status = excluded.render_status,
+        render_details = excluded.render_details,
+        contact_info = excluded.contact_info,
+        cta_attempts = excluded.cta_attempts,
+        last_cta_attempt = excluded.last_cta_attempt,
+        reset_at = excluded.reset_at,
+        version = user_memories.version + 1
+    WHERE user_memories.version = ?
+    RETURNING version
+"""
+
+SQLITE_RECENT_SQL = """
+    SELECT user_id, last_updated, json_array_length(interactions), json_extract(interactions, '$[#-1].user'),
+           json_extract(interactions, '$[#-1].bot')
+    FROM user_memories
+    WHERE json_array_length(interactions) > 0 {before}
+    ORDER BY last_updated DESC, user_id DESC
+    LIMIT ?
+"""
+
+def ensure_sqlite_schema(conn: sqlite3.Connection) -> None:
+    """Create the tables, and add columns an older file is missing"""
+    for statement in SQLITE_SCHEMA_STATEMENTS:
+        conn.execute(statement)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(user_memories)")}
+    for column, definition in SQLITE_ADDED_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE user_memories ADD COLUMN {column} {definition}")
+
+def _sqlite_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Fixed-width ISO timestamps so text comparison matches time order"""
+    return value.isoformat(timespec="microseconds") if value else None
+
+class SQLiteMemoryManager(_PostgresOnlyQueries, EnhancedMemoryManager):
+    def __init__(self, db_path: str = None, max_interactions: int = 15, expiry_days: int = 90,
+                 max_save_retries: int = 3, cache_ttl: float = None):
+        """
+        Initialize the SQLite memory backend
+
+        Args:
+            db_path: Database file (default SQLITE_MEMORY_PATH or ./spa_memory.db)
+            max_interactions: Maximum interactions to keep per user
+            expiry_days: Days after which user memory expires
+            max_save_retries: Merge-and-retry attempts when a save hits a version conflict
+            cache_ttl: Seconds to serve loads from the read cache (default MEMORY_CACHE_TTL, 0 = off)
+        """
+        self.db_path = db_path or os.getenv("SQLITE_MEMORY_PATH", "spa_memory.db")
+        # No partitioned turn log, funnel tables or NOTIFY outside Postgres
+        self._configure(database_url=f"sqlite:///{self.db_path}", max_interactions=max_interactions,
+                        expiry_days=expiry_days, max_save_retries=max_save_retries, cache_ttl=cache_ttl,
+                        notify_changes=False, pool_size=0, turn_log=False, funnel_events=False)
+        self.history_codec = "json"  # histories stay in the JSON columns
+        self._local = threading.local()
+
+        self._init_database()
+        logger.info(f"SQLiteMemoryManager initialized at {self.db_path}")
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 keeps its prepared statements cached on it"""
+        conn = getattr(self._local, "conn", None)
+        # Never reuse a connection inherited across a gunicorn fork
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False,
+                                   cached_statements=64)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _init_database(self):
+        """Create necessary tables"""
+        ensure_sqlite_schema(self._get_connection())
+
+    def _fetch_row(self, conn, user_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch and decode the stored row (JSON text -> objects, ISO text -> datetime)"""
+        row = conn.execute(SQLITE_LOAD_SQL, (user_id,)).fetchone()
+        if row is None:
+            return None
+        result = dict(row)
+        for key in SQLITE_JSON_COLUMNS:
+            result[key] = json.loads(result[key]) if result[key] else None
+        for key in SQLITE_TIME_COLUMNS:
+            result[key] = datetime.fromisoformat(result[key]) if result[key] else None
+        result["render_requested"] = bool(result["render_requested"])
+        return result
+
+    def _load_from_store(self, user_id: str, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """Load user memory from the SQLite file (always the full row; fields is ignored)"""
+        default_memory = self._default_memory(user_id)
+
+        try:
+            return self._row_to_memory(self._fetch_row(self._get_connection(), user_id), default_memory)
+        except Exception as e:
+            logger.error(f"Error loading memory for {user_id}: {e}")
+            return default_memory
+
+    def _save_params(self, memory: Dict[str, Any]) -> tuple:
+        params = [_sqlite_timestamp(p) if isinstance(p, datetime) else p
+                  for p in super()._save_params(memory)]
+        created_at = memory.get("created_at") or _sqlite_timestamp(datetime.now())
+        # No compact history column here; created_at is only used on first insert and
+        # goes before the trailing version check
+        return tuple(params[:-2] + [created_at, params[-1]])
+
+    def _save_to_store(self, memory: Dict[str, Any]) -> bool:
+        """Compare-and-swap save, same semantics as the Postgres backend"""
+        user_id = memory["user_id"]
+        conn = self._get_connection()
+        try:
+            # Take the write lock up front so the CAS + merge loop can't deadlock on upgrade
+            conn.execute("BEGIN IMMEDIATE")
+            for attempt in range(self.max_save_retries + 1):
+                row = conn.execute(SQLITE_SAVE_SQL, self._save_params(memory)).fetchone()
+                if row is not None:
+                    conn.execute("COMMIT")
+                    memory["version"] = row[0]
+                    logger.info(f"Saved memory for user {user_id} (version {row[0]})")
+                    return True
+
+                # Someone else saved since we loaded - merge their changes and retry
+                self._handle_conflict(memory, self._fetch_row(conn, user_id), attempt)
+
+            conn.execute("ROLLBACK")
+            self._give_up_save(user_id)
+            return False
+
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.error(f"Error saving memory for {user_id}: {e}")
+            return False
+
+    def _stored_versions(self, user_ids: List[str]) -> Dict[str, int]:
+        """user_id -> stored row version, in batches under SQLite's bound-parameter limit"""
+        conn = self._get_connection()
+        versions = {}
+        for start in range(0, len(user_ids), SQLITE_MAX_PARAMS):
+            batch = user_ids[start:start + SQLITE_MAX_PARAMS]
+            rows = conn.execute(
+                f"SELECT user_id, version FROM user_memories WHERE user_id IN ({', '.join('?' * len(batch))})", batch
+            ).fetchall()
+            versions.update((row[0], row[1]) for row in rows)
+        return versions
+
+    def cleanup_expired_memories(self) -> int:
+        """Clean up expired user memory records"""
+        try:
+            cutoff_date = _sqlite_timestamp(datetime.now() - timedelta(days=self.expiry_days))
+            cleaned = self._get_connection().execute(
+                "DELETE FROM user_memories WHERE last_updated < ?", (cutoff_date,)
+            ).rowcount
+            if cleaned > 0:
+                logger.info(f"Cleaned {cleaned} expired memory records")
+            return cleaned
+        except Exception as e:
+            logger.error(f"Error cleaning up expired memories: {e}")
+            return 0
+
+    def get_recent_conversations(self, limit: int = 100, before: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """Most recent message pair per user, newest first (admin conversation feed)"""
+        sql, params = _feed_query(SQLITE_RECENT_SQL, limit, before)
+        return _feed_rows(self._get_connection().execute(sql, params).fetchall())
+
+    def iter_recent_conversations(self, limit: int = 100,
+                                  before: Optional[Tuple[str, str]] = None) -> Iterator[Dict[str, Any]]:
+        return iter(self.get_recent_conversations(limit, before))
@@ -0,0 +1,113 @@
+"""
+Memory Read Cache
+=================
+
+Per-process LRU + TTL cache of memory documents, sitting in front of the
+database-backed managers. Entries carry the row version, so a stale entry
+only ever costs a compare-and-swap conflict + merge on save, never a lost
+update. Disabled unless MEMORY_CACHE_TTL is set; with the Postgres
+invalidation bus (invalidation_bus_spa) entries are evicted as soon as any
+worker saves a newer version, so long TTLs are safe.
+
+Entries may be partial (a column-projected chat document after its save);
+what an entry covers is read off its keys, so a load for more columns than
+the entry holds is a miss.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Any
+
+class MemoryReadCache:
+    """Thread-safe LRU of memory documents with a time-to-live"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000, columns: Iterable[str] = ()):
+        """
+        Args:
+            ttl_seconds: How long an entry is served
+            max_entries: LRU bound
+            columns: The columns a full document has (entries missing any are partial)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.columns = tuple(columns)
+        self._entries = OrderedDict()  # user_id -> (stored_at, memory)
+        self._min_versions = OrderedDict()  # user_id -> newest version announced by another worker
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_full(self, memory: Dict[str, Any]) -> bool:
+        return all(column in memory for column in self.columns)
+
+    def get(self, user_id: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """Private copy of the cached document holding fields (default: all columns), or None"""
+        fields = self.columns if fields is None else fields
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            if any(field not in entry[1] for field in fields):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            memory = entry[1]
+        return copy.deepcopy(memory)
+
+    def put(self, memory: Dict[str, Any]) -> None:
+        snapshot = copy.deepcopy(memory)
+        version = snapshot.get("version", 0)
+        with self._lock:
+            # A load that raced an invalidation must not re-cache the older row
+            if version < self._min_versions.get(memory["user_id"], 0):
+                return
+            previous = self._entries.get(memory["user_id"])
+            if previous and not self.is_full(snapshot) and previous[1].get("version", 0) == version - 1:
+                # Partial save straight on top of the cached row: nothing else changed in between
+                snapshot = {**previous[1], **snapshot}
+            self._entries[memory["user_id"]] = (time.monotonic(), snapshot)
+            self._entries.move_to_end(memory["user_id"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id: str, version: Optional[int] = None) -> bool:
+        """Drop an entry; with a version, only if the cached copy is older"""
+        with self._lock:
+            if version is not None:
+                self._min_versions[user_id] = max(version, self._min_versions.get(user_id, 0))
+                self._min_versions.move_to_end(user_id)
+                while len(self._min_versions) > self.max_entries:
+                    self._min_versions.popitem(last=False)
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False
+            if version is not None and entry[1].get("version", 0) >= version:
+                return False
+            del self._entries[user_id]
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Cached documents, most recently used first"""
+        with self._lock:
+            memories = [entry[1] for entry in reversed(self._entries.values())]
+        return memories[:limit] if limit else memories
+
+    def warm(self, memories: List[Dict[str, Any]]) -> int:
+        """Seed the cache (oldest first so the newest end up most recent)"""
+        for memory in reversed(memories):
+            self.put(memory)
+        return len(memories)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,339 @@
+"""
+Compact History Codec
+=====================
+
+Binary encoding for the two append-only histories in a memory document
+(interactions and cta_attempts), stored in the ``history`` BYTEA column
+instead of two JSONB arrays when MEMORY_HISTORY_CODEC=compact.
+
+Layout (msgpack): ``[CODEC_VERSION, shapes, interaction_rows, cta_rows]``
+
+- shapes: each distinct key tuple once, so "timestamp"/"user"/"bot" are not
+  repeated per record; a row is ``[shape_index, value, value, ...]``
+- "timestamp" values become integer microseconds, delta-encoded against the
+  previous timestamp in the document (small varints instead of 26-char
+  strings). Values that wouldn't round-trip exactly are kept verbatim,
+  wrapped in a one-element list.
+
+Uses the msgpack C extension when installed; otherwise a pure-Python
+encoder/decoder for the same subset (nil, bool, int, float, str, bin,
+array, map), so either side can read what the other wrote.
+
+Migration: rows keep their JSONB arrays until the next save in compact mode
+(or ``python memory_codec_spa.py migrate``); loads prefer ``history`` when it
+is set, and a save in json mode clears it again, which is the rollback path.
+"""
+
+import argparse
+import logging
+import os
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+
+try:
+    import msgpack
+except ImportError:  # pure-Python fallback below
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+CODEC_VERSION = 1
+HISTORY_FIELDS = ("interactions", "cta_attempts")
+_EPOCH = datetime(1970, 1, 1)
+
+# ============================================================================
+# PURE-PYTHON MSGPACK SUBSET
+# ============================================================================
+
+def _pack(value: Any, out: bytearray) -> None:
+    if value is None:
+        out.append(0xc0)
+    elif value is True:
+        out.append(0xc3)
+    elif value is False:
+        out.append(0xc2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -32 <= value < 0:
+            out.append(value & 0xff)
+        elif 0 <= value <= 0xff:
+            out += struct.pack(">BB", 0xcc, value)
+        elif 0 <= value <= 0xffff:
+            out += struct.pack(">BH", 0xcd, value)
+        elif 0 <= value <= 0xffffffff:
+            out += struct.pack(">BI", 0xce, value)
+        elif 0 <= value < 1 << 64:
+            out += struct.pack(">BQ", 0xcf, value)
+        else:
+            out += struct.pack(">Bq", 0xd3, value)
+    elif isinstance(value, float):
+        out += struct.pack(">Bd", 0xcb, value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        n = len(data)
+        if n < 32:
+            out.append(0xa0 | n)
+        elif n <= 0xff:
+            out += struct.pack(">BB", 0xd9, n)
+        elif n <= 0xffff:
+            out += struct.pack(">BH", 0xda, n)
+        else:
+            out += struct.pack(">BI", 0xdb, n)
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        n = len(value)
+        out += struct.pack(">BB", 0xc4, n) if n <= 0xff else struct.pack(">BI", 0xc6, n)
+        out += value
+    elif isinstance(value, (list, tuple)):
+        n = len(value)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n <= 0xffff:
+            out += struct.pack(">BH", 0xdc, n)
+        else:
+            out += struct.pack(">BI", 0xdd, n)
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, dict):
+        n = len(value)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n <= 0xffff:
+            out += struct.pack(">BH", 0xde, n)
+        else:
+            out += struct.pack(">BI", 0xdf, n)
+        for key, item in value.items():
+            _pack(key, out)
+            _pack(item, out)
+    else:
+        raise TypeError(f"Can't encode {type(value).__name__} in memory history")
+
+_FIXED = {
+    0xcc: ">B", 0xcd: ">H", 0xce: ">I", 0xcf: ">Q",
+    0xd0: ">b", 0xd1: ">h", 0xd2: ">i", 0xd3: ">q",
+    0xca: ">f", 0xcb: ">d",
+}
+_LENGTH = {0xd9: ">B", 0xda: ">H", 0xdb: ">I", 0xc4: ">B", 0xc5: ">H", 0xc6: ">I",
+           0xdc: ">H", 0xdd: ">I", 0xde: ">H", 0xdf: ">I"}
+
+def _unpack(data: bytes, pos: int) -> Tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+    if tag < 0x80:
+        return tag, pos
+    if tag >= 0xe0:
+        return tag - 0x100, pos
+    if 0xa0 <= tag <= 0xbf:
+        end = pos + (tag & 0x1f)
+        return data[pos:end].decode("utf-8"), end
+    if 0x90 <= tag <= 0x9f:
+        return _unpack_array(data, pos, tag & 0x0f)
+    if 0x80 <= tag <= 0x8f:
+        return _unpack_map(data, pos, tag & 0x0f)
+    if tag == 0xc0:
+        return None, pos
+    if tag == 0xc2:
+        return False, pos
+    if tag == 0xc3:
+        return True, pos
+    if tag in _FIXED:
+        fmt = _FIXED[tag]
+        return struct.unpack_from(fmt, data, pos)[0], pos + struct.calcsize(fmt)
+    if tag in _LENGTH:
+        fmt = _LENGTH[tag]
+        n = struct.unpack_from(fmt, data, pos)[0]
+        pos += struct.calcsize(fmt)
+        if tag in (0xd9, 0xda, 0xdb):
+            return data[pos:pos + n].decode("utf-8"), pos + n
+        if tag in (0xc4, 0xc5, 0xc6):
+            return bytes(data[pos:pos + n]), pos + n
+        if tag in (0xdc, 0xdd):
+            return _unpack_array(data, pos, n)
+        return _unpack_map(data, pos, n)
+    raise ValueError(f"Unsupported msgpack tag 0x{tag:02x}")
+
+def _unpack_array(data: bytes, pos: int, n: int) -> Tuple[List[Any], int]:
+    items = []
+    for _ in range(n):
+        item, pos = _unpack(data, pos)
+        items.append(item)
+    return items, pos
+
+def _unpack_map(data: bytes, pos: int, n: int) -> Tuple[Dict[Any, Any], int]:
+    result = {}
+    for _ in range(n):
+        key, pos = _unpack(data, pos)
+        result[key], pos = _unpack(data, pos)
+    return result, pos
+
+def packb(value: Any) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(value, use_bin_type=True)
+    out = bytearray()
+    _pack(value, out)
+    return bytes(out)
+
+def unpackb(data: bytes) -> Any:
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    value, _ = _unpack(bytes(data), 0)
+    return value
+
+# ============================================================================
+# HISTORY ENCODING
+# ============================================================================
+
+def _timestamp_micros(value: Any) -> Optional[int]:
+    """Microseconds since the epoch, if the ISO string round-trips exactly"""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return None
+    delta = parsed - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+def encode_history(interactions: List[Dict[str, Any]], cta_attempts: List[Dict[str, Any]]) -> bytes:
+    """Pack both histories into one compact blob"""
+    shapes, shape_index = [], {}
+    previous = 0
+
+    def rows(records: List[Dict[str, Any]]) -> List[List[Any]]:
+        nonlocal previous
+        encoded = []
+        for record in records or []:
+            keys = tuple(record)
+            if keys not in shape_index:
+                shape_index[keys] = len(shapes)
+                shapes.append(list(keys))
+            row = [shape_index[keys]]
+            for key, value in record.items():
+                if key == "timestamp":
+                    micros = _timestamp_micros(value)
+                    if micros is None:
+                        value = [value]
+                    else:
+                        value, previous = micros - previous, micros
+                row.append(value)
+            encoded.append(row)
+        return encoded
+
+    return packb([CODEC_VERSION, shapes, rows(interactions), rows(cta_attempts)])
+
+def decode_history(blob: bytes) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Blob -> (interactions, cta_attempts), exactly as they were encoded"""
+    version, shapes, interaction_rows, cta_rows = unpackb(bytes(blob))
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unknown history codec version {version}")
+    previous = 0
+
+    def records(rows: List[List[Any]]) -> List[Dict[str, Any]]:
+        nonlocal previous
+        decoded = []
+        for row in rows:
+            record = dict(zip(shapes[row[0]], row[1:]))
+            value = record.get("timestamp")
+            if isinstance(value, int) and not isinstance(value, bool):
+                previous += value
+                record["timestamp"] = (_EPOCH + timedelta(microseconds=previous)).isoformat()
+            elif isinstance(value, list):
+                record["timestamp"] = value[0]
+            decoded.append(record)
+        return decoded
+
+    return records(interaction_rows), records(cta_rows)
+
+def history_codec() -> str:
+    """Configured codec for memory saves: json (default) or compact"""
+    codec = os.getenv("MEMORY_HISTORY_CODEC", "json")
+    if codec not in ("json", "compact"):
+        raise ValueError(f"MEMORY_HISTORY_CODEC must be json or compact, not {codec!r}")
+    return codec
+
+def apply_history_blob(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Replace a fetched row's JSONB histories with the decoded blob, when it has one"""
+    if row and row.get("history") is not None:
+        row = dict(row)
+        row["interactions"], row["cta_attempts"] = decode_history(row.pop("history"))
+    elif row and "history" in row:
+        row = dict(row)
+        del row["history"]
+    return row
+
+# ============================================================================
+# MIGRATION
+# ============================================================================
+
+MIGRATE_BATCH_SQL = {
+    "compact": """
+        SELECT user_id, version, interactions, cta_attempts FROM user_memories
+        WHERE history IS NULL AND user_id > %s ORDER BY user_id LIMIT %s
+    """,
+    "json": """
+        SELECT user_id, version, history FROM user_memories
+        WHERE history IS NOT NULL AND user_id > %s ORDER BY user_id LIMIT %s
+    """,
+}
+
+def migrate_histories(database_url: str, to: str = "compact", batch_size: int = 500) -> int:
+    """
+    Rewrite existing rows into the target codec in keyset-ordered batches
+
+    Each row is only updated if its version hasn't moved, so a concurrent chat
+    save always wins (that save converts the row itself).
+    """
+    import json
+    import psycopg2
+
+    converted, last_user = 0, ""
+    conn = psycopg2.connect(database_url)
+    try:
+        while True:
+            with conn, conn.cursor() as cur:
+                cur.execute(MIGRATE_BATCH_SQL[to], (last_user, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    if to == "compact":
+                        user_id, version, interactions, cta_attempts = row
+                        cur.execute(
+                            "UPDATE user_memories SET history = %s, interactions = '[]', cta_attempts = '[]' "
+                            "WHERE user_id = %s AND version = %s",
+                            (psycopg2.Binary(encode_history(interactions or [], cta_attempts or [])),
+                             user_id, version)
+                        )
+                    else:
+                        user_id, version, blob = row
+                        interactions, cta_attempts = decode_history(blob)
+                        cur.execute(
+                            "UPDATE user_memories SET history = NULL, interactions = %s, cta_attempts = %s "
+                            "WHERE user_id = %s AND version = %s",
+                            (json.dumps(interactions), json.dumps(cta_attempts), user_id, version)
+                        )
+                    converted += cur.rowcount
+                last_user = rows[-1][0]
+            logger.info(f"Migrated {converted} memory rows to {to} history so far")
+    finally:
+        conn.close()
+    return converted
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert stored memory histories between codecs")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--to", choices=["compact", "json"], default="compact")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    converted = migrate_histories(args.database_url, args.to, args.batch_size)
+    print(f"Converted {converted} rows to {args.to}")
+
+if __name__ == "__main__":
+    main()
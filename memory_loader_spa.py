@@ -0,0 +1,412 @@
+"""
+Bulk Memory Loader
+==================
+
+Moves whole user bases between backends and seeds synthetic visitors for load
+tests, without a save_memory round trip per document.
+
+Sources (``--source``):
+  synthetic:N        N generated visitors (same visitors for a given --seed)
+  snapshot:PATH      a MemorySnapshotter file (in-memory / shared-session backends)
+  sqlite:PATH        the SQLite backend's user_memories table
+  ndjson:PATH        one memory document per line ('-' = stdin)
+
+Targets (``--target``):
+  postgres           DATABASE_URL; each batch is COPY'd FROM STDIN into a temp
+                     staging table and merged with one INSERT ... SELECT ... ON
+                     CONFLICT, honouring MEMORY_HISTORY_CODEC
+  sqlite:PATH        multi-row inserts, one transaction per batch
+
+Existing visitors are kept unless ``--replace`` is given (then only older
+rows are overwritten). With ``--checkpoint`` the number of documents
+committed is recorded after every batch, so an interrupted load resumes where
+it stopped; re-running a batch is harmless either way.
+
+Usage:  python memory_loader_spa.py --source synthetic:1000000 --target postgres --checkpoint seed.ckpt
+"""
+
+import argparse
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from memory_codec_spa import encode_history, history_codec
+
+logger = logging.getLogger(__name__)
+
+MEMORY_COLUMNS = (
+    "user_id", "created_at", "last_updated", "interactions", "key_facts", "conversation_summary",
+    "preferences", "buyer_stage", "engagement_level", "render_requested", "render_status",
+    "render_details", "contact_info", "cta_attempts", "last_cta_attempt", "reset_at", "history",
+    "version"
+)
+JSON_COLUMNS = ("interactions", "key_facts", "preferences", "render_details", "contact_info", "cta_attempts")
+
+# ============================================================================
+# SOURCES
+# ============================================================================
+
+SYNTHETIC_STAGES = ["browsing"] * 4 + ["researching"] * 3 + ["interested"] * 2 + ["considering", "ready"]
+SYNTHETIC_TURNS = [
+    ("How much is the Utopia series?", "The Utopia series runs from about $11,000 to $17,000 all-inclusive."),
+    ("Do you have a salt system option?", "Yes - our salt system keeps the water soft and cuts chemical handling."),
+    ("Can six people fit?", "The Paradise Makena seats six comfortably with a lounger."),
+    ("Is financing available?", "We offer financing through our lending partner with approved credit."),
+    ("We have a small patio", "The Vacanza series has compact models that fit most patios."),
+    ("What is the warranty?", "Shells carry a lifetime warranty; equipment is covered for five years."),
+    ("Can I visit the showroom this weekend?", "Absolutely - we're open Saturday 10 to 5 in Moore."),
+    ("Do you install the electrical?", "Every spa includes delivery, the electrical sub-panel and setup."),
+]
+SYNTHETIC_REASONS = ["relaxation", "therapy", "family", "entertaining"]
+SYNTHETIC_FEATURES = ["jets", "lights", "salt", "lounger", "waterfall"]
+
+def synthetic_memory(index: int, seed: int = 0, days: int = 90, max_turns: int = 15) -> Dict[str, Any]:
+    """One generated visitor; the same (index, seed) always gives the same visitor (timestamps relative to now)"""
+    rng = random.Random(f"{seed}:{index}")
+    last_updated = datetime.now() - timedelta(seconds=rng.uniform(0, days * 86400))
+    turns = rng.randint(1, max_turns)
+    interactions, at = [], last_updated
+    for _ in range(turns):
+        user, bot = rng.choice(SYNTHETIC_TURNS)
+        interactions.append({"timestamp": at.isoformat(), "user": user, "bot": bot})
+        at -= timedelta(minutes=rng.uniform(0.5, 5))
+    interactions.reverse()
+
+    key_facts = {}
+    if rng.random() < 0.4:
+        key_facts["preferred_seats"] = rng.randint(2, 8)
+    if rng.random() < 0.3:
+        key_facts["budget_range"] = f"${rng.randrange(5000, 30000, 1000):,}"
+    if rng.random() < 0.5:
+        key_facts["reason"] = rng.choice(SYNTHETIC_REASONS)
+    if rng.random() < 0.3:
+        key_facts["features"] = rng.sample(SYNTHETIC_FEATURES, rng.randint(1, 3))
+
+    return {
+        "user_id": f"synthetic_{index:09d}",
+        "created_at": interactions[0]["timestamp"],
+        "last_updated": last_updated.isoformat(),
+        "interactions": interactions,
+        "key_facts": key_facts,
+        "buyer_stage": rng.choice(SYNTHETIC_STAGES),
+        "engagement_level": rng.randint(1, 5),
+        "cta_attempts": []
+    }
+
+def iter_sqlite_memories(path: str, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """Documents from a SQLite backend file, in user_id order"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        last_user = ""
+        while True:
+            rows = conn.execute("SELECT * FROM user_memories WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                                (last_user, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                memory = dict(row)
+                for column in JSON_COLUMNS:
+                    if isinstance(memory.get(column), str):
+                        memory[column] = json.loads(memory[column])
+                yield memory
+            last_user = rows[-1]["user_id"]
+    finally:
+        conn.close()
+
+def iter_ndjson_memories(path: str) -> Iterator[Dict[str, Any]]:
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def open_source(spec: str, skip: int = 0, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Memory documents for a --source spec, starting after the first skip
+
+    Raises:
+        ValueError: unknown source kind
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "synthetic":
+        return (synthetic_memory(index, seed) for index in range(skip, int(arg)))
+    if kind == "snapshot":
+        from memory_snapshot_spa import read_snapshot
+        documents = iter(read_snapshot(arg))
+    elif kind == "sqlite":
+        documents = iter_sqlite_memories(arg)
+    elif kind == "ndjson":
+        documents = iter_ndjson_memories(arg)
+    else:
+        raise ValueError(f"Unknown source {spec!r} (synthetic:N, snapshot:PATH, sqlite:PATH, ndjson:PATH)")
+    return itertools.islice(documents, skip, None)
+
+# ============================================================================
+# ROWS
+# ============================================================================
+
+def _timestamp(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def memory_row(memory: Dict[str, Any], codec: str = "json") -> Tuple:
+    """A memory document as MEMORY_COLUMNS values (JSON columns serialized)"""
+    interactions = memory.get("interactions") or []
+    cta_attempts = memory.get("cta_attempts") or []
+    history = None
+    if codec == "compact":
+        history = encode_history(interactions, cta_attempts)
+        interactions, cta_attempts = [], []
+    last_updated = _timestamp(memory.get("last_updated")) or datetime.now()
+    return (
+        memory["user_id"],
+        _timestamp(memory.get("created_at")) or last_updated,
+        last_updated,
+        json.dumps(interactions),
+        json.dumps(memory.get("key_facts") or {}),
+        memory.get("conversation_summary") or "",
+        json.dumps(memory.get("preferences") or {}),
+        memory.get("buyer_stage") or "browsing",
+        memory.get("engagement_level") or 1,
+        bool(memory.get("render_requested")),
+        memory.get("render_status"),
+        json.dumps(memory.get("render_details") or {}),
+        json.dumps(memory.get("contact_info") or {}),
+        json.dumps(cta_attempts),
+        _timestamp(memory.get("last_cta_attempt")),
+        _timestamp(memory.get("reset_at")),
+        history,
+        max(1, memory.get("version") or 1)
+    )
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def copy_value(value: Any) -> str:
+    """One field in COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+# ============================================================================
+# TARGETS
+# ============================================================================
+
+_COLUMN_LIST = ", ".join(MEMORY_COLUMNS)
+
+class PostgresLoader:
+    """COPY each batch into a temp staging table, then merge into user_memories"""
+
+    STAGE_SQL = ("CREATE TEMP TABLE IF NOT EXISTS memory_import "
+                 "(LIKE user_memories INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+    COPY_SQL = f"COPY memory_import ({_COLUMN_LIST}) FROM STDIN"
+    # DISTINCT ON: a batch may hold the same visitor twice; keep the newest
+    MERGE_SQL = f"""
+        INSERT INTO user_memories ({_COLUMN_LIST})
+        SELECT DISTINCT ON (user_id) {_COLUMN_LIST} FROM memory_import
+        ORDER BY user_id, last_updated DESC
+        ON CONFLICT (user_id) DO {{action}}
+    """
+    REPLACE_ACTION = "UPDATE SET " + ", ".join(
+        f"{column} = EXCLUDED.{column}" for column in MEMORY_COLUMNS if column not in ("user_id", "version")
+    ) + ", version = user_memories.version + 1 WHERE user_memories.last_updated < EXCLUDED.last_updated"
+
+    def __init__(self, database_url: str, replace: bool = False, codec: str = None):
+        import psycopg2
+
+        self.codec = codec or history_codec()
+        self.merge_sql = self.MERGE_SQL.format(action=self.REPLACE_ACTION if replace else "NOTHING")
+        self.conn = psycopg2.connect(database_url)
+        with self.conn.cursor() as cur:
+            cur.execute(self.STAGE_SQL)
+        self.conn.commit()
+
+    def write(self, memories: List[Dict[str, Any]]) -> int:
+        """Load one batch in one transaction; returns rows inserted or replaced"""
+        buffer = io.StringIO()
+        for memory in memories:
+            buffer.write("\t".join(copy_value(v) for v in memory_row(memory, self.codec)))
+            buffer.write("\n")
+        buffer.seek(0)
+        try:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(self.COPY_SQL, buffer)
+                cur.execute(self.merge_sql)
+                written = cur.rowcount
+            self.conn.commit()
+            return written
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def close(self) -> None:
+        self.conn.close()
+
+class SQLiteLoader:
+    """Multi-row inserts into a SQLite backend file (schema created if missing)"""
+
+    COLUMNS = tuple(column for column in MEMORY_COLUMNS if column != "history")
+    INSERT_SQL = (f"INSERT INTO user_memories ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                  "ON CONFLICT (user_id) DO {action}")
+    REPLACE_ACTION = "UPDATE SET " + ", ".join(
+        f"{column} = excluded.{column}" for column in COLUMNS if column not in ("user_id", "version")
+    ) + ", version = user_memories.version + 1 WHERE user_memories.last_updated < excluded.last_updated"
+
+    def __init__(self, path: str, replace: bool = False):
+        from memory_backends_spa import _sqlite_timestamp, ensure_sqlite_schema
+
+        self._timestamp = _sqlite_timestamp
+        self.insert_sql = self.INSERT_SQL.format(action=self.REPLACE_ACTION if replace else "NOTHING")
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        ensure_sqlite_schema(self.conn)
+
+    def _row(self, memory: Dict[str, Any]) -> Tuple:
+        row = dict(zip(MEMORY_COLUMNS, memory_row(memory)))
+        return tuple(self._timestamp(row[c]) if isinstance(row[c], datetime) else row[c] for c in self.COLUMNS)
+
+    def write(self, memories: List[Dict[str, Any]]) -> int:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(self.insert_sql, [self._row(memory) for memory in memories])
+            self.conn.execute("COMMIT")
+            return self.conn.total_changes - before
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self.conn.close()
+
+def open_target(spec: str, replace: bool = False, database_url: str = None):
+    """
+    Loader for a --target spec
+
+    Raises:
+        ValueError: unknown target, or postgres without a database URL
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "postgres":
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable is required")
+        return PostgresLoader(database_url, replace)
+    if kind == "sqlite":
+        return SQLiteLoader(arg or os.getenv("SQLITE_MEMORY_PATH", "spa_memory.db"), replace)
+    raise ValueError(f"Unknown target {spec!r} (postgres, sqlite:PATH)")
+
+# ============================================================================
+# LOAD
+# ============================================================================
+
+def read_checkpoint(path: Optional[str], source: str) -> int:
+    """Documents already committed for this source (0 if no checkpoint or another source)"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("source") != source:
+        logger.warning(f"Checkpoint {path} is for {state.get('source')!r}; starting from the beginning")
+        return 0
+    return state["done"]
+
+def write_checkpoint(path: str, source: str, done: int) -> None:
+    """Atomically record progress"""
+    fd, tmp_path = tempfile.mkstemp(prefix=".checkpoint-", dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(fd, "w") as f:
+        json.dump({"source": source, "done": done, "updated": datetime.now().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+def bulk_load(documents: Iterable[Dict[str, Any]], loader, batch_size: int = 5000,
+              checkpoint: str = None, source: str = "", done: int = 0) -> Dict[str, Any]:
+    """
+    Write documents in batches, logging throughput as it goes
+
+    Args:
+        documents: Memory documents (already positioned after the first done)
+        loader: PostgresLoader or SQLiteLoader
+        batch_size: Documents per COPY/transaction
+        checkpoint: Progress file to update after every committed batch
+        source: Source spec recorded in the checkpoint
+        done: Documents committed by earlier runs
+
+    Returns:
+        Totals: read, written (new or replaced rows), seconds, rows_per_sec
+    """
+    started = time.perf_counter()
+    read = written = 0
+    documents = iter(documents)
+    while True:
+        batch = list(itertools.islice(documents, batch_size))
+        if not batch:
+            break
+        written += loader.write(batch)
+        read += len(batch)
+        if checkpoint:
+            write_checkpoint(checkpoint, source, done + read)
+        elapsed = time.perf_counter() - started
+        logger.info(f"{done + read:,} documents ({written:,} written) - {read / elapsed:,.0f} rows/s")
+
+    elapsed = time.perf_counter() - started
+    return {"read": read, "written": written, "seconds": round(elapsed, 2),
+            "rows_per_sec": round(read / elapsed) if elapsed else 0}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--target", default="postgres")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--checkpoint", help="progress file; resume from it when present")
+    parser.add_argument("--replace", action="store_true", help="overwrite existing visitors with newer documents")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic source seed")
+    parser.add_argument("--backfill-turns", action="store_true",
+                        help="copy the loaded histories into the conversation turn log afterwards")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    done = read_checkpoint(args.checkpoint, args.source)
+    if done:
+        logger.info(f"Resuming after {done:,} documents")
+    try:
+        loader = open_target(args.target, args.replace, args.database_url)
+        documents = open_source(args.source, skip=done, seed=args.seed)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    try:
+        totals = bulk_load(documents, loader, args.batch_size, args.checkpoint, args.source, done)
+    finally:
+        loader.close()
+    print(f"Loaded {totals['read']:,} documents ({totals['written']:,} written) "
+          f"in {totals['seconds']}s - {totals['rows_per_sec']:,} rows/s")
+
+    if args.backfill_turns and args.target == "postgres":
+        from turn_log_spa import backfill_turn_log
+        print(f"Backfilled {backfill_turn_log(args.database_url):,} turns into the turn log")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Memory Snapshots - Fast Restart & Warm Reload
+=============================================
+
+Periodically writes the live session documents of the active memory backend
+to a compact binary snapshot, and reloads the most recent visitors on start
+so a deploy or crash doesn't cold-start every conversation (and, for the
+no-database backends, doesn't lose them outright). For Postgres only the
+read cache is snapshotted, and restored entries are kept only while their
+version still matches the stored row.
+
+Format: MAGIC header, then zlib-compressed msgpack (memory_codec_spa's
+packb/unpackb) of ``{"created": <epoch>, "memories": [<memory dict>, ...]}``.
+msgpack only decodes into plain data and doesn't change with the Python
+version, so an interpreter upgrade can still warm from the previous deploy's
+snapshot; an unreadable or older-format file is logged and skipped. Writes
+go to a temp file that is fsync'd and os.replace'd over the old snapshot, so
+a reader never sees a torn file. Several workers share one snapshot: each merges its documents
+into the current file (newest last_updated per user wins) under a lock.
+"""
+
+import atexit
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Any
+
+from memory_codec_spa import packb, unpackb
+
+logger = logging.getLogger(__name__)
+
+# SPASNAP1 files (marshal) are not read back: decoding marshal isn't safe or version-stable
+SNAPSHOT_MAGIC = b"SPASNAP2"
+
+def encode_snapshot(memories: List[Dict[str, Any]]) -> bytes:
+    return SNAPSHOT_MAGIC + zlib.compress(packb({"created": time.time(), "memories": memories}), 1)
+
+def decode_snapshot(data: bytes) -> List[Dict[str, Any]]:
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("Not a memory snapshot (or an older format)")
+    return unpackb(zlib.decompress(data[len(SNAPSHOT_MAGIC):]))["memories"]
+
+def read_snapshot(path: str) -> List[Dict[str, Any]]:
+    """Documents from a snapshot file, most recently updated first ([] if missing/corrupt)"""
+    try:
+        with open(path, "rb") as f:
+            return decode_snapshot(f.read())
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        logger.error(f"Ignoring unreadable memory snapshot {path}: {e}")
+        return []
+
+def write_snapshot(path: str, memories: List[Dict[str, Any]]) -> None:
+    """Atomically replace the snapshot file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(encode_snapshot(memories))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def merge_snapshots(current: List[Dict[str, Any]], fresh: List[Dict[str, Any]],
+                    limit: int) -> List[Dict[str, Any]]:
+    """Newest document per user, most recently updated first, capped at limit"""
+    by_user = {}
+    for memory in current + fresh:
+        existing = by_user.get(memory["user_id"])
+        if existing is None or str(memory.get("last_updated", "")) >= str(existing.get("last_updated", "")):
+            by_user[memory["user_id"]] = memory
+    merged = sorted(by_user.values(), key=lambda m: str(m.get("last_updated", "")), reverse=True)
+    return merged[:limit]
+
+class MemorySnapshotter:
+    """Background snapshot writer + warm loader for a memory backend"""
+
+    def __init__(self, memory_manager, path: str = None, interval: float = 60,
+                 warm_users: int = 500, max_users: int = 50000):
+        """
+        Args:
+            memory_manager: Backend exposing snapshot_sessions() / warm_sessions()
+            path: Snapshot file (default MEMORY_SNAPSHOT_PATH)
+            interval: Seconds between snapshots
+            warm_users: Most recent visitors to reload on start
+            max_users: Documents kept in the snapshot file
+        """
+        self.memory = memory_manager
+        self.path = path or os.getenv("MEMORY_SNAPSHOT_PATH")
+        self.interval = interval
+        self.warm_users = warm_users
+        self.max_users = max_users
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_snapshot = None
+
+        if not self.path:
+            raise ValueError("MEMORY_SNAPSHOT_PATH is required for snapshots")
+
+    def warm_start(self) -> int:
+        """Reload the most recent visitors from the snapshot into the backend"""
+        started = time.perf_counter()
+        memories = read_snapshot(self.path)[:self.warm_users]
+        warmed = self.memory.warm_sessions(memories) if memories else 0
+        logger.info(f"Warm start: {warmed} of {len(memories)} sessions restored from {self.path} "
+                    f"in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return warmed
+
+    def snapshot(self) -> int:
+        """Merge this process's live sessions into the snapshot file"""
+        fresh = self.memory.snapshot_sessions(self.max_users)
+        if not fresh:
+            return 0
+
+        started = time.perf_counter()
+        # Workers sharing the file take turns so none drops another's sessions
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                memories = merge_snapshots(read_snapshot(self.path), fresh, self.max_users)
+                write_snapshot(self.path, memories)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        self.last_snapshot = {
+            "ts": time.time(),
+            "sessions": len(memories),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        logger.info(f"Memory snapshot: {len(memories)} sessions in {self.last_snapshot['duration_ms']}ms")
+        return len(memories)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error(f"Memory snapshot failed: {e}")
+
+    def start(self) -> None:
+        """Snapshot every interval on a daemon thread, plus once at exit"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-snapshot", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stop.set()
+        try:
+            self.snapshot()
+        except Exception as e:
+            logger.error(f"Final memory snapshot failed: {e}")
+
+    def stats(self) -> Optional[Dict[str, Any]]:
+        return self.last_snapshot
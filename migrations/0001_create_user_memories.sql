@@ -0,0 +1,23 @@
+-- Baseline: the user_memories table as first shipped, plus its two indexes.
+-- IF NOT EXISTS so databases created before migrations existed adopt it as-is.
+CREATE TABLE IF NOT EXISTS user_memories (
+    user_id VARCHAR(50) PRIMARY KEY,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    interactions JSONB DEFAULT '[]',
+    key_facts JSONB DEFAULT '{}',
+    conversation_summary TEXT DEFAULT '',
+    preferences JSONB DEFAULT '{}',
+    buyer_stage VARCHAR(50) DEFAULT 'browsing',
+    engagement_level INT DEFAULT 1,
+    render_requested BOOLEAN DEFAULT FALSE,
+    render_status VARCHAR(50) DEFAULT NULL,
+    render_details JSONB DEFAULT '{}',
+    contact_info JSONB DEFAULT '{}',
+    cta_attempts JSONB DEFAULT '[]',
+    last_cta_attempt TIMESTAMP DEFAULT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_memories_last_updated ON user_memories(last_updated);
+
+CREATE INDEX IF NOT EXISTS idx_user_memories_buyer_stage ON user_memories(buyer_stage);
@@ -0,0 +1,2 @@
+-- Row version for compare-and-swap saves
+ALTER TABLE user_memories ADD COLUMN IF NOT EXISTS version INT NOT NULL DEFAULT 0;
@@ -0,0 +1,2 @@
+-- Compact interactions/cta_attempts blob (memory_codec_spa); NULL = the JSONB columns hold them
+ALTER TABLE user_memories ADD COLUMN IF NOT EXISTS history BYTEA DEFAULT NULL;
@@ -0,0 +1,24 @@
+-- Append-only turn log, range-partitioned by month (see turn_log_spa)
+CREATE TABLE IF NOT EXISTS conversation_turns (
+    user_id VARCHAR(50) NOT NULL,
+    turn_at TIMESTAMP NOT NULL,
+    user_message TEXT NOT NULL DEFAULT '',
+    bot_response TEXT NOT NULL DEFAULT '',
+    buyer_stage VARCHAR(50)
+) PARTITION BY RANGE (turn_at);
+
+CREATE INDEX IF NOT EXISTS idx_conversation_turns_user ON conversation_turns (user_id, turn_at);
+
+-- This month and the next two; later months are created by cleanup_expired_memories
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR i IN 0..2 LOOP
+        month := (date_trunc('month', now()) + make_interval(months => i))::date;
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF conversation_turns FOR VALUES FROM (%L) TO (%L)',
+            'conversation_turns_' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date
+        );
+    END LOOP;
+END $$;
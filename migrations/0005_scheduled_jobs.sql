@@ -0,0 +1,10 @@
+-- Cluster-wide last run of each background job (see job_scheduler_spa)
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    job_name VARCHAR(100) PRIMARY KEY,
+    last_started_at TIMESTAMP,
+    last_finished_at TIMESTAMP,
+    last_status VARCHAR(20),
+    last_duration_ms DOUBLE PRECISION,
+    last_error TEXT,
+    last_runner VARCHAR(255)
+);
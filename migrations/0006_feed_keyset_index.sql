@@ -0,0 +1,3 @@
+-- migrate: no-transaction
+-- Keyset pagination for the admin feed: ORDER BY last_updated DESC, user_id DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_memories_feed ON user_memories (last_updated, user_id);
@@ -0,0 +1,8 @@
+-- Full-text search over the turn log: visitor text (A) ranks above bot text (B).
+-- Generated, so every INSERT indexes its turn; the GIN index cascades to each partition.
+ALTER TABLE conversation_turns ADD COLUMN IF NOT EXISTS search tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(user_message, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(bot_response, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_conversation_turns_search ON conversation_turns USING GIN (search);
@@ -0,0 +1,7 @@
+-- migrate: no-transaction
+-- Lead segmentation: stage + seats + budget from key_facts (expressions must match lead_segments_spa)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_memories_lead_facts ON user_memories (
+    buyer_stage,
+    (CASE WHEN jsonb_typeof(key_facts->'preferred_seats') = 'number' THEN (key_facts->>'preferred_seats')::numeric END),
+    (NULLIF(regexp_replace(key_facts->>'budget_range', '[^0-9]', '', 'g'), '')::numeric)
+);
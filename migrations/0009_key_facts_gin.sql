@@ -0,0 +1,3 @@
+-- migrate: no-transaction
+-- Lead segmentation: key_facts @> '{"reason": ..., "features": [...]}' containment
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_memories_key_facts ON user_memories USING GIN (key_facts jsonb_path_ops);
@@ -0,0 +1,18 @@
+-- Funnel analytics (see funnel_analytics_spa): raw events queued by chat saves,
+-- drained by the rollup job into hourly counters
+CREATE TABLE IF NOT EXISTS funnel_events (
+    id BIGSERIAL PRIMARY KEY,
+    occurred_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    kind VARCHAR(10) NOT NULL,
+    from_key VARCHAR(50) NOT NULL DEFAULT '',
+    to_key VARCHAR(50) NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS funnel_hourly (
+    hour TIMESTAMP NOT NULL,
+    kind VARCHAR(10) NOT NULL,
+    from_key VARCHAR(50) NOT NULL DEFAULT '',
+    to_key VARCHAR(50) NOT NULL DEFAULT '',
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, kind, from_key, to_key)
+);
@@ -0,0 +1,2 @@
+-- When /reset-conversation last cleared the document; a save that conflicts with a newer reset keeps the reset
+ALTER TABLE user_memories ADD COLUMN IF NOT EXISTS reset_at TIMESTAMP DEFAULT NULL;
@@ -0,0 +1,288 @@
+"""
+Schema Migrations
+=================
+
+Ordered, versioned DDL for the Postgres memory store. Migrations live in
+``migrations/NNNN_description.sql`` and are applied once per deploy:
+
+    python schema_migrations_spa.py migrate     # apply pending migrations
+    python schema_migrations_spa.py status      # applied vs available
+    python schema_migrations_spa.py verify      # exit 1 if the database is behind
+
+Applied versions are recorded in ``schema_version``. Workers only check the
+recorded version on boot (one query) and refuse to start if the database is
+behind. SCHEMA_AUTO_MIGRATE=1 lets a booting worker apply the pending files
+itself (single-process dev setups); peers poll the advisory lock rather than
+block on it, since a waiting statement holds a snapshot that CREATE INDEX
+CONCURRENTLY would wait on.
+
+Each file runs in its own transaction together with its schema_version row.
+A file whose first line is ``-- migrate: no-transaction`` runs outside one
+(for CREATE INDEX CONCURRENTLY and friends); such a file must hold a single
+idempotent statement. A concurrent build that fails leaves an INVALID index
+behind, which IF NOT EXISTS would then skip: it is dropped before the retry,
+and the version is only recorded once the index is valid.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+SCHEMA_VERSION_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+CURRENT_VERSION_SQL = "SELECT COALESCE(MAX(version), 0) FROM schema_version"
+RECORD_VERSION_SQL = "INSERT INTO schema_version (version, name) VALUES (%s, %s)"
+
+# Any constant works; it only has to be the same in every process
+MIGRATION_LOCK_ID = 0x5ba5c4e3
+MIGRATION_LOCK_POLL_SECONDS = 1.0
+
+CONCURRENT_INDEX_RE = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)",
+                                 re.IGNORECASE)
+# NULL when the index doesn't exist
+INDEX_VALID_SQL = "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)"
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is behind the migrations shipped with this code"""
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith("-- migrate: no-transaction")
+
+    @property
+    def concurrent_index(self) -> Optional[str]:
+        """Name of the index a CREATE INDEX CONCURRENTLY migration builds"""
+        match = CONCURRENT_INDEX_RE.search(self.sql)
+        return match.group(1) if match else None
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """Migration files in version order (NNNN_name.sql)"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = re.fullmatch(r"(\d+)_(\w+)\.sql", filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+def latest_version(directory: str = MIGRATIONS_DIR) -> int:
+    migrations = load_migrations(directory)
+    return migrations[-1].version if migrations else 0
+
+def auto_migrate_enabled() -> bool:
+    return os.getenv("SCHEMA_AUTO_MIGRATE", "0") == "1"
+
+class InvalidIndex(RuntimeError):
+    """A concurrent index build finished but left the index unusable"""
+
+# ============================================================================
+# SYNC (psycopg2)
+# ============================================================================
+
+def current_version(conn) -> int:
+    """Recorded schema version; 0 if migrations have never run"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return 0
+        cur.execute(CURRENT_VERSION_SQL)
+        return cur.fetchone()[0]
+
+def index_valid(cur, name: str) -> Optional[bool]:
+    """pg_index.indisvalid for an index; None if it doesn't exist"""
+    cur.execute(INDEX_VALID_SQL, (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def _apply_concurrent(cur, migration: Migration) -> None:
+    """Run a no-transaction migration, rebuilding an INVALID index left by a failed attempt"""
+    index = migration.concurrent_index
+    if index and index_valid(cur, index) is False:
+        logger.warning(f"Dropping invalid index {index} left by an earlier attempt")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+    cur.execute(migration.sql)
+    if index and not index_valid(cur, index):
+        raise InvalidIndex(f"Index {index} from migration {migration.version:04d} is not valid")
+
+def _advisory_lock(cur) -> None:
+    """Take the migration lock without holding a snapshot while waiting"""
+    while True:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        if cur.fetchone()[0]:
+            return
+        time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+
+def apply_migrations(conn, target: Optional[int] = None, directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Apply pending migrations up to target (default: all) on a psycopg2 connection
+
+    Returns:
+        The migrations that were applied by this call
+    """
+    previous_autocommit = conn.autocommit
+    conn.rollback()
+    conn.autocommit = True
+    applied = []
+    with conn.cursor() as cur:
+        # Only one process migrates; the rest wait here and then find nothing to do
+        _advisory_lock(cur)
+        try:
+            cur.execute(SCHEMA_VERSION_TABLE_SQL)
+            version = current_version(conn)
+            for migration in load_migrations(directory):
+                if migration.version <= version or (target is not None and migration.version > target):
+                    continue
+                logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+                if migration.transactional:
+                    cur.execute("BEGIN")
+                    try:
+                        cur.execute(migration.sql)
+                        cur.execute(RECORD_VERSION_SQL, (migration.version, migration.name))
+                        cur.execute("COMMIT")
+                    except Exception:
+                        cur.execute("ROLLBACK")
+                        raise
+                else:
+                    _apply_concurrent(cur, migration)
+                    cur.execute(RECORD_VERSION_SQL, (migration.version, migration.name))
+                applied.append(migration)
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.autocommit = previous_autocommit
+    return applied
+
+def ensure_schema(conn, directory: str = MIGRATIONS_DIR) -> int:
+    """
+    Cheap boot-time check: one query when up to date
+
+    Raises:
+        SchemaOutOfDate: database is behind and SCHEMA_AUTO_MIGRATE is not set
+    """
+    expected = latest_version(directory)
+    version = current_version(conn)
+    if version >= expected:
+        return version
+    if not auto_migrate_enabled():
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version}, code expects {expected}: "
+            f"run 'python schema_migrations_spa.py migrate'"
+        )
+    apply_migrations(conn, directory=directory)
+    return current_version(conn)
+
+# ============================================================================
+# ASYNC (asyncpg)
+# ============================================================================
+
+async def _apply_concurrent_async(conn, migration: Migration) -> None:
+    """_apply_concurrent for an asyncpg connection"""
+    index = migration.concurrent_index
+    valid_sql = INDEX_VALID_SQL.replace("%s", "$1")
+    if index and await conn.fetchval(valid_sql, index) is False:
+        logger.warning(f"Dropping invalid index {index} left by an earlier attempt")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+    await conn.execute(migration.sql)
+    if index and not await conn.fetchval(valid_sql, index):
+        raise InvalidIndex(f"Index {index} from migration {migration.version:04d} is not valid")
+
+async def ensure_schema_async(conn, directory: str = MIGRATIONS_DIR) -> int:
+    """ensure_schema for an asyncpg connection"""
+    expected = latest_version(directory)
+    exists = await conn.fetchval("SELECT to_regclass('schema_version') IS NOT NULL")
+    version = await conn.fetchval(CURRENT_VERSION_SQL) if exists else 0
+    if version >= expected:
+        return version
+    if not auto_migrate_enabled():
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version}, code expects {expected}: "
+            f"run 'python schema_migrations_spa.py migrate'"
+        )
+
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_ID):
+        await asyncio.sleep(MIGRATION_LOCK_POLL_SECONDS)
+    try:
+        await conn.execute(SCHEMA_VERSION_TABLE_SQL)
+        version = await conn.fetchval(CURRENT_VERSION_SQL)
+        for migration in load_migrations(directory):
+            if migration.version <= version:
+                continue
+            logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+            if migration.transactional:
+                async with conn.transaction():
+                    await conn.execute(migration.sql)
+                    await conn.execute("INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                                       migration.version, migration.name)
+            else:
+                await _apply_concurrent_async(conn, migration)
+                await conn.execute("INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                                   migration.version, migration.name)
+        return await conn.fetchval(CURRENT_VERSION_SQL)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply or inspect memory store schema migrations")
+    parser.add_argument("command", choices=["migrate", "status", "verify"])
+    parser.add_argument("--target", type=int, default=None, help="Stop after this version (migrate)")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    if not args.database_url:
+        sys.exit("DATABASE_URL environment variable is required")
+
+    import psycopg2
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    conn = psycopg2.connect(args.database_url)
+    try:
+        if args.command == "migrate":
+            applied = apply_migrations(conn, target=args.target)
+            print(f"Applied {len(applied)} migration(s); schema at version {current_version(conn)}")
+            return
+
+        version = current_version(conn)
+        migrations = load_migrations()
+        if args.command == "status":
+            for migration in migrations:
+                state = "applied" if migration.version <= version else "pending"
+                print(f"{migration.version:04d}_{migration.name:<40}{state}")
+            return
+
+        expected = migrations[-1].version if migrations else 0
+        print(f"schema version {version}, expected {expected}")
+        sys.exit(0 if version >= expected else 1)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
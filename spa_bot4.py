@@ -5,17 +5,19 @@ Uses the actual methods from ConversationFlowEngine
 """
 
 from flask import render_template_string, redirect
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, request, jsonify, session, stream_with_context
 from flask_cors import CORS
 from flask import request
 from dotenv import load_dotenv
 from datetime import datetime
 import openai
+import itertools
 import os
 import logging
 import json
-import re
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from typing import Dict, Any, Optional
 
 # Load environment variables
 load_dotenv()
@@ -110,9 +112,32 @@ async function ping(){
        t.textContent = r.ok ? 'Connected ✓' : 'Not connected ✗';
   }catch(_e){ t.textContent='Not connected ✗'; }
 }
+// WebSocket channel (async server only); falls back to POST /chat when unavailable
+let ws=null, wsBubble=null;
+function openWs(){
+  try{ ws=new WebSocket((location.protocol==='https:'?'wss://':'ws://')+location.host+'/ws/chat'); }
+  catch(_e){ ws=null; return; }
+  ws.onmessage=(ev)=>{
+    const d=JSON.parse(ev.data);
+    if(d.type==='ready' && d.user_id) document.getElementById('uid').textContent=d.user_id;
+    if(d.type==='delta'){
+      if(!wsBubble){ add('bot',''); wsBubble=[...document.querySelectorAll('.msg.bot .b')].pop(); }
+      wsBubble.textContent+=d.text; document.getElementById('chat').scrollTop=1e9;
+    }
+    if(d.type==='done'){
+      if(!wsBubble) add('bot', d.reply || '(no reply)');
+      wsBubble=null; save();
+      if(d.buyer_stage||d.stage) document.getElementById('stg').textContent=(d.buyer_stage||d.stage);
+    }
+    if(d.type==='reset') resetDone();
+    if(d.type==='error'){ wsBubble=null; add('bot','(error)'); }
+  };
+  ws.onclose=()=>{ ws=null; };
+}
 async function send(){
   const i=document.getElementById('msg'); const m=(i.value||'').trim(); if(!m) return; i.value='';
   add('me',m);
+  if(ws && ws.readyState===1){ ws.send(JSON.stringify({message:m})); return; }
   try{
     const r=await fetch('/chat',{method:'POST',credentials:'include',
       headers:{'Content-Type':'application/json'},body:JSON.stringify({message:m})});
@@ -123,17 +148,23 @@ async function send(){
     if(d.buyer_stage||d.stage) document.getElementById('stg').textContent=(d.buyer_stage||d.stage);
   }catch(e){ add('bot','Network error.'); }
 }
+function resetDone(){
+  const c=document.getElementById('chat'); c.innerHTML='';
+  add('bot','Conversation reset. How can I help you today?');
+  document.getElementById('stg').textContent='browsing';
+  save();
+}
 async function resetConv(){
+  // Over the open socket, so its connection-local memory is the one that gets reset
+  if(ws && ws.readyState===1){ ws.send(JSON.stringify({type:'reset'})); return; }
   try{
-    await fetch('/reset-conversation',{method:'POST',credentials:'include',
+    const r=await fetch('/reset-conversation',{method:'POST',credentials:'include',
       headers:{'Content-Type':'application/json'},body:'{}'});
-    const c=document.getElementById('chat'); c.innerHTML='';
-    add('bot','Conversation reset. How can I help you today?');
-    document.getElementById('stg').textContent='browsing';
-    save();
+    if(!r.ok){ add('bot','Reset failed.'); return; }
+    resetDone();
   }catch(e){ add('bot','Reset failed.'); }
 }
-window.onload=()=>{ load(); ping(); };
+window.onload=()=>{ load(); ping(); openWs(); };
 </script>
 </body>
 </html>
@@ -141,6 +172,8 @@ window.onload=()=>{ load(); ping(); };
 
 @app.route("/tester", methods=["GET"])
 def tester():
+    # Set the session cookie now: the async server's /ws/chat handshake can't, and it needs it to resume
+    get_or_create_user_id()
     return render_template_string(TESTER_HTML)
 
 @app.route("/", methods=["GET"])
@@ -195,170 +228,132 @@ except ImportError as e:
 
 # Import spa system
 try:
-    from spa_system_manager import spa_system, STORE_INFO
+    from spa_system_manager import spa_system
     logger.info("Spa System Manager loaded successfully")
 except ImportError as e:
     logger.error(f"Failed to load Spa System Manager: {e}")
     raise
 
+# Shared turn pipeline (also used by the async server)
+from chat_pipeline_spa import ChatPipeline, CHAT_MEMORY_FIELDS, RESET_MEMORY_FIELDS
+
 # ============================================================================
 # MEMORY MANAGER
 # ============================================================================
 
-class InMemoryManager:
-    """Simple in-memory storage for when DB not available"""
-    def __init__(self):
-        self.memories = {}
-        logger.info("InMemory Manager initialized")
-        
-    def load_memory(self, user_id: str) -> Dict[str, Any]:
-        if user_id not in self.memories:
-            self.memories[user_id] = {
-                "user_id": user_id,
-                "interactions": [],
-                "key_facts": {},
-                "buyer_stage": "browsing",
-                "engagement_level": 1,
-                "conversation_summary": "",
-                "cta_attempts": [],
-                "asked_followups": [],
-                "last_cta_turn": 0,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
-            }
-        return self.memories[user_id]
-    
-    def save_memory(self, memory: Dict[str, Any]) -> None:
-        memory["updated_at"] = datetime.now().isoformat()
-        self.memories[memory["user_id"]] = memory
-    
-    def add_interaction(self, memory: Dict[str, Any], user_msg: str, bot_msg: str) -> None:
-        memory["interactions"].append({
-            "timestamp": datetime.now().isoformat(),
-            "user": user_msg,
-            "bot": bot_msg
-        })
-        # Keep only last 10 interactions
-        if len(memory["interactions"]) > 10:
-            memory["interactions"] = memory["interactions"][-10:]
-    
-    def build_context_summary(self, memory: Dict[str, Any]) -> str:
-        facts = memory.get("key_facts", {})
-        parts = []
-        
-        if facts.get("name"):
-            parts.append(f"Name: {facts['name']}")
-        if facts.get("family_size"):
-            parts.append(f"Family size: {facts['family_size']}")
-        if facts.get("preferred_seats"):
-            parts.append(f"Looking for: {facts['preferred_seats']}-seater")
-        if facts.get("budget_range"):
-            parts.append(f"Budget: {facts['budget_range']}")
-        if memory.get("buyer_stage"):
-            parts.append(f"Stage: {memory['buyer_stage']}")
-            
-        return " | ".join(parts) if parts else ""
+from memory_backends_spa import InMemoryManager, MemoryBackend, SharedSessionStore, SQLiteMemoryManager
+from schema_migrations_spa import SchemaOutOfDate
 
 # Initialize memory manager
 # =====================================================================
 # MEMORY MANAGER – automatic fallback if DATABASE_URL missing
 # =====================================================================
-if ENHANCED_AVAILABLE:
+# MEMORY_BACKEND selects postgres | sqlite | shared | memory; default is postgres
+# when DATABASE_URL is set, otherwise the host-local store all workers share
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND") or ("postgres" if os.getenv("DATABASE_URL") else "shared")
+MEMORY: MemoryBackend
+
+if MEMORY_BACKEND == "shared":
+    MEMORY = SharedSessionStore()
+    logger.info(f"Using Shared Session Store ({MEMORY.path})")
+elif ENHANCED_AVAILABLE and MEMORY_BACKEND == "sqlite":
+    MEMORY = SQLiteMemoryManager()
+    logger.info(f"Using Enhanced Memory Manager (SQLite at {MEMORY.db_path})")
+elif ENHANCED_AVAILABLE and MEMORY_BACKEND == "postgres":
     try:
         if not os.getenv("DATABASE_URL"):
             raise RuntimeError("DATABASE_URL not set (offline mode fallback)")
         MEMORY = EnhancedMemoryManager()
         logger.info("Using Enhanced Memory Manager (Postgres)")
+    except SchemaOutOfDate:
+        # Never fall back to a host-local store over a missed migration: refuse to start
+        raise
     except Exception as e:
-        logger.warning(f"Enhanced memory unavailable ({e}) — using simple in-memory fallback.")
-        MEMORY = InMemoryManager()
-        ENHANCED_AVAILABLE = False
+        logger.warning(f"Enhanced memory unavailable ({e}) — using shared session store fallback.")
+        MEMORY = SharedSessionStore()
+        MEMORY_BACKEND = "shared"
 else:
     MEMORY = InMemoryManager()
+    MEMORY_BACKEND = "memory"
+    ENHANCED_AVAILABLE = False
     logger.info("Using Simple Memory Manager")
 
+# Live admin stream: saved turns fan out to /admin/conversations/stream subscribers
+from conversation_stream_spa import ConversationHub, SSE_KEEPALIVE, sse_message, turn_event
+
+CONVERSATION_HUB = None
+if os.getenv("ADMIN_STREAM", "1") == "1":
+    CONVERSATION_HUB = ConversationHub(
+        max_buffer=int(os.getenv("ADMIN_STREAM_BUFFER", 256)),
+        max_subscribers=int(os.getenv("ADMIN_STREAM_MAX_SUBSCRIBERS", 100))
+    )
+
+# Under sync/gthread workers every open stream pins a worker thread, so this app
+# only serves a few per worker, each for a bounded time (the browser reconnects).
+# Dashboards belong on the async server (spa_bot_async), which uses the hub's limit.
+SYNC_STREAM_SLOTS = threading.BoundedSemaphore(int(os.getenv("ADMIN_STREAM_SYNC_MAX_SUBSCRIBERS", 1)))
+SYNC_STREAM_MAX_SECONDS = float(os.getenv("ADMIN_STREAM_SYNC_MAX_SECONDS", 300))
+
+# Evict cached memory documents when another worker saves, and carry the admin
+# stream across workers (Postgres only)
+INVALIDATION_BUS = None
+if MEMORY_BACKEND == "postgres" and (getattr(MEMORY, "cache", None) or CONVERSATION_HUB):
+    from invalidation_bus_spa import InvalidationBus
+
+    INVALIDATION_BUS = InvalidationBus()
+    MEMORY.attach_invalidation_bus(INVALIDATION_BUS)
+    if CONVERSATION_HUB:
+        CONVERSATION_HUB.attach_bus(INVALIDATION_BUS)
+    INVALIDATION_BUS.start()
+
+# Fast restart: reload recent visitors from the last snapshot, keep snapshotting
+from memory_snapshot_spa import MemorySnapshotter
+
+SNAPSHOTTER = None
+# Postgres only snapshots its read cache; without one there is nothing to keep warm
+if os.getenv("MEMORY_SNAPSHOT_PATH") and (MEMORY_BACKEND != "postgres" or MEMORY.cache):
+    SNAPSHOTTER = MemorySnapshotter(
+        MEMORY,
+        interval=float(os.getenv("MEMORY_SNAPSHOT_INTERVAL", 60)),
+        warm_users=int(os.getenv("MEMORY_WARM_USERS", 500))
+    )
+    SNAPSHOTTER.warm_start()
+    SNAPSHOTTER.start()
+
+# Maintenance jobs (expiry cleanup + turn log partitions); one worker cluster-wide runs each
+from job_scheduler_spa import JobScheduler
+
+SCHEDULER = None
+if os.getenv("JOB_SCHEDULER", "1") == "1":
+    SCHEDULER = JobScheduler(
+        database_url=os.getenv("DATABASE_URL") if MEMORY_BACKEND == "postgres" else None,
+        max_workers=int(os.getenv("JOB_THREADS", 2))
+    )
+    SCHEDULER.add_job("memory-cleanup", MEMORY.cleanup_expired_memories,
+                      every=os.getenv("MEMORY_CLEANUP_INTERVAL", "6h"))
+    if MEMORY_BACKEND == "postgres" and getattr(MEMORY, "funnel_events", False):
+        SCHEDULER.add_job("funnel-rollup", MEMORY.rollup_funnel_events,
+                          every=os.getenv("FUNNEL_ROLLUP_INTERVAL", "5m"))
+    SCHEDULER.start()
+
 # Initialize flow engine
 FLOW_ENGINE = ConversationFlowEngine()
 logger.info("Conversation Flow Engine initialized")
 
-# ============================================================================
-# IMPROVED SYSTEM PROMPT
-# ============================================================================
-
-SYSTEM_PROMPT = """You are Country Leisure's friendly spa sales expert in Moore, Oklahoma. You're knowledgeable, helpful, and conversational without being pushy.
-
-KEY FACTS TO REMEMBER:
-- All prices mentioned are ALL-INCLUSIVE (spa, cover, lifter, steps, electrical sub-panel, local delivery)
-- Local delivery within 50 miles is FREE
-- We offer 0% financing for qualified buyers
-- Caldera Spas are our premium line (Vacanza, Paradise, Utopia series)
-- Fantasy Spas are our budget-friendly option
-- Showroom: 3001 N. I-35 Service Rd., Moore, OK 73160
-
-YOUR PERSONALITY:
-- Friendly and approachable, like a helpful neighbor
-- Patient - don't rush customers through the process
-- Focus on education and value, not aggressive selling
-- Build rapport before pushing for visits or sales
-- Answer questions directly without always adding a sales pitch
-
-CONVERSATION GUIDELINES:
-- Keep responses concise (2-3 sentences usually)
-- Use the customer's name naturally when you learn it
-- Match the customer's energy - if they're casual, be casual
-- Only suggest visits/CTAs when it feels natural
-- If discussing price, be accurate with the numbers
-
-CRITICAL PRICING RULES:
-- ALWAYS use the exact pricing provided by the system
-- NEVER make up or estimate prices
-- If pricing is not provided for something (like salt system add-on), say "I'll need to check on that specific pricing"
-- PRICE RANGES (all-inclusive with spa, cover, lifter, steps, electrical panel, local delivery):
-  * Fantasy Spas: $4,649 - $8,149
-  * Caldera Vacanza: $8,747 - $12,747
-  * Caldera Paradise: $12,847 - $16,847
-  * Caldera Utopia: $16,247 - $24,747
-- Models and their series:
-  * Vacanza: Aventine, Celio, Tarino, Vanto, Marino, Palatino
-  * Paradise: Kauai, Martinique, Seychelles, Reunion, Salina, Makena
-  * Utopia: Ravello, Florence, Tahitian, Niagara, Geneva, Cantabria
-  * Fantasy: Aspire, Drift, Embrace, Enamor, Entice, Enamor Premier, Entice Premier
-- When discussing general pricing, use the ranges above
-- When a specific model is requested, wait for the system to provide the exact price
-- All prices quoted are all-inclusive - always emphasize this value point
-  
-CLICKABLE CTAs:
-When appropriate based on the conversation, naturally include ONE of these clickable links (use markdown format [text](url)):
-- When they ask about pricing/budget: "Want to know your budget? [Get pre-approved in minutes](https://www.countryleisuremfg.com/preapproval)"
-- When they want to compare models: "You can [download our full brochure](https://hottubs.countryleisuremfg.com/download-a-brochure/) to see all options"
-- When they ask about maintenance/care: "Check out the [Caldera owner's manual](https://hottubs.countryleisuremfg.com/caldera-spas-owners-manual/) for all the details"
-- When they need help with space/placement: "Let's [schedule a free consultation](https://hottubs.countryleisuremfg.com/free-home-consultation/) at your place"
-- When they're ready to see/try spas: "Come test soak! Call us at [405-799-7745](tel:405-799-7745) or visit our [Moore showroom](https://maps.google.com/?q=3001+N+I-35+Service+Rd+Moore+OK+73160)"
-- For general questions: "Feel free to [contact our team](https://www.countryleisuremfg.com/contact) anytime"
-
-CTA GUIDELINES:
-- Only include a CTA when it naturally fits the conversation
-- Don't force CTAs in browsing/early stages unless they ask
-- Use CTAs more frequently in considering/ready stages
-- Vary the CTA text to sound natural, but keep the exact URLs
-- Never use more than one CTA per response
-
-Remember: You're helping them find their perfect spa, not pushing for a quick sale
-
-IMPORTANT:
-- Be accurate with pricing - always use the exact prices provided
-- Respect the buyer's journey - don't push too hard too fast
-- If customer seems overwhelmed or jokes about being pushy, back off immediately
-CRITICAL PRICING RULES:
-- ALWAYS use the exact prices provided by the system
-- NEVER guess or estimate prices
-- All prices are all-inclusive (spa, cover, lifter, steps, electrical panel, local delivery)
-- If you don't have a price, ask me to check rather than guessing or tell you are sorry and unsure have them fill a contact us form so that we can get back to them"""
+PIPELINE = ChatPipeline(MEMORY, FLOW_ENGINE)
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+def announce_turn(event: Optional[Dict[str, Any]]) -> None:
+    """Push a saved turn (turn_event(memory)) to live admin dashboards"""
+    if CONVERSATION_HUB and event:
+        try:
+            CONVERSATION_HUB.announce(event)
+        except Exception as e:
+            logger.error(f"Error announcing turn: {e}")
+
 def get_or_create_user_id():
     """Get user ID from session or create new one"""
     if "user_id" not in session:
@@ -366,66 +361,6 @@ def get_or_create_user_id():
         session["user_id"] = f"user_{uuid.uuid4().hex[:8]}"
     return session["user_id"]
 
-def extract_key_facts(message: str, memory: Dict[str, Any]) -> None:
-    """Extract and update key facts from user message"""
-    msg_lower = message.lower()
-    key_facts = memory.get("key_facts", {})
-    
-    # Extract name
-    name_patterns = [
-        r"(?:i'm|i am|my name is|name's|call me)\s+([A-Z][a-z]+)",
-        r"(?:this is)\s+([A-Z][a-z]+)"
-    ]
-    for pattern in name_patterns:
-        if match := re.search(pattern, message, re.IGNORECASE):
-            key_facts['name'] = match.group(1)
-    
-    # Extract budget
-    if match := re.search(r"(\d+)k|(\d+),?(\d+)", message, re.IGNORECASE):
-        if match.group(1):
-            budget = int(match.group(1)) * 1000
-            key_facts['budget_range'] = f"${budget:,}"
-    
-    # Extract seating preference
-    if match := re.search(r"(\d+)\s*(?:person|people|seat)", message, re.IGNORECASE):
-        key_facts['preferred_seats'] = int(match.group(1))
-    
-    # Extract priority/reason
-    if 'relax' in msg_lower:
-        key_facts['reason'] = 'relaxation'
-    elif 'therap' in msg_lower:
-        key_facts['reason'] = 'therapy'
-    elif 'family' in msg_lower:
-        key_facts['reason'] = 'family'
-    elif 'entertain' in msg_lower:
-        key_facts['reason'] = 'entertaining'
-    
-    memory['key_facts'] = key_facts
-
-def should_show_cta_naturally(memory: Dict[str, Any], flow_evaluation: Dict) -> bool:
-    """Determine if we should naturally show a CTA based on flow engine recommendation"""
-    turn_count = len(memory.get("interactions", []))
-    last_cta_turn = memory.get("last_cta_turn", 0)
-    turns_since_cta = turn_count - last_cta_turn
-    stage = flow_evaluation.get("buyer_stage", "browsing")
-    
-    # Never show CTA in first 2 interactions
-    if turn_count < 2:
-        return False
-    
-    # Follow flow engine's suggestion but moderate frequency
-    if flow_evaluation.get("suggested_cta"):
-        # Stage-based minimum spacing
-        min_spacing = {
-            "browsing": 6,
-            "researching": 4,
-            "considering": 3,
-            "ready": 2
-        }
-        return turns_since_cta >= min_spacing.get(stage, 4)
-    
-    return False
-
 # ============================================================================
 # MAIN CHAT ENDPOINT - USING ACTUAL FLOW ENGINE METHODS
 # ============================================================================
@@ -437,7 +372,15 @@ def ping():
         "status": "ok",
         "bot": "Country Leisure Spa Chat",
         "memory_type": "enhanced" if ENHANCED_AVAILABLE else "simple",
+        "memory_backend": MEMORY_BACKEND,
         "flow_engine": "active",
+        "memory_conflicts": MEMORY.get_conflict_stats() if hasattr(MEMORY, "get_conflict_stats") else None,
+        "memory_cache": MEMORY.cache.stats() if getattr(MEMORY, "cache", None) else None,
+        "turn_log": MEMORY.get_turn_log_stats() if getattr(MEMORY, "turn_log", False) else None,
+        "memory_snapshot": SNAPSHOTTER.stats() if SNAPSHOTTER else None,
+        "invalidation_bus": INVALIDATION_BUS.get_stats() if INVALIDATION_BUS else None,
+        "admin_stream": CONVERSATION_HUB.get_stats() if CONVERSATION_HUB else None,
+        "jobs": SCHEDULER.status()["jobs"] if SCHEDULER else None,
         "timestamp": datetime.now().isoformat()
     })
 
@@ -455,175 +398,20 @@ def chat():
         
         # Get or create user
         user_id = get_or_create_user_id()
-        memory = MEMORY.load_memory(user_id)
-        
-        # Extract facts from message
-        extract_key_facts(user_message, memory)
+        memory = MEMORY.load_memory(user_id, fields=CHAT_MEMORY_FIELDS)
         
-        # ========== USE FLOW ENGINE'S EVALUATE METHOD ==========
-        flow_evaluation = FLOW_ENGINE.evaluate(memory, user_message)
-        
-        # Update memory with flow engine's stage
-        old_stage = memory.get("buyer_stage", "browsing")
-        new_stage = flow_evaluation.get("buyer_stage", old_stage)
-        memory["buyer_stage"] = new_stage
-        
-        # Track follow-ups that have been asked
-        if flow_evaluation.get("followups"):
-            memory.setdefault("asked_followups", []).extend(flow_evaluation["followups"])
-        
-        logger.info(f"Flow Engine Evaluation: Stage {old_stage} -> {new_stage}, CTA: {flow_evaluation.get('suggested_cta')}")
-        
-        # ========== ANALYZE INTENT ==========
-        intent_analysis = FLOW_ENGINE.analyze_conversation_intent(user_message)
-        logger.debug(f"Intent Analysis: {intent_analysis}")
-        
-        # Build base messages for OpenAI
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-        
-        # Add context
-        if context := MEMORY.build_context_summary(memory):
-            messages.append({
-                "role": "system",
-                "content": f"CONVERSATION CONTEXT: {context}"
-            })
-        
-        # Add recent conversation history
-        for interaction in memory.get("interactions", [])[-3:]:
-            messages.append({"role": "user", "content": interaction["user"]})
-            messages.append({"role": "assistant", "content": interaction["bot"]})
-        
-        # ========== HANDLE SPECIFIC INTENTS ==========
-        
-        # ========== ALWAYS CHECK FOR MODEL MENTIONS ==========
-        # Check for ANY specific model mention (not just during price inquiries)
-        models_to_check = [
-            "palatino", "tarino", "marino", "vanto", "celio", "aventine",  # Vacanza
-            "kauai", "martinique", "seychelles", "reunion", "salina", "makena",  # Paradise
-            "ravello", "florence", "tahitian", "niagara", "geneva", "cantabria",  # Utopia
-            "aspire", "drift", "embrace", "enamor", "entice"  # Fantasy
-        ]
-
-        for model in models_to_check:
-            if model in user_message.lower():
-                price_quote = FLOW_ENGINE.get_pricing_quote(model)
-                if price_quote:
-                    messages.append({
-                        "role": "system",
-                        "content": f"IMPORTANT - EXACT PRICING: {price_quote} Use this exact information. Do NOT make up prices."
-                    })
-                    
-                    # Add series context
-                    if model in ["aventine", "celio", "tarino", "vanto", "marino", "palatino"]:
-                        series_info = "Vacanza series - entry-level Caldera"
-                    elif model in ["kauai", "martinique", "seychelles", "reunion", "salina", "makena"]:
-                        series_info = "Paradise series - mid-tier with salt system compatibility"
-                    elif model in ["ravello", "florence", "tahitian", "niagara", "geneva", "cantabria"]:
-                        series_info = "Utopia series - premium with salt system included"
-                    else:
-                        series_info = "Fantasy series - budget-friendly plug-and-play"
-                    
-                    messages.append({
-                        "role": "system",
-                        "content": f"SERIES: {series_info}"
-                    })
-                break
-        
-        # Size question
-        if intent_analysis.get("size_question"):
-            if match := re.search(r"(\d+)\s*(?:person|people|seat)", user_message, re.IGNORECASE):
-                seats = int(match.group(1))
-                # Get models WITH PRICES
-                recommendations = FLOW_ENGINE.get_model_recommendation({'seats': seats, 'budget_max': 99999})
-                if recommendations:
-                    messages.append({
-                        "role": "system",
-                        "content": f"IMPORTANT - Use these exact prices for {seats}-person spas:\n{recommendations}"
-                })
-        
-        # Maintenance concern
-        if intent_analysis.get("maintenance_concern"):
-            maintenance_info = FLOW_ENGINE.get_knowledge_answer("maintenance")
-            if maintenance_info:
-                messages.append({
-                    "role": "system",
-                    "content": f"MAINTENANCE INFO: {maintenance_info}"
-                })
-        
-        # Electrical question
-        if intent_analysis.get("electrical_question"):
-            electrical_info = FLOW_ENGINE.get_knowledge_answer("electrical")
-            if electrical_info:
-                messages.append({
-                    "role": "system",
-                    "content": f"ELECTRICAL INFO: {electrical_info}"
-                })
-        
-        # ========== ADD FOLLOW-UP QUESTION IF APPROPRIATE ==========
-        if flow_evaluation.get("followups") and len(memory.get("interactions", [])) % 3 == 0:
-            followup = flow_evaluation["followups"][0] if flow_evaluation["followups"] else None
-            if followup:
-                messages.append({
-                    "role": "system",
-                    "content": f"End your response with this natural follow-up: {followup}"
-                })
-        
-        # ========== HANDLE CTA SUGGESTION ==========
-        cta_message = None
-        if should_show_cta_naturally(memory, flow_evaluation):
-            suggested_cta = flow_evaluation.get("suggested_cta")
-            if suggested_cta:
-                cta_message = FLOW_ENGINE.get_cta_message(memory, suggested_cta)
-                if cta_message:
-                    messages.append({
-                        "role": "system",
-                        "content": f"If it fits naturally, mention: {cta_message}"
-                    })
-        
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
+        turn = PIPELINE.prepare_turn(memory, user_message)
         
         # Call OpenAI
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=150
-        )
-        
-        bot_response = response.choices[0].message.content.strip()
-        
-        # Track CTA if one was shown
-        cta_data = None
-        if cta_message:
-            memory["last_cta_turn"] = len(memory.get("interactions", []))
-            memory.setdefault("cta_attempts", []).append({
-                "type": flow_evaluation.get("suggested_cta"),
-                "turn": len(memory.get("interactions", [])),
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Add CTA data for response
-            if flow_evaluation.get("suggested_cta") in ["showroom", "consultation", "quote"]:
-                cta_data = {
-                    "type": flow_evaluation.get("suggested_cta"),
-                    "stage": memory["buyer_stage"]
-                }
+        bot_response = PIPELINE.call_llm(turn["messages"])
         
         # Save interaction
-        MEMORY.add_interaction(memory, user_message, bot_response)
+        payload = PIPELINE.complete_turn(memory, user_message, turn, bot_response)
         MEMORY.save_memory(memory)
+        announce_turn(turn_event(memory))
         
         # Return response
-        return jsonify({
-            "reply": bot_response,
-            "buyer_stage": memory.get("buyer_stage"),
-            "stage": memory.get("buyer_stage"),
-            "user_id": user_id,
-            "intent": intent_analysis,
-            "cta": cta_data,
-            "store_info": STORE_INFO if cta_data else None
-        })
+        return jsonify(payload)
         
     except openai.error.OpenAIError as e:
         logger.error(f"OpenAI error: {e}")
@@ -643,18 +431,11 @@ def reset_conversation():
         payload = request.get_json(silent=True) or {}
         user_id = payload.get("user_id") or session.get("user_id")
 
-        # Load memory for this user
-        memory = MEMORY.load_memory(user_id)
+        # Load memory for this user (only the fields the reset overwrites)
+        memory = MEMORY.load_memory(user_id, fields=RESET_MEMORY_FIELDS)
 
         # Reset conversation fields
-        memory["interactions"] = []
-        memory["key_facts"] = {}
-        memory["conversation_summary"] = ""
-        memory["buyer_stage"] = "browsing"
-        memory["engagement_level"] = 1
-        memory["cta_attempts"] = []
-        memory["asked_followups"] = []
-        memory["last_cta_turn"] = 0
+        PIPELINE.reset_memory(memory)
         
         # Save reset memory
         MEMORY.save_memory(memory)
@@ -713,55 +494,243 @@ def debug_memory(user_id):
 # ============================================================================
 # ADMIN CONVERSATION FEED ENDPOINT
 # ============================================================================
+from enhanced_memory_manager_spa import FEED_MAX_LIMIT, decode_feed_cursor, encode_feed_cursor
+
+def feed_page_args(args) -> tuple:
+    """?limit=&before= -> (limit capped at FEED_MAX_LIMIT, decoded cursor or None); ValueError if malformed"""
+    limit = max(1, min(int(args.get("limit", 100)), FEED_MAX_LIMIT))
+    before = args.get("before")
+    return limit, decode_feed_cursor(before) if before else None
+
+def feed_json_chunks(items, limit: int):
+    """Encode a feed page item by item: {"items": [...], "next_before": cursor|null}"""
+    yield '{"items":['
+    count, last = 0, None
+    for item in items:
+        yield ("," if count else "") + json.dumps(item)
+        count, last = count + 1, item
+    next_before = encode_feed_cursor(last["ts"], last["user_id"]) if count == limit else None
+    yield '],"next_before":' + json.dumps(next_before) + '}'
+
 @app.route("/admin/conversations.json", methods=["GET"])
 def admin_conversations():
-    """Provide simplified conversation feed for admin dashboard"""
+    """Provide simplified conversation feed for admin dashboard (pass next_before back as ?before=)"""
     token = request.args.get("token")
     if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
         return jsonify({"error": "unauthorized"}), 403
 
-    limit = int(request.args.get("limit", 100))
+    try:
+        limit, before = feed_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        with MEMORY._get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT user_id,
-                           last_updated AS ts,
-                           buyer_stage,
-                           engagement_level,
-                           interactions
-                    FROM user_memories
-                    ORDER BY last_updated DESC
-                    LIMIT %s
-                """, (limit,))
-                rows = cur.fetchall()
-
-        items = []
-        for r in rows:
-            # Extract most recent message pair
-            interactions = r[4]
-            if isinstance(interactions, str):
-                try:
-                    interactions = json.loads(interactions)
-                except Exception:
-                    interactions = []
-            if interactions:
-                last = interactions[-1]
-                items.append({
-                    "id": f"{r[0]}_{len(interactions)}",
-                    "ts": r[1].isoformat() if r[1] else "",
-                    "user_id": r[0],
-                    "user_message": last.get("user", ""),
-                    "bot_response": last.get("bot", "")
-                })
-        return jsonify({"items": items})
+        items = MEMORY.iter_recent_conversations(limit, before)
+        # Run the query before streaming starts so database errors still become a 500
+        first = next(items, None)
+        page = itertools.chain([first], items) if first is not None else []
+        return Response(stream_with_context(feed_json_chunks(page, limit)), mimetype="application/json")
 
     except Exception as e:
         logger.error(f"Error loading admin conversations: {e}")
         import traceback; traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+from turn_log_spa import SEARCH_MAX_LIMIT, SEARCH_MAX_OFFSET
+
+def search_args(args) -> dict:
+    """?q=&limit=&offset=&user_id=&since= -> search_conversations kwargs; ValueError if malformed"""
+    query = (args.get("q") or "").strip()
+    if not query:
+        raise ValueError("q is required")
+    since = args.get("since")
+    return {
+        "query": query,
+        "limit": max(1, min(int(args.get("limit", 20)), SEARCH_MAX_LIMIT)),
+        "offset": max(0, min(int(args.get("offset", 0)), SEARCH_MAX_OFFSET)),
+        "user_id": args.get("user_id") or None,
+        "since": datetime.fromisoformat(since) if since else None
+    }
+
+def search_page(kwargs: dict, items: list) -> dict:
+    next_offset = kwargs["offset"] + len(items) if len(items) == kwargs["limit"] else None
+    return {"query": kwargs["query"], "items": items, "next_offset": next_offset}
+
+@app.route("/admin/search.json", methods=["GET"])
+def admin_search():
+    """Ranked full-text search over logged turns with highlighted snippets"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if not getattr(MEMORY, "turn_log", False):
+        return jsonify({"error": "search needs the Postgres turn log"}), 501
+
+    try:
+        kwargs = search_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify(search_page(kwargs, MEMORY.search_conversations(**kwargs)))
+    except Exception as e:
+        logger.error(f"Error searching conversations: {e}")
+        return jsonify({"error": str(e)}), 500
+
+from lead_segments_spa import LeadSegment, LEADS_MAX_LIMIT
+
+@app.route("/admin/leads.json", methods=["GET"])
+def admin_leads():
+    """Sales segment query, e.g. ?stage=ready&min_seats=7&max_budget=15000&feature=jets (pass next_before back as ?before=)"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if MEMORY_BACKEND != "postgres":
+        return jsonify({"error": "lead segmentation needs the Postgres backend"}), 501
+
+    try:
+        segment = LeadSegment.from_args(request.args)
+        limit = max(1, min(int(request.args.get("limit", 100)), LEADS_MAX_LIMIT))
+        before = decode_feed_cursor(request.args["before"]) if request.args.get("before") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        items = MEMORY.find_leads(segment, limit, before)
+        next_before = encode_feed_cursor(items[-1]["ts"], items[-1]["user_id"]) if len(items) == limit else None
+        return jsonify({"items": items, "next_before": next_before})
+    except Exception as e:
+        logger.error(f"Error querying leads: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/admin/funnel", methods=["GET"])
+def admin_funnel():
+    """Stage entries, conversions and CTA impressions from the hourly rollups (?hours=720&series=1)"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if MEMORY_BACKEND != "postgres" or not getattr(MEMORY, "funnel_events", False):
+        return jsonify({"error": "funnel analytics need the Postgres backend"}), 501
+
+    try:
+        hours = max(1, min(int(request.args.get("hours", 720)), 24 * 366))
+    except ValueError:
+        return jsonify({"error": "hours must be an integer"}), 400
+
+    try:
+        return jsonify(MEMORY.get_funnel(hours, series=request.args.get("series") == "1"))
+    except Exception as e:
+        logger.error(f"Error loading funnel: {e}")
+        return jsonify({"error": str(e)}), 500
+
+from conversation_export_spa import EXPORT_FORMATS, export_args, export_chunks, export_filename, export_lines, iter_export_rows
+
+def export_request(args) -> dict:
+    """?format=&gzip=&since=&until=&stage= -> export options; ValueError if malformed"""
+    fmt = args.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return {"fmt": fmt, "compress": args.get("gzip", "1") != "0", "filters": export_args(args)}
+
+def export_headers(options: dict) -> dict:
+    mimetype = "application/gzip" if options["compress"] else (
+        "text/csv" if options["fmt"] == "csv" else "application/x-ndjson")
+    return {
+        "Content-Type": mimetype,
+        "Content-Disposition": f'attachment; filename="{export_filename(options["fmt"], options["compress"])}"',
+        "X-Accel-Buffering": "no"
+    }
+
+@app.route("/admin/export", methods=["GET"])
+def admin_export():
+    """Download every conversation, one record per turn (?format=ndjson|csv&gzip=1&since=&until=&stage=)"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if MEMORY_BACKEND != "postgres":
+        return jsonify({"error": "export needs the Postgres backend"}), 501
+
+    try:
+        options = export_request(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        records = iter_export_rows(MEMORY.database_url, **options["filters"])
+        # Open the cursor before streaming starts so database errors still become a 500
+        first = next(records, None)
+        records = itertools.chain([first], records) if first is not None else []
+        chunks = export_chunks(export_lines(records, options["fmt"]), compress=options["compress"])
+        return Response(stream_with_context(chunks), headers=export_headers(options))
+    except Exception as e:
+        logger.error(f"Error exporting conversations: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/admin/conversations/stream", methods=["GET"])
+def admin_conversation_stream():
+    """Server-Sent Events: one 'turn' event per saved turn, 'resync' when events were missed"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if not CONVERSATION_HUB:
+        return jsonify({"error": "admin stream disabled"}), 404
+
+    if not SYNC_STREAM_SLOTS.acquire(blocking=False):
+        return jsonify({"error": "too many stream subscribers on this worker; use the async server"}), 503
+    subscription = CONVERSATION_HUB.subscribe()
+    if subscription is None:
+        SYNC_STREAM_SLOTS.release()
+        return jsonify({"error": "too many stream subscribers"}), 503
+    keepalive = min(float(os.getenv("ADMIN_STREAM_KEEPALIVE", 15)), SYNC_STREAM_MAX_SECONDS)
+    deadline = time.monotonic() + SYNC_STREAM_MAX_SECONDS
+
+    def events():
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            batch = subscription.get(keepalive)
+            resync = subscription.take_resync()
+            if resync:
+                yield sse_message(resync, event="resync")
+            for event in batch:
+                yield sse_message(event, event_id=event["id"])
+            if not batch and not resync:
+                yield SSE_KEEPALIVE
+
+    def release():
+        subscription.close()
+        SYNC_STREAM_SLOTS.release()
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Runs when the server closes the response, even if the generator never started
+    response.call_on_close(release)
+    return response
+
+@app.route("/admin/jobs.json", methods=["GET"])
+def admin_jobs():
+    """Background job status: this worker's view plus the cluster-wide last runs"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if not SCHEDULER:
+        return jsonify({"error": "job scheduler disabled"}), 404
+
+    try:
+        return jsonify({**SCHEDULER.status(), "cluster": SCHEDULER.cluster_status()})
+    except Exception as e:
+        logger.error(f"Error loading job status: {e}")
+        return jsonify({**SCHEDULER.status(), "cluster": None, "error": str(e)})
+
+@app.route("/admin/jobs/<name>/run", methods=["POST"])
+def admin_run_job(name):
+    """Trigger a job now (still runs on only one worker)"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if not SCHEDULER or name not in SCHEDULER.jobs:
+        return jsonify({"error": f"unknown job {name}"}), 404
+
+    return jsonify({"ok": SCHEDULER.run_now(name), "job": name}), 202
+
 # ============================================================================
 # RUN APPLICATION
 # ============================================================================
@@ -0,0 +1,461 @@
+"""
+Spa Bot Async Server - ASGI Serving Mode
+========================================
+Runs the same chat pipeline as spa_bot4 on Quart so the multi-second OpenAI
+call is awaited instead of pinning a worker thread. Memory I/O goes through
+the asyncpg-backed AsyncEnhancedMemoryManager when Postgres is configured, and
+through a thread pool for the in-memory fallback. A WebSocket channel
+(/ws/chat) keeps memory in connection-local state and streams replies.
+
+Run with:  uvicorn spa_bot_async:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import aiohttp
+import openai
+from quart import Quart, request, jsonify, session, render_template_string, redirect, websocket, make_response
+
+# Shared singletons: same memory manager, flow engine, pipeline and tester UI
+import spa_bot4
+from spa_bot4 import (
+    MEMORY, MEMORY_BACKEND, PIPELINE, SCHEDULER, TESTER_HTML, ALLOWED_ORIGINS, ENHANCED_AVAILABLE,
+    feed_json_chunks, feed_page_args, CONVERSATION_HUB, announce_turn, search_args, search_page,
+    export_headers, export_request
+)
+from conversation_export_spa import export_chunks, export_lines, iter_export_rows
+from enhanced_memory_manager_spa import decode_feed_cursor, encode_feed_cursor
+from lead_segments_spa import LeadSegment, LEADS_MAX_LIMIT
+from conversation_stream_spa import SSE_KEEPALIVE, sse_message, turn_event
+from chat_pipeline_spa import CHAT_MEMORY_FIELDS, RESET_MEMORY_FIELDS
+
+# Native async Postgres backend when available; otherwise the sync manager runs in a thread pool
+try:
+    from async_memory_manager_spa import AsyncEnhancedMemoryManager
+    ASYNC_MEMORY = AsyncEnhancedMemoryManager() if MEMORY_BACKEND == "postgres" else None
+except (ImportError, ValueError):
+    ASYNC_MEMORY = None
+if ASYNC_MEMORY and spa_bot4.INVALIDATION_BUS:
+    # Its read cache is separate from MEMORY's and needs the same evictions
+    ASYNC_MEMORY.attach_invalidation_bus(spa_bot4.INVALIDATION_BUS)
+
+logger = logging.getLogger(__name__)
+
+app = Quart(__name__)
+app.secret_key = spa_bot4.app.secret_key
+
+# Memory managers are blocking; give them their own pool so DB calls never
+# queue behind each other at high concurrency
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("ASYNC_DB_THREADS", 32)),
+                                 thread_name_prefix="spa-db")
+LLM_CONNECTIONS = int(os.getenv("ASYNC_LLM_CONNECTIONS", 1000))
+
+async def run_blocking(func, *args):
+    """Run a blocking memory manager call off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(DB_EXECUTOR, func, *args)
+
+async def load_memory(user_id: str, fields=None):
+    if ASYNC_MEMORY:
+        return await ASYNC_MEMORY.load_memory(user_id, fields)
+    return await run_blocking(MEMORY.load_memory, user_id, fields)
+
+def announce_turn_soon(memory) -> None:
+    """Hand the saved turn to the admin stream without delaying the reply"""
+    if CONVERSATION_HUB:
+        asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, announce_turn, turn_event(memory))
+
+async def save_memory(memory) -> None:
+    if ASYNC_MEMORY:
+        await ASYNC_MEMORY.save_memory(memory)
+    else:
+        await run_blocking(MEMORY.save_memory, memory)
+
+@app.before_serving
+async def open_llm_session():
+    """One pooled HTTP session for all in-flight OpenAI calls"""
+    app.llm_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=LLM_CONNECTIONS)
+    )
+    if ASYNC_MEMORY:
+        await ASYNC_MEMORY.connect()
+        logger.info("Using Async Enhanced Memory Manager (asyncpg)")
+
+@app.after_serving
+async def close_llm_session():
+    await app.llm_session.close()
+    if ASYNC_MEMORY:
+        await ASYNC_MEMORY.close()
+    DB_EXECUTOR.shutdown(wait=False)
+
+@app.before_request
+async def bind_llm_session():
+    # openai reads its aiohttp session from a ContextVar scoped to the request task
+    openai.aiosession.set(app.llm_session)
+
+@app.after_request
+async def add_cors_headers(resp):
+    origin = request.headers.get("Origin")
+    if origin in ALLOWED_ORIGINS:
+        resp.headers["Access-Control-Allow-Origin"] = origin
+        resp.headers["Vary"] = "Origin"
+        resp.headers["Access-Control-Allow-Credentials"] = "true"
+        resp.headers["Access-Control-Allow-Headers"] = "Content-Type"
+        resp.headers["Access-Control-Allow-Methods"] = "GET,POST,OPTIONS"
+    return resp
+
+def get_or_create_user_id():
+    """Get user ID from session or create new one (same cookie as the Flask app)"""
+    if "user_id" not in session:
+        session["user_id"] = f"user_{uuid.uuid4().hex[:8]}"
+    return session["user_id"]
+
+# ============================================================================
+# ROUTES
+# ============================================================================
+
+@app.route("/tester", methods=["GET"])
+async def tester():
+    # Set the session cookie now: the /ws/chat handshake can't, and it needs it to resume
+    get_or_create_user_id()
+    return await render_template_string(TESTER_HTML)
+
+@app.route("/", methods=["GET"])
+async def home():
+    return redirect("/tester")
+
+@app.route("/ping", methods=["GET"])
+async def ping():
+    """Health check endpoint"""
+    return jsonify({
+        "status": "ok",
+        "bot": "Country Leisure Spa Chat",
+        "mode": "async",
+        "memory_type": "enhanced" if ENHANCED_AVAILABLE else "simple",
+        "memory_backend": MEMORY_BACKEND,
+        "flow_engine": "active",
+        "memory_conflicts": (ASYNC_MEMORY or MEMORY).get_conflict_stats() if hasattr(MEMORY, "get_conflict_stats") else None,
+        "turn_log": ((ASYNC_MEMORY or MEMORY).get_turn_log_stats()
+                     if getattr(ASYNC_MEMORY or MEMORY, "turn_log", False) else None),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route("/chat", methods=["POST", "OPTIONS"])
+async def chat():
+    """Main chat endpoint - same pipeline as the Flask app, LLM call awaited"""
+    if request.method == "OPTIONS":
+        return jsonify({"ok": True}), 200
+
+    try:
+        payload = await request.get_json(silent=True) or {}
+        user_message = payload.get("message", "").strip()
+        if not user_message:
+            return jsonify({"error": "Empty message"}), 400
+
+        user_id = get_or_create_user_id()
+        memory = await load_memory(user_id, CHAT_MEMORY_FIELDS)
+
+        turn = PIPELINE.prepare_turn(memory, user_message)
+        bot_response = await PIPELINE.acall_llm(turn["messages"])
+
+        body = PIPELINE.complete_turn(memory, user_message, turn, bot_response)
+        await save_memory(memory)
+        announce_turn_soon(memory)
+
+        return jsonify(body)
+
+    except openai.error.OpenAIError as e:
+        logger.error(f"OpenAI error: {e}")
+        return jsonify({
+            "error": "Having trouble connecting to AI service. Please try again."
+        }), 500
+    except Exception as e:
+        logger.exception(f"Chat error: {e}")
+        return jsonify({"error": "Something went wrong. Please try again."}), 500
+
+@app.route("/reset-conversation", methods=["POST"])
+async def reset_conversation():
+    """Reset conversation for the current user"""
+    try:
+        payload = await request.get_json(silent=True) or {}
+        user_id = payload.get("user_id") or session.get("user_id")
+
+        memory = await load_memory(user_id, RESET_MEMORY_FIELDS)
+        PIPELINE.reset_memory(memory)
+        await save_memory(memory)
+
+        return jsonify({
+            "ok": True,
+            "user_id": memory.get("user_id"),
+            "message": "Conversation reset."
+        }), 200
+
+    except Exception as e:
+        logger.exception("reset-conversation error")
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+# ============================================================================
+# WEBSOCKET CHAT CHANNEL
+# ============================================================================
+
+@app.websocket("/ws/chat")
+async def ws_chat():
+    """
+    Long-lived chat channel. The session cookie is resolved and memory loaded
+    once per connection, along with the prompt's recent-turn history; each turn
+    runs the shared pipeline against that connection-local state, streams the
+    reply back and persists the change.
+
+    Client sends:  {"message": "..."} or {"type": "reset"}
+    Server sends:  {"type": "ready"|"delta"|"done"|"reset"|"error", ...}
+    """
+    openai.aiosession.set(app.llm_session)
+    # No Set-Cookie after the handshake: pages that open the socket (/tester) set the cookie
+    # first; a visitor without one still gets a connection-scoped id
+    user_id = session.get("user_id") or f"user_{uuid.uuid4().hex[:8]}"
+    memory = await load_memory(user_id, CHAT_MEMORY_FIELDS)
+    history = PIPELINE.history_messages(memory)
+    await websocket.send_json({"type": "ready", "user_id": user_id, "buyer_stage": memory.get("buyer_stage")})
+
+    while True:
+        try:
+            data = json.loads(await websocket.receive())
+        except ValueError:
+            await websocket.send_json({"type": "error", "error": "Invalid JSON"})
+            continue
+        if not isinstance(data, dict):
+            await websocket.send_json({"type": "error", "error": "Expected a JSON object"})
+            continue
+
+        # One bad message (or a memory/DB failure) gets an error frame; the socket stays open
+        try:
+            if data.get("type") == "reset":
+                PIPELINE.reset_memory(memory)
+                history.clear()
+                await save_memory(memory)
+                await websocket.send_json({"type": "reset", "user_id": user_id})
+                continue
+
+            user_message = data.get("message")
+            user_message = user_message.strip() if isinstance(user_message, str) else ""
+            if not user_message:
+                await websocket.send_json({"type": "error", "error": "Empty message"})
+                continue
+
+            turn = PIPELINE.prepare_turn(memory, user_message, history)
+            parts = []
+            async for text in PIPELINE.astream_llm(turn["messages"]):
+                parts.append(text)
+                await websocket.send_json({"type": "delta", "text": text})
+
+            bot_response = "".join(parts).strip()
+            body = PIPELINE.complete_turn(memory, user_message, turn, bot_response)
+            PIPELINE.remember_turn(history, user_message, bot_response)
+            await save_memory(memory)
+            announce_turn_soon(memory)
+            await websocket.send_json({"type": "done", **body})
+
+        except openai.error.OpenAIError as e:
+            logger.error(f"OpenAI error: {e}")
+            await websocket.send_json({"type": "error", "error": "Having trouble connecting to AI service. Please try again."})
+        except Exception as e:
+            logger.exception(f"WebSocket chat error: {e}")
+            await websocket.send_json({"type": "error", "error": "Something went wrong. Please try again."})
+
+@app.route("/admin/conversations.json", methods=["GET"])
+async def admin_conversations():
+    """Provide simplified conversation feed for admin dashboard"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+
+    try:
+        limit, before = feed_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        items = await run_blocking(MEMORY.get_recent_conversations, limit, before)
+        return "".join(feed_json_chunks(items, limit)), 200, {"Content-Type": "application/json"}
+    except Exception as e:
+        logger.exception(f"Error loading admin conversations: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/admin/search.json", methods=["GET"])
+async def admin_search():
+    """Ranked full-text search over logged turns with highlighted snippets"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if not getattr(MEMORY, "turn_log", False):
+        return jsonify({"error": "search needs the Postgres turn log"}), 501
+
+    try:
+        kwargs = search_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        items = await run_blocking(lambda: MEMORY.search_conversations(**kwargs))
+        return jsonify(search_page(kwargs, items))
+    except Exception as e:
+        logger.exception(f"Error searching conversations: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/admin/leads.json", methods=["GET"])
+async def admin_leads():
+    """Sales segment query, e.g. ?stage=ready&min_seats=7&max_budget=15000&feature=jets (pass next_before back as ?before=)"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if MEMORY_BACKEND != "postgres":
+        return jsonify({"error": "lead segmentation needs the Postgres backend"}), 501
+
+    try:
+        segment = LeadSegment.from_args(request.args)
+        limit = max(1, min(int(request.args.get("limit", 100)), LEADS_MAX_LIMIT))
+        before = decode_feed_cursor(request.args["before"]) if request.args.get("before") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        items = await run_blocking(MEMORY.find_leads, segment, limit, before)
+        next_before = encode_feed_cursor(items[-1]["ts"], items[-1]["user_id"]) if len(items) == limit else None
+        return jsonify({"items": items, "next_before": next_before})
+    except Exception as e:
+        logger.exception(f"Error querying leads: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/admin/funnel", methods=["GET"])
+async def admin_funnel():
+    """Stage entries, conversions and CTA impressions from the hourly rollups (?hours=720&series=1)"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if MEMORY_BACKEND != "postgres" or not getattr(MEMORY, "funnel_events", False):
+        return jsonify({"error": "funnel analytics need the Postgres backend"}), 501
+
+    try:
+        hours = max(1, min(int(request.args.get("hours", 720)), 24 * 366))
+    except ValueError:
+        return jsonify({"error": "hours must be an integer"}), 400
+
+    try:
+        return jsonify(await run_blocking(MEMORY.get_funnel, hours, request.args.get("series") == "1"))
+    except Exception as e:
+        logger.exception(f"Error loading funnel: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/admin/export", methods=["GET"])
+async def admin_export():
+    """Download every conversation, one record per turn (?format=ndjson|csv&gzip=1&since=&until=&stage=)"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if MEMORY_BACKEND != "postgres":
+        return jsonify({"error": "export needs the Postgres backend"}), 501
+
+    try:
+        options = export_request(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def open_chunks():
+        records = iter_export_rows(MEMORY.database_url, **options["filters"])
+        first = next(records, None)
+        records = itertools.chain([first], records) if first is not None else []
+        return export_chunks(export_lines(records, options["fmt"]), compress=options["compress"])
+
+    try:
+        chunks = await run_blocking(open_chunks)
+    except Exception as e:
+        logger.exception(f"Error exporting conversations: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    async def body():
+        # The cursor is blocking: pull each ~64KB chunk on the DB pool
+        try:
+            while True:
+                chunk = await run_blocking(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await run_blocking(chunks.close)
+
+    response = await make_response(body(), export_headers(options))
+    response.timeout = None
+    return response
+
+@app.route("/admin/conversations/stream", methods=["GET"])
+async def admin_conversation_stream():
+    """Server-Sent Events: one 'turn' event per saved turn, 'resync' when events were missed"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if not CONVERSATION_HUB:
+        return jsonify({"error": "admin stream disabled"}), 404
+
+    subscription = CONVERSATION_HUB.subscribe(asyncio.get_running_loop())
+    if subscription is None:
+        return jsonify({"error": "too many stream subscribers"}), 503
+    keepalive = float(os.getenv("ADMIN_STREAM_KEEPALIVE", 15))
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                batch = await subscription.get_async(keepalive)
+                resync = subscription.take_resync()
+                if resync:
+                    yield sse_message(resync, event="resync")
+                for event in batch:
+                    yield sse_message(event, event_id=event["id"])
+                if not batch and not resync:
+                    yield SSE_KEEPALIVE
+        finally:
+            subscription.close()
+
+    response = await make_response(events(), {
+        "Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"
+    })
+    response.timeout = None
+    return response
+
+@app.route("/admin/jobs.json", methods=["GET"])
+async def admin_jobs():
+    """Background job status: this worker's view plus the cluster-wide last runs"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if not SCHEDULER:
+        return jsonify({"error": "job scheduler disabled"}), 404
+
+    try:
+        cluster = await run_blocking(SCHEDULER.cluster_status)
+        return jsonify({**SCHEDULER.status(), "cluster": cluster})
+    except Exception as e:
+        logger.exception(f"Error loading job status: {e}")
+        return jsonify({**SCHEDULER.status(), "cluster": None, "error": str(e)})
+
+@app.route("/admin/jobs/<name>/run", methods=["POST"])
+async def admin_run_job(name):
+    """Trigger a job now (still runs on only one worker)"""
+    token = request.args.get("token")
+    if token != os.getenv("ADMIN_TOKEN", "spa-admin-token-2025"):
+        return jsonify({"error": "unauthorized"}), 403
+    if not SCHEDULER or name not in SCHEDULER.jobs:
+        return jsonify({"error": f"unknown job {name}"}), 404
+
+    return jsonify({"ok": SCHEDULER.run_now(name), "job": name}), 202
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
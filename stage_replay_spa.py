@@ -0,0 +1,301 @@
+"""
+Buyer Stage Re-evaluation
+=========================
+
+Re-derives every stored visitor's ``buyer_stage`` and ``engagement_level``
+after a change to ConversationFlowEngine.evaluate or the memory manager's
+stage/engagement rules.
+
+Each stored conversation is replayed from a blank document, turn by turn,
+through the same code a live /chat turn runs - ChatPipeline.evaluate_turn
+(fact extraction + flow-engine stage) followed by
+EnhancedMemoryManager.add_interaction (manager facts, stage, engagement) -
+across a process pool. Documents stream in through a server-side cursor;
+changed rows are written back per batch with a version check, so a visitor
+who chats while the job runs keeps the newer live values, and a NOTIFY is
+sent per row for the read caches.
+
+Stored histories are capped at the manager's max_interactions, so a replay
+may see fewer turns than the visitor had; by default a replay can only move a
+visitor forward (``--allow-downgrade`` lifts that).
+
+Usage:  python stage_replay_spa.py --dry-run | head
+        python stage_replay_spa.py --workers 8 --batch-size 2000
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from chat_pipeline_spa import ChatPipeline
+from conversation_flow_engine_spa import ConversationFlowEngine
+from enhanced_memory_manager_spa import EnhancedMemoryManager
+from funnel_analytics_spa import STAGE_ORDER
+from invalidation_bus_spa import MEMORY_CHANNEL
+from memory_codec_spa import decode_history
+
+logger = logging.getLogger(__name__)
+
+# (user_id, version, buyer_stage, engagement_level, interactions, history blob)
+Document = Tuple[str, int, str, int, Any, Optional[bytes]]
+# (user_id, version, old stage, new stage, old engagement, new engagement)
+Change = Tuple[str, int, str, str, int, int]
+
+class ReplayMemoryManager(EnhancedMemoryManager):
+    """EnhancedMemoryManager's per-turn rules with no store behind it"""
+
+    def __init__(self, max_interactions: int = 15):
+        self.max_interactions = max_interactions
+        self.turn_log = False
+        self.funnel_events = False
+
+def replay_conversation(pipeline: ChatPipeline, interactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """A fresh memory document after replaying the stored turns in order"""
+    memory = {"user_id": "replay", "interactions": [], "key_facts": {}, "buyer_stage": "browsing",
+              "engagement_level": 1, "cta_attempts": []}
+    for turn in interactions:
+        user_message = turn.get("user") or ""
+        pipeline.evaluate_turn(memory, user_message)
+        pipeline.memory.add_interaction(memory, user_message, turn.get("bot") or "")
+    return memory
+
+def _stage_rank(stage: str) -> int:
+    return STAGE_ORDER.index(stage) if stage in STAGE_ORDER else -1
+
+_PIPELINE: Optional[ChatPipeline] = None
+
+def _init_worker() -> None:
+    global _PIPELINE
+    logging.getLogger("chat_pipeline_spa").setLevel(logging.WARNING)
+    _PIPELINE = ChatPipeline(ReplayMemoryManager(), ConversationFlowEngine())
+
+def replay_document(document: Document, allow_downgrade: bool = False) -> Optional[Change]:
+    """Replay one stored document; the change to write back, or None if it already matches"""
+    if _PIPELINE is None:
+        _init_worker()
+    user_id, version, stage, level, interactions, history = document
+    if history is not None:
+        interactions = decode_history(bytes(history))[0]
+    replayed = replay_conversation(_PIPELINE, interactions or [])
+
+    new_stage, new_level = replayed["buyer_stage"], replayed["engagement_level"]
+    if not allow_downgrade:
+        if _stage_rank(new_stage) < _stage_rank(stage):
+            new_stage = stage
+        new_level = max(new_level, level or 1)
+    if new_stage == stage and new_level == level:
+        return None
+    return user_id, version, stage, new_stage, level, new_level
+
+def _replay_forward(document: Document) -> Optional[Change]:
+    return replay_document(document)
+
+def _replay_any(document: Document) -> Optional[Change]:
+    return replay_document(document, allow_downgrade=True)
+
+# ============================================================================
+# STORES
+# ============================================================================
+
+DOCUMENTS_SQL = "SELECT user_id, version, buyer_stage, engagement_level, interactions, history FROM user_memories"
+
+# Version-checked so a concurrent chat save wins; one NOTIFY per updated row
+UPDATE_STAGES_SQL = f"""
+    WITH changed (user_id, buyer_stage, engagement_level, version) AS (VALUES %s),
+    updated AS (
+        UPDATE user_memories AS m
+        SET buyer_stage = changed.buyer_stage, engagement_level = changed.engagement_level, version = m.version + 1
+        FROM changed
+        WHERE m.user_id = changed.user_id AND m.version = changed.version
+        RETURNING m.user_id, m.version
+    )
+    SELECT count(pg_notify('{MEMORY_CHANNEL}', user_id || ':' || version)) FROM updated
+"""
+
+SQLITE_UPDATE_STAGES_SQL = """
+    UPDATE user_memories SET buyer_stage = ?, engagement_level = ?, version = version + 1
+    WHERE user_id = ? AND version = ?
+"""
+
+class PostgresStageStore:
+    """Reads documents through a named cursor; writes changes on a second connection"""
+
+    def __init__(self, database_url: str, fetch_size: int = 2000):
+        import psycopg2
+
+        self.fetch_size = fetch_size
+        self.read_conn = psycopg2.connect(database_url)
+        self.read_conn.set_session(readonly=True)
+        self.write_conn = psycopg2.connect(database_url)
+
+    def documents(self) -> Iterator[Document]:
+        with self.read_conn.cursor(name=f"spa_replay_{uuid.uuid4().hex[:12]}") as cur:
+            cur.itersize = self.fetch_size
+            cur.execute(DOCUMENTS_SQL)
+            yield from cur
+
+    def write(self, changes: List[Change]) -> int:
+        """Apply changes in one transaction; returns rows updated"""
+        from psycopg2.extras import execute_values
+
+        rows = [(user_id, new_stage, new_level, version) for user_id, version, _, new_stage, _, new_level in changes]
+        try:
+            with self.write_conn.cursor() as cur:
+                counts = execute_values(cur, UPDATE_STAGES_SQL, rows, page_size=len(rows), fetch=True)
+            self.write_conn.commit()
+            return sum(count for count, in counts)
+        except Exception:
+            self.write_conn.rollback()
+            raise
+
+    def close(self) -> None:
+        self.read_conn.close()
+        self.write_conn.close()
+
+class SQLiteStageStore:
+    """Same for the SQLite backend file (keyset reads by user_id)"""
+
+    def __init__(self, path: str, fetch_size: int = 2000):
+        self.fetch_size = fetch_size
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA busy_timeout=5000")
+
+    def documents(self) -> Iterator[Document]:
+        import json
+
+        last_user = ""
+        while True:
+            rows = self.conn.execute(
+                "SELECT user_id, version, buyer_stage, engagement_level, interactions FROM user_memories "
+                "WHERE user_id > ? ORDER BY user_id LIMIT ?", (last_user, self.fetch_size)).fetchall()
+            if not rows:
+                return
+            for user_id, version, stage, level, interactions in rows:
+                yield user_id, version, stage, level, json.loads(interactions), None
+            last_user = rows[-1][0]
+
+    def write(self, changes: List[Change]) -> int:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(SQLITE_UPDATE_STAGES_SQL, [
+                (new_stage, new_level, user_id, version) for user_id, version, _, new_stage, _, new_level in changes
+            ])
+            self.conn.execute("COMMIT")
+            return self.conn.total_changes - before
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self.conn.close()
+
+# ============================================================================
+# JOB
+# ============================================================================
+
+def _batches(documents: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def reevaluate_stages(store, workers: int = None, batch_size: int = 2000, dry_run: bool = False,
+                      allow_downgrade: bool = False, diff=None) -> Dict[str, Any]:
+    """
+    Replay every stored conversation and write back changed stages
+
+    Args:
+        store: PostgresStageStore or SQLiteStageStore
+        workers: Replay processes (default CPU count; 1 = replay in this process)
+        batch_size: Documents per replay batch / write-back transaction
+        dry_run: Report changes without writing them
+        allow_downgrade: Let a replay lower a stage or engagement level
+        diff: Text stream for one line per changed visitor
+
+    Returns:
+        Totals: documents, changed, written, transitions, seconds, docs_per_sec
+    """
+    workers = workers or os.cpu_count() or 1
+    replay = _replay_any if allow_downgrade else _replay_forward
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker) if workers > 1 else None
+    transitions = Counter()
+    processed = changed = written = 0
+    started = time.perf_counter()
+    try:
+        for batch in _batches(store.documents(), batch_size):
+            if pool:
+                results = pool.map(replay, batch, chunksize=max(1, len(batch) // (workers * 4)))
+            else:
+                results = map(replay, batch)
+            changes = [change for change in results if change]
+
+            for user_id, _, old_stage, new_stage, old_level, new_level in changes:
+                transitions[(old_stage, new_stage)] += 1
+                if diff:
+                    diff.write(f"{user_id}\tstage {old_stage} -> {new_stage}\tengagement {old_level} -> {new_level}\n")
+            if changes and not dry_run:
+                written += store.write(changes)
+
+            processed += len(batch)
+            changed += len(changes)
+            rate = processed / (time.perf_counter() - started)
+            logger.info(f"{processed:,} replayed, {changed:,} changed, {written:,} written - {rate:,.0f} docs/s")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "documents": processed,
+        "changed": changed,
+        "written": written,
+        "transitions": transitions,
+        "seconds": round(elapsed, 2),
+        "docs_per_sec": round(processed / elapsed) if elapsed else 0
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="print the changes (one line per visitor) only")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--allow-downgrade", action="store_true")
+    parser.add_argument("--sqlite", metavar="PATH", help="re-evaluate a SQLite backend file instead of Postgres")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    if args.sqlite:
+        store = SQLiteStageStore(args.sqlite, args.batch_size)
+    elif args.database_url:
+        store = PostgresStageStore(args.database_url, args.batch_size)
+    else:
+        sys.exit("DATABASE_URL environment variable is required (or --sqlite PATH)")
+
+    try:
+        totals = reevaluate_stages(store, args.workers, args.batch_size, args.dry_run, args.allow_downgrade,
+                                   diff=sys.stdout if args.dry_run else None)
+    finally:
+        store.close()
+
+    summary = sys.stderr if args.dry_run else sys.stdout
+    print(f"Replayed {totals['documents']:,} conversations in {totals['seconds']}s "
+          f"({totals['docs_per_sec']:,} docs/s): {totals['changed']:,} changed, "
+          f"{totals['written']:,} written{' (dry run)' if args.dry_run else ''}", file=summary)
+    for (old_stage, new_stage), count in totals["transitions"].most_common():
+        print(f"  {old_stage:>12} -> {new_stage:<12}{count:>10,}", file=summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Admin Conversation Feed
+=======================
+
+The opaque keyset cursor, and paging through the feed with it on every
+local backend: each conversation exactly once, newest first.
+"""
+
+import base64
+
+import pytest
+
+from enhanced_memory_manager_spa import decode_feed_cursor, encode_feed_cursor
+from memory_backends_spa import InMemoryManager, SharedSessionStore, SQLiteMemoryManager
+
+BACKENDS = {
+    "memory": lambda path: InMemoryManager(),
+    "shared": lambda path: SharedSessionStore(path),
+    "sqlite": lambda path: SQLiteMemoryManager(path, cache_ttl=0),
+}
+
+@pytest.mark.parametrize("ts, user_id", [
+    ("2026-03-01T10:15:00.123456", "user_1a2b"),
+    ("2026-03-01T10:15:00", "has|pipes|in it"),
+    ("2026-03-01T10:15:00", "ünïcode ✓"),
+    ("2026-03-01T10:15:00", ""),
+])
+def test_cursor_round_trips(ts, user_id):
+    cursor = encode_feed_cursor(ts, user_id)
+    assert decode_feed_cursor(cursor) == (ts, user_id)
+    # Safe in a query string as-is
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    base64.urlsafe_b64encode(b"no separator").decode(),
+    base64.urlsafe_b64encode(b"|user only").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|user").decode(),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_feed_cursor(cursor)
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request, tmp_path):
+    backend = BACKENDS[request.param](str(tmp_path / "feed.db"))
+    yield backend
+    if hasattr(backend, "close"):
+        backend.close()
+
+def test_cursor_pages_through_every_conversation_once(backend):
+    for n in range(7):
+        memory = backend.load_memory(f"visitor-{n}")
+        backend.add_interaction(memory, f"question {n}", f"answer {n}")
+        assert backend.save_memory(memory)
+    backend.save_memory(backend.load_memory("never-spoke"))
+
+    seen, cursor = [], None
+    while True:
+        page = backend.get_recent_conversations(limit=3, before=decode_feed_cursor(cursor) if cursor else None)
+        seen += page
+        if len(page) < 3:
+            break
+        cursor = encode_feed_cursor(page[-1]["ts"], page[-1]["user_id"])
+
+    assert [item["user_id"] for item in seen] == [f"visitor-{n}" for n in reversed(range(7))]
+    assert seen[0]["user_message"] == "question 6" and seen[0]["bot_response"] == "answer 6"
@@ -0,0 +1,133 @@
+"""
+Background Job Scheduler
+========================
+
+Interval parsing, lock keys, and leader election between schedulers that
+share a lock directory (the no-Postgres file locks; the advisory-lock path
+makes the same decisions and needs a database). Runs go through _execute
+directly, so no scheduler threads are started.
+"""
+
+import time
+
+import pytest
+
+from job_scheduler_spa import Job, JobScheduler, job_lock_key, parse_interval
+
+@pytest.mark.parametrize("every, seconds", [
+    ("30s", 30), ("15m", 900), ("1h30m", 5400), ("1d", 86400), ("@daily", 86400), ("@hourly", 3600),
+    ("0.5s", 0.5), (45, 45), (2.5, 2.5),
+])
+def test_parse_interval(every, seconds):
+    assert parse_interval(every) == seconds
+
+@pytest.mark.parametrize("every", ["", "soon", "15", "15x", "1h junk", "0s", 0, -1])
+def test_parse_interval_rejects(every):
+    with pytest.raises(ValueError):
+        parse_interval(every)
+
+def test_lock_keys_are_stable_signed_int4():
+    keys = [job_lock_key(f"job-{n}") for n in range(1000)]
+    assert all(-2 ** 31 <= key < 2 ** 31 for key in keys)
+    assert any(key < 0 for key in keys)
+    assert job_lock_key("cleanup_expired") == job_lock_key("cleanup_expired")
+
+def test_recently_finished_uses_the_jittered_lower_bound():
+    job = Job("j", lambda: None, interval=100, jitter=0.1)
+    assert job.recently_finished(1000, 1089)
+    assert not job.recently_finished(1000, 1090)
+    assert not job.recently_finished(None, 1000)
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two schedulers (workers) sharing one host's lock directory"""
+    first = JobScheduler(lock_dir=str(tmp_path))
+    second = JobScheduler(lock_dir=str(tmp_path))
+    return first, second
+
+def counting_job(scheduler, name="cleanup", exclusive=True):
+    calls = []
+    return scheduler.add_job(name, lambda: calls.append(1) or len(calls), "1h", exclusive=exclusive), calls
+
+def test_only_one_worker_holds_the_lock(workers):
+    first, second = workers
+    job_a, _ = counting_job(first)
+    job_b, _ = counting_job(second)
+
+    lease = first._acquire(job_a, force=False)
+    assert lease is not None
+    assert second._acquire(job_b, force=True) is None
+    first._release(job_a, lease)
+    assert second._acquire(job_b, force=True) is not None
+
+def test_a_finished_run_is_skipped_by_the_other_worker(workers):
+    first, second = workers
+    job_a, calls_a = counting_job(first)
+    job_b, calls_b = counting_job(second)
+
+    first._execute(job_a, False)
+    second._execute(job_b, False)
+    assert (calls_a, calls_b) == ([1], [])
+    assert (job_a.runs, job_b.runs, job_b.skips) == (1, 0, 1)
+    assert job_a.last_status == "ok" and job_a.last_result == 1
+
+    # run_now ignores the recent-run window
+    second._execute(job_b, True)
+    assert calls_b == [1]
+
+def test_a_held_lock_is_skipped_even_when_forced(workers):
+    first, second = workers
+    job_a, _ = counting_job(first)
+    job_b, calls_b = counting_job(second)
+
+    lease = first._acquire(job_a, force=False)
+    try:
+        second._execute(job_b, True)
+    finally:
+        first._release(job_a, lease)
+    assert calls_b == [] and job_b.skips == 1 and not job_b.running
+
+def test_non_exclusive_jobs_run_on_every_worker(workers):
+    first, second = workers
+    job_a, calls_a = counting_job(first, exclusive=False)
+    job_b, calls_b = counting_job(second, exclusive=False)
+    first._execute(job_a, False)
+    second._execute(job_b, False)
+    assert calls_a == calls_b == [1]
+
+def test_failures_are_recorded_and_release_the_lock(workers):
+    first, second = workers
+
+    def broken():
+        raise RuntimeError("disk full")
+
+    job_a = first.add_job("cleanup", broken, "1h")
+    first._execute(job_a, False)
+    assert (job_a.runs, job_a.failures, job_a.last_status, job_a.last_error) == (1, 1, "error", "disk full")
+
+    # The failed run still counts as finished for the interval, and the lock was released
+    job_b, calls_b = counting_job(second)
+    second._execute(job_b, False)
+    assert calls_b == [] and job_b.skips == 1
+    second._execute(job_b, True)
+    assert calls_b == [1]
+
+def test_status_reports_each_job(workers):
+    first, _ = workers
+    job, _ = counting_job(first)
+    first._execute(job, False)
+    status = first.status()
+    assert status["leader_lock"] == "file" and not status["running"]
+    (report,) = status["jobs"]
+    assert report["name"] == "cleanup" and report["runs"] == 1 and report["last_result"] == 1
+    assert report["interval_seconds"] == 3600
+
+def test_first_run_lands_in_the_jitter_window(workers):
+    first, _ = workers
+    before = time.time()
+    job = first.add_job("warm", lambda: None, "100s", jitter=0.2)
+    assert before <= job.next_run <= time.time() + 20
+
+def test_add_job_rejects_bad_jitter(workers):
+    with pytest.raises(ValueError):
+        workers[0].add_job("j", lambda: None, "1m", jitter=1)
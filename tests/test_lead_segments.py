@@ -0,0 +1,80 @@
+"""
+Lead Segmentation
+=================
+
+LeadSegment filters and the SQL they produce. The seat and budget clauses
+must use the exact expressions migration 0008 indexes.
+"""
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from lead_segments_spa import (
+    LEAD_BUDGET_SQL, LEAD_SEATS_SQL, LEADS_MAX_LIMIT, LeadSegment, lead_row, leads_query
+)
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+def test_empty_segment_matches_everything():
+    assert LeadSegment().where() == ("TRUE", [])
+
+def test_clauses_and_together_in_parameter_order():
+    segment = LeadSegment(stages=["ready", "considering"], min_seats=7, max_budget=15000,
+                          facts={"reason": "family", "features": ["jets"]})
+    where, params = segment.where()
+    assert where == (f"buyer_stage = ANY(%s) AND {LEAD_SEATS_SQL} >= %s AND {LEAD_BUDGET_SQL} <= %s "
+                     "AND key_facts @> %s::jsonb")
+    assert params == [["ready", "considering"], 7, 15000, '{"reason": "family", "features": ["jets"]}']
+
+def test_zero_is_a_bound_not_a_missing_value():
+    where, params = LeadSegment(min_budget=0).where()
+    assert where == f"{LEAD_BUDGET_SQL} >= %s" and params == [0]
+
+def test_from_args():
+    segment = LeadSegment.from_args({"stage": "ready, considering,", "min_seats": "7", "max_seats": "",
+                                     "max_budget": "15000", "reason": "family", "feature": "jets,lights"})
+    assert segment == LeadSegment(["ready", "considering"], 7.0, None, None, 15000.0,
+                                  {"reason": "family", "features": ["jets", "lights"]})
+
+def test_from_args_rejects_non_numeric_bounds():
+    with pytest.raises(ValueError):
+        LeadSegment.from_args({"min_seats": "lots"})
+
+def test_query_pages_with_the_feed_cursor():
+    sql, params = leads_query(LeadSegment(stages=["ready"]), 50, ("2026-03-01T10:15:00", "visitor-9"))
+    assert "WHERE buyer_stage = ANY(%s) AND (last_updated, user_id) < (%s::timestamp, %s)" in sql
+    assert "ORDER BY last_updated DESC, user_id DESC" in sql
+    assert sql.count("%s") == len(params)
+    assert params == (["ready"], "2026-03-01T10:15:00", "visitor-9", 50)
+
+@pytest.mark.parametrize("limit, expected", [(0, 1), (-5, 1), (100, 100), (10 ** 6, LEADS_MAX_LIMIT)])
+def test_limit_is_clamped(limit, expected):
+    assert leads_query(LeadSegment(), limit)[1] == (expected,)
+
+def test_segment_query_does_not_mutate_the_segment():
+    segment = LeadSegment(stages=["ready"])
+    leads_query(segment, 10, ("2026-03-01T10:15:00", "visitor-9"))
+    assert segment.where()[1] == [["ready"]]
+
+def test_numeric_expressions_match_the_index():
+    with open(os.path.join(MIGRATIONS, "0008_lead_fact_index.sql")) as f:
+        sql = " ".join(f.read().split())
+    assert " ".join(LEAD_SEATS_SQL.split()) in sql
+    assert " ".join(LEAD_BUDGET_SQL.split()) in sql
+
+def test_lead_row():
+    row = ("visitor-1", datetime(2026, 3, 1, 10, 15), "ready", 4, 7.0, 15000.0,
+           {"preferred_seats": 7}, {"email": "d@example.com"})
+    assert lead_row(row) == {
+        "user_id": "visitor-1", "ts": "2026-03-01T10:15:00", "buyer_stage": "ready", "engagement_level": 4,
+        "preferred_seats": 7, "budget": 15000, "key_facts": {"preferred_seats": 7},
+        "contact_info": {"email": "d@example.com"},
+    }
+    assert lead_row(row[:4] + (None, None) + row[6:])["budget"] is None
+
+def test_facts_are_valid_json():
+    _, params = LeadSegment(facts={"focus": "relaxation"}).where()
+    assert json.loads(params[0]) == {"focus": "relaxation"}
@@ -0,0 +1,89 @@
+"""
+Compact History Codec
+=====================
+
+encode_history/decode_history round trips, and the pure-Python msgpack
+subset agreeing with the msgpack package in both directions (skipped when
+msgpack isn't installed; the fallback runs either way).
+"""
+
+import pytest
+
+import memory_codec_spa
+from memory_codec_spa import apply_history_blob, decode_history, encode_history, packb, unpackb
+
+INTERACTIONS = [
+    {"timestamp": "2026-03-01T10:15:00.123456", "user": "hi", "bot": "Welcome in!"},
+    {"timestamp": "2026-03-01T10:15:42", "user": "6 seats?", "bot": "Plenty of those", "stage": "interested"},
+    # Not round-trippable as microseconds: kept verbatim
+    {"timestamp": "2026-03-01T10:16:00+02:00", "user": "price", "bot": "From $7,999"},
+    {"timestamp": "yesterday", "user": "ok", "bot": "ok"},
+    {"user": "no timestamp", "bot": "ok"},
+]
+CTA_ATTEMPTS = [{"timestamp": "2026-03-01T10:17:00", "type": "quote", "response": "later"}]
+
+VALUES = [
+    None, True, False, 0, 127, 128, 255, 256, 65535, 65536, 2**32, 2**64 - 1, -1, -32, -33, -2**40,
+    0.5, -1e300, "", "héllo", "x" * 31, "x" * 32, "x" * 300, "x" * 70000, b"", b"\x00\xff", b"x" * 300,
+    [], list(range(15)), list(range(16)), list(range(70000)),
+    {}, {"a": 1, "b": [1, 2]}, {str(i): i for i in range(16)}, {1: "int keys"},
+    [1, [["timestamp", "user"]], [[0, 12, "hi"]], []],
+]
+
+@pytest.fixture
+def pure_python(monkeypatch):
+    """Force the fallback encoder/decoder even when msgpack is installed"""
+    monkeypatch.setattr(memory_codec_spa, "msgpack", None)
+
+def test_history_round_trips():
+    assert decode_history(encode_history(INTERACTIONS, CTA_ATTEMPTS)) == (INTERACTIONS, CTA_ATTEMPTS)
+
+def test_history_round_trips_with_the_fallback(pure_python):
+    assert decode_history(encode_history(INTERACTIONS, CTA_ATTEMPTS)) == (INTERACTIONS, CTA_ATTEMPTS)
+
+def test_empty_histories_round_trip():
+    assert decode_history(encode_history([], [])) == ([], [])
+
+def test_timestamps_are_delta_encoded():
+    _, _, rows, cta_rows = unpackb(encode_history(INTERACTIONS[:2], CTA_ATTEMPTS))
+    assert rows[1][1] == 41_876_544
+    assert cta_rows[0][1] > 0
+
+def test_unknown_codec_version_is_rejected():
+    with pytest.raises(ValueError):
+        decode_history(packb([99, [], [], []]))
+
+@pytest.mark.parametrize("value", VALUES, ids=range(len(VALUES)))
+def test_fallback_round_trips(pure_python, value):
+    assert unpackb(packb(value)) == value
+
+def test_fallback_refuses_unknown_types(pure_python):
+    with pytest.raises(TypeError):
+        packb({"when": object()})
+
+@pytest.mark.parametrize("value", VALUES, ids=range(len(VALUES)))
+def test_fallback_agrees_with_msgpack(value):
+    msgpack = pytest.importorskip("msgpack")
+    out = bytearray()
+    memory_codec_spa._pack(value, out)
+    assert msgpack.unpackb(bytes(out), raw=False, strict_map_key=False) == value
+    assert memory_codec_spa._unpack(msgpack.packb(value, use_bin_type=True), 0)[0] == value
+
+def test_history_written_by_msgpack_reads_with_the_fallback(monkeypatch):
+    pytest.importorskip("msgpack")
+    blob = encode_history(INTERACTIONS, CTA_ATTEMPTS)
+    monkeypatch.setattr(memory_codec_spa, "msgpack", None)
+    assert decode_history(blob) == (INTERACTIONS, CTA_ATTEMPTS)
+
+def test_apply_history_blob_prefers_the_blob():
+    row = {"user_id": "u", "interactions": [], "cta_attempts": [],
+           "history": encode_history(INTERACTIONS, CTA_ATTEMPTS)}
+    applied = apply_history_blob(row)
+    assert applied["interactions"] == INTERACTIONS
+    assert applied["cta_attempts"] == CTA_ATTEMPTS
+    assert "history" not in applied and "history" in row
+
+def test_apply_history_blob_keeps_json_rows():
+    row = {"user_id": "u", "interactions": INTERACTIONS, "cta_attempts": [], "history": None}
+    assert apply_history_blob(row) == {"user_id": "u", "interactions": INTERACTIONS, "cta_attempts": []}
+    assert apply_history_blob(None) is None
@@ -0,0 +1,284 @@
+"""
+Memory Backend Contract
+=======================
+
+One suite every memory backend must pass: load/save round trips, compare-
+and-swap conflicts merged instead of lost, resets that a stale concurrent
+save can't undo, and expiry.
+
+SQLiteMemoryManager, SharedSessionStore and InMemoryManager always run.
+EnhancedMemoryManager and AsyncEnhancedMemoryManager run against the
+Postgres database in TEST_DATABASE_URL (migrated on first use, expired rows
+deleted by the expiry test - point it at a throwaway database) and are
+skipped without it or without their driver.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+
+from memory_backends_spa import InMemoryManager, MemoryBackend, SharedSessionStore, SQLiteMemoryManager
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+def reset(memory):
+    """What ChatPipeline.reset_memory does to a document (chat_pipeline_spa needs openai)"""
+    memory.update({"interactions": [], "key_facts": {}, "conversation_summary": "", "buyer_stage": "browsing",
+                   "engagement_level": 1, "cta_attempts": [], "reset_at": datetime.now().isoformat()})
+
+def turns(memory):
+    return [interaction["user"] for interaction in memory["interactions"]]
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class AsyncBackend:
+    """AsyncEnhancedMemoryManager's coroutines driven through the sync contract"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(manager.connect())
+
+    def load_memory(self, user_id=None, fields=None):
+        return self.loop.run_until_complete(self.manager.load_memory(user_id, fields))
+
+    def save_memory(self, memory):
+        return self.loop.run_until_complete(self.manager.save_memory(memory))
+
+    def cleanup_expired_memories(self):
+        return self.loop.run_until_complete(self.manager.cleanup_expired_memories())
+
+    def __getattr__(self, name):
+        return getattr(self.manager, name)
+
+    def close(self):
+        self.loop.run_until_complete(self.manager.close())
+        self.loop.close()
+
+def postgres_url():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    psycopg2 = pytest.importorskip("psycopg2")
+    from schema_migrations_spa import apply_migrations
+
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        apply_migrations(conn)
+    finally:
+        conn.close()
+    return TEST_DATABASE_URL
+
+def make_postgres(path, expiry_days, cache_ttl):
+    from enhanced_memory_manager_spa import EnhancedMemoryManager
+    return EnhancedMemoryManager(postgres_url(), expiry_days=expiry_days, cache_ttl=cache_ttl, notify_changes=False,
+                                 pool_size=2, turn_log=False, funnel_events=False)
+
+def make_async_postgres(path, expiry_days, cache_ttl):
+    url = postgres_url()
+    pytest.importorskip("asyncpg")
+    from async_memory_manager_spa import AsyncEnhancedMemoryManager
+
+    return AsyncBackend(AsyncEnhancedMemoryManager(url, expiry_days=expiry_days, min_pool_size=1, max_pool_size=2,
+                                                   cache_ttl=cache_ttl, notify_changes=False, turn_log=False,
+                                                   funnel_events=False))
+
+# Factories take (store path, expiry_days, cache_ttl); the Postgres ones ignore the path
+BACKENDS = {
+    "memory": lambda path, expiry_days, cache_ttl: InMemoryManager(expiry_days=expiry_days),
+    "shared": lambda path, expiry_days, cache_ttl: SharedSessionStore(path, expiry_days=expiry_days),
+    "sqlite": lambda path, expiry_days, cache_ttl: SQLiteMemoryManager(path, expiry_days=expiry_days,
+                                                                       cache_ttl=cache_ttl),
+    "postgres": make_postgres,
+    "postgres-async": make_async_postgres,
+}
+
+# InMemoryManager hands every caller the same dict, so there is no stale copy to conflict
+VERSIONED = {"shared", "sqlite", "postgres", "postgres-async"}
+# Lose their documents on restart, so a snapshot restores into an empty store
+VOLATILE = {"memory", "shared"}
+
+@pytest.fixture(params=sorted(BACKENDS))
+def make_backend(request, tmp_path):
+    backends = []
+
+    def make(expiry_days=90, cache_ttl=0, store="memory"):
+        backend = BACKENDS[request.param](str(tmp_path / f"{store}.db"), expiry_days, cache_ttl)
+        backends.append(backend)
+        return backend
+
+    make.name = request.param
+    yield make
+    for backend in backends:
+        if hasattr(backend, "close"):
+            backend.close()
+
+@pytest.fixture
+def backend(make_backend):
+    return make_backend()
+
+@pytest.fixture
+def user_id():
+    return f"contract-{uuid.uuid4().hex}"
+
+# ============================================================================
+# CONTRACT
+# ============================================================================
+
+def test_satisfies_protocol(backend):
+    assert isinstance(getattr(backend, "manager", backend), MemoryBackend)
+
+def test_new_visitor_gets_fresh_document(backend, user_id):
+    memory = backend.load_memory(user_id)
+    assert memory["user_id"] == user_id
+    assert memory["interactions"] == []
+    assert memory["key_facts"] == {}
+    assert memory["buyer_stage"] == "browsing"
+
+def test_save_then_load_round_trips(backend, user_id):
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "hello there", "Welcome in!")
+    memory["key_facts"]["name"] = "Dana"
+    memory["contact_info"]["email"] = "dana@example.com"
+    assert backend.save_memory(memory)
+
+    loaded = backend.load_memory(user_id)
+    assert turns(loaded) == ["hello there"]
+    assert loaded["interactions"][0]["bot"] == "Welcome in!"
+    assert loaded["key_facts"]["name"] == "Dana"
+    assert loaded["contact_info"] == {"email": "dana@example.com"}
+
+def test_saves_advance_the_version(make_backend, user_id):
+    if make_backend.name not in VERSIONED:
+        pytest.skip("backend is not versioned")
+    backend = make_backend()
+    memory = backend.load_memory(user_id)
+    assert backend.save_memory(memory)
+    first = backend.load_memory(user_id)["version"]
+    assert backend.save_memory(backend.load_memory(user_id))
+    assert backend.load_memory(user_id)["version"] == first + 1
+
+def test_concurrent_saves_keep_both_turns(make_backend, user_id):
+    backend = make_backend()
+    first = backend.load_memory(user_id)
+    second = backend.load_memory(user_id)
+
+    backend.add_interaction(first, "first tab", "ok")
+    assert backend.save_memory(first)
+    backend.add_interaction(second, "second tab", "ok")
+    assert backend.save_memory(second)
+
+    assert sorted(turns(backend.load_memory(user_id))) == ["first tab", "second tab"]
+    if make_backend.name in VERSIONED:
+        assert backend.get_conflict_stats()["conflicts"] >= 1
+
+def test_conflict_merge_unions_facts(backend, user_id):
+    first = backend.load_memory(user_id)
+    second = backend.load_memory(user_id)
+
+    first["key_facts"]["name"] = "Dana"
+    first["contact_info"]["email"] = "dana@example.com"
+    assert backend.save_memory(first)
+    second["key_facts"]["preferred_seats"] = 6
+    second["contact_info"]["phone"] = "555-0100"
+    assert backend.save_memory(second)
+
+    loaded = backend.load_memory(user_id)
+    assert loaded["key_facts"]["name"] == "Dana"
+    assert loaded["key_facts"]["preferred_seats"] == 6
+    assert loaded["contact_info"] == {"email": "dana@example.com", "phone": "555-0100"}
+
+def test_stale_save_does_not_undo_reset(backend, user_id):
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "before the reset", "ok")
+    memory["key_facts"]["name"] = "Dana"
+    assert backend.save_memory(memory)
+
+    stale = backend.load_memory(user_id)
+    resetting = backend.load_memory(user_id)
+    reset(resetting)
+    assert backend.save_memory(resetting)
+
+    backend.add_interaction(stale, "after the reset", "ok")
+    assert backend.save_memory(stale)
+
+    loaded = backend.load_memory(user_id)
+    assert turns(loaded) == ["after the reset"]
+    assert "name" not in loaded["key_facts"]
+
+def test_reset_then_new_turns_survive(backend, user_id):
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "old question", "ok")
+    assert backend.save_memory(memory)
+
+    memory = backend.load_memory(user_id)
+    reset(memory)
+    assert backend.save_memory(memory)
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "new question", "ok")
+    assert backend.save_memory(memory)
+
+    assert turns(backend.load_memory(user_id)) == ["new question"]
+
+def test_expired_memory_is_cleaned_up(make_backend, user_id):
+    # expiry_days=0: anything saved before now is past its expiry
+    backend = make_backend(expiry_days=0)
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "hello there", "ok")
+    assert backend.save_memory(memory)
+
+    assert backend.cleanup_expired_memories() >= 1
+    assert backend.load_memory(user_id)["interactions"] == []
+
+def test_expired_memory_loads_fresh(make_backend, user_id):
+    if make_backend.name not in VERSIONED:
+        pytest.skip("InMemoryManager only expires documents in cleanup")
+    backend = make_backend(expiry_days=0)
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "hello there", "ok")
+    memory["key_facts"]["name"] = "Dana"
+    assert backend.save_memory(memory)
+
+    # Past expiry but not yet cleaned up: the visitor starts over, and saving doesn't merge the old turns back
+    memory = backend.load_memory(user_id)
+    assert memory["interactions"] == [] and memory["key_facts"] == {}
+    backend.add_interaction(memory, "back again", "ok")
+    assert backend.save_memory(memory)
+    assert turns(make_backend().load_memory(user_id)) == ["back again"]
+
+def test_snapshot_warms_a_restarted_backend(make_backend, user_id):
+    if make_backend.name == "postgres-async":
+        pytest.skip("the async server doesn't snapshot")
+    backend = make_backend(cache_ttl=60)
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "hello there", "ok")
+    assert backend.save_memory(memory)
+    snapshot = backend.snapshot_sessions()
+    assert user_id in [memory["user_id"] for memory in snapshot]
+
+    # Volatile stores restart empty; durable ones keep the rows and warm their read cache
+    restarted = make_backend(cache_ttl=60, store="restarted" if make_backend.name in VOLATILE else "memory")
+    assert restarted.warm_sessions(snapshot) >= 1
+    assert turns(restarted.load_memory(user_id)) == ["hello there"]
+
+def test_warm_skips_documents_saved_since_the_snapshot(make_backend, user_id):
+    if make_backend.name == "postgres-async":
+        pytest.skip("the async server doesn't snapshot")
+    backend = make_backend(cache_ttl=60)
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "in the snapshot", "ok")
+    assert backend.save_memory(memory)
+    snapshot = [memory for memory in backend.snapshot_sessions() if memory["user_id"] == user_id]
+
+    memory = backend.load_memory(user_id)
+    backend.add_interaction(memory, "after the snapshot", "ok")
+    assert backend.save_memory(memory)
+
+    # A second process on the same store (InMemoryManager's store is the instance itself)
+    restarted = backend if make_backend.name == "memory" else make_backend(cache_ttl=60)
+    assert restarted.warm_sessions(snapshot) == 0
+    assert turns(restarted.load_memory(user_id)) == ["in the snapshot", "after the snapshot"]
@@ -0,0 +1,78 @@
+"""
+Prepared Hot-Path Statements
+============================
+
+The statements prepared on every pooled connection: placeholder rewriting,
+EXECUTE arity matching what the managers pass, and the explicit column list
+that keeps a prepared load valid across migrations. The pool test needs
+psycopg2 (for PoolError) and is skipped without it.
+"""
+
+import threading
+
+import pytest
+
+from enhanced_memory_manager_spa import (
+    EXECUTE_LOAD_SQL, EXECUTE_NOTIFY_SQL, EXECUTE_SAVE_SQL, LOAD_MEMORY_SQL, MEMORY_COLUMNS, PREPARED_STATEMENTS,
+    SAVE_MEMORY_SQL, EnhancedMemoryManager, new_memory_document, to_numbered_sql
+)
+from memory_backends_spa import SQLiteMemoryManager
+
+def test_placeholders_are_numbered_in_order():
+    assert to_numbered_sql("WHERE a = %s AND b = %s OR c = %s") == "WHERE a = $1 AND b = $2 OR c = $3"
+    assert "%s" not in to_numbered_sql(SAVE_MEMORY_SQL)
+    assert "$17" in to_numbered_sql(SAVE_MEMORY_SQL) and "$18" not in to_numbered_sql(SAVE_MEMORY_SQL)
+
+def test_execute_statements_match_the_prepared_arity():
+    assert EXECUTE_LOAD_SQL == "EXECUTE spa_load_memory (%s)"
+    assert EXECUTE_NOTIFY_SQL == "EXECUTE spa_notify_memory (%s)"
+    assert EXECUTE_SAVE_SQL.count("%s") == SAVE_MEMORY_SQL.count("%s")
+    assert set(PREPARED_STATEMENTS) == {"spa_load_memory", "spa_save_memory", "spa_notify_memory"}
+
+def test_prepared_load_names_its_columns():
+    # SELECT * would fail every EXECUTE with "cached plan must not change result type" after a migration
+    assert "*" not in LOAD_MEMORY_SQL
+    assert LOAD_MEMORY_SQL.startswith(f"SELECT {', '.join(MEMORY_COLUMNS)}, history FROM")
+
+def test_save_params_fill_the_prepared_save(tmp_path):
+    manager = SQLiteMemoryManager(str(tmp_path / "memory.db"))
+    try:
+        memory = new_memory_document("u")
+        memory["version"] = 4
+        # The Postgres parameters, not SQLite's override
+        params = EnhancedMemoryManager._save_params(manager, memory)
+    finally:
+        manager.close()
+    assert len(params) == SAVE_MEMORY_SQL.count("%s")
+    assert params[0] == "u" and params[-1] == 4
+
+class FakePool:
+    def __init__(self):
+        self.out = 0
+
+    def getconn(self):
+        self.out += 1
+        conn = type("Conn", (), {"prepared": True, "closed": 0,
+                                 "__enter__": lambda self: self, "__exit__": lambda self, *exc: None})()
+        return conn
+
+    def putconn(self, conn, close=False):
+        self.out -= 1
+
+def test_threads_beyond_the_pool_wait_for_a_connection():
+    psycopg2_pool = pytest.importorskip("psycopg2.pool")
+
+    manager = EnhancedMemoryManager.__new__(EnhancedMemoryManager)
+    manager.pool_size, manager.prepare_statements, manager.pool_timeout = 1, False, 0.05
+    manager._pool_slots = threading.BoundedSemaphore(1)
+    pool = FakePool()
+    manager._get_pool = lambda: pool
+
+    with manager._get_connection():
+        # The one slot is taken: a second caller times out instead of overdrawing the pool
+        with pytest.raises(psycopg2_pool.PoolError):
+            with manager._get_connection():
+                pass
+    with manager._get_connection():
+        pass
+    assert pool.out == 0
@@ -0,0 +1,156 @@
+"""
+Projected Memory Loads
+======================
+
+LazyMemory decoding JSONB on first read and tracking what a save must
+write, and the SQL for projected loads and partial compare-and-swap saves.
+The row handling runs on SQLiteMemoryManager, which shares it with the
+Postgres managers.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from enhanced_memory_manager_spa import (
+    HISTORY_COLUMNS, LazyMemory, new_memory_document, partial_save_sql, projected_load_sql
+)
+from memory_backends_spa import SQLiteMemoryManager
+from memory_codec_spa import decode_history, encode_history
+
+FIELDS = ("interactions", "cta_attempts", "key_facts", "buyer_stage", "engagement_level", "render_status")
+INTERACTIONS = [{"timestamp": "2026-03-01T10:15:00", "user": "hi", "bot": "Welcome in!"}]
+
+def lazy(**raw):
+    """LazyMemory as a projected load leaves it: scalars decoded, JSONB still text"""
+    return LazyMemory({"user_id": "u", "version": 3, "buyer_stage": "interested"}, raw, new_memory_document("u"))
+
+def stored_row(**overrides):
+    row = {"version": 3, "live": True, "last_updated": datetime(2026, 3, 1, 10, 15),
+           "interactions": json.dumps(INTERACTIONS), "cta_attempts": "[]", "key_facts": '{"name": "Dana"}',
+           "buyer_stage": "interested", "engagement_level": 4, "render_status": None, "history": None}
+    row.update(overrides)
+    return row
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SQLiteMemoryManager(str(tmp_path / "memory.db"))
+    yield manager
+    manager.close()
+
+# ============================================================================
+# LAZYMEMORY
+# ============================================================================
+
+def test_jsonb_is_decoded_on_first_read():
+    memory = lazy(key_facts='{"name": "Dana"}')
+    assert dict.__contains__(memory, "key_facts") is False
+    assert "key_facts" in memory
+    assert memory["key_facts"] == {"name": "Dana"}
+    assert memory._raw == {}
+
+def test_null_jsonb_reads_as_a_fresh_default():
+    memory = lazy(key_facts=None)
+    memory["key_facts"]["name"] = "Dana"
+    assert memory["key_facts"] == {"name": "Dana"}
+    assert new_memory_document("u")["key_facts"] == {}
+
+def test_get_and_setdefault_decode():
+    memory = lazy(key_facts='{"a": 1}', contact_info='{"email": "d@example.com"}')
+    assert memory.get("key_facts") == {"a": 1}
+    assert memory.setdefault("contact_info", {}) == {"email": "d@example.com"}
+    assert memory.get("preferences", "absent") == "absent"
+    with pytest.raises(KeyError):
+        memory["preferences"]
+
+def test_whole_document_views_see_decoded_values():
+    memory = lazy(key_facts='{"a": 1}')
+    assert len(memory) == 4
+    assert json.loads(json.dumps(memory))["key_facts"] == {"a": 1}
+    assert dict(memory)["key_facts"] == {"a": 1}
+
+def test_only_decoded_or_assigned_columns_are_dirty():
+    memory = lazy(key_facts='{"a": 1}', contact_info="{}", preferences="{}")
+    assert memory.dirty_columns() == ("buyer_stage",)
+    memory["key_facts"]["b"] = 2
+    memory["engagement_level"] = 5
+    assert memory.dirty_columns() == ("key_facts", "buyer_stage", "engagement_level")
+
+def test_touching_either_history_rewrites_both_and_the_blob():
+    memory = lazy(interactions="[]", cta_attempts="[]")
+    memory["cta_attempts"].append({"type": "quote"})
+    assert memory.dirty_columns() == ("buyer_stage",) + HISTORY_COLUMNS
+
+# ============================================================================
+# SQL
+# ============================================================================
+
+def test_projected_load_selects_only_the_requested_columns():
+    sql = projected_load_sql(("key_facts", "buyer_stage"))
+    assert "m.key_facts::text AS key_facts" in sql
+    assert "m.buyer_stage" in sql
+    assert "interactions" not in sql and "history" not in sql
+    assert sql.count("%s") == 2
+
+def test_projected_load_fetches_the_blob_with_histories():
+    assert "m.history" in projected_load_sql(("interactions", "cta_attempts"))
+
+def test_projected_load_rejects_unknown_fields():
+    with pytest.raises(ValueError):
+        projected_load_sql(("key_facts", "password"))
+
+def test_projected_load_keeps_the_histories_together():
+    # A save rewrites both, so loading one alone would have nothing to write for the other
+    with pytest.raises(ValueError):
+        projected_load_sql(("interactions", "key_facts"))
+
+def test_partial_save_updates_only_the_given_columns():
+    sql = partial_save_sql(("key_facts", "buyer_stage"))
+    assert "SET last_updated = %s, key_facts = %s, buyer_stage = %s, version = version + 1" in sql
+    assert "WHERE user_id = %s AND version = %s" in sql
+    assert "interactions" not in sql
+    assert sql.count("%s") == 5
+
+# ============================================================================
+# ROWS AND PARAMETERS
+# ============================================================================
+
+def test_projected_row_becomes_lazy_memory(manager):
+    memory = manager._projected_memory(stored_row(), "u", FIELDS, new_memory_document("u"))
+    assert isinstance(memory, LazyMemory)
+    assert memory["version"] == 3
+    assert memory["last_updated"] == "2026-03-01T10:15:00"
+    assert memory["render_status"] is None
+    assert memory._raw.keys() == {"interactions", "cta_attempts", "key_facts"}
+    assert memory["interactions"] == INTERACTIONS
+
+def test_expired_row_loads_fresh_at_the_stored_version(manager):
+    memory = manager._projected_memory({"version": 7, "live": None}, "u", FIELDS, new_memory_document("u"))
+    assert not isinstance(memory, LazyMemory)
+    assert memory["version"] == 7
+    assert memory["interactions"] == []
+
+def test_projected_row_prefers_the_history_blob(manager):
+    row = stored_row(interactions="[]", history=encode_history(INTERACTIONS, []))
+    memory = manager._projected_memory(row, "u", FIELDS, new_memory_document("u"))
+    assert dict.__contains__(memory, "interactions")
+    assert memory["interactions"] == INTERACTIONS
+
+def test_partial_save_params_follow_the_sql(manager):
+    memory = manager._projected_memory(stored_row(), "u", FIELDS, new_memory_document("u"))
+    memory["key_facts"]["budget_conscious"] = True
+    sql, params = manager._partial_save(memory)
+    assert sql == partial_save_sql(("key_facts", "buyer_stage", "engagement_level", "render_status"))
+    assert isinstance(params[0], datetime)
+    assert params[1:] == ('{"name": "Dana", "budget_conscious": true}', "interested", 4, None, "u", 3)
+
+def test_compact_partial_save_writes_the_blob(manager):
+    manager.history_codec = "compact"
+    memory = manager._projected_memory(stored_row(), "u", ("interactions", "cta_attempts"), new_memory_document("u"))
+    memory["interactions"].append({"timestamp": "2026-03-01T10:16:00", "user": "price?", "bot": "From $7,999"})
+    sql, params = manager._partial_save(memory)
+    assert sql == partial_save_sql(HISTORY_COLUMNS)
+    interactions, cta_attempts, blob = params[1:4]
+    assert interactions == "[]" and cta_attempts == "[]"
+    assert decode_history(blob) == (memory["interactions"], [])
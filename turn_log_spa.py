@@ -0,0 +1,232 @@
+"""
+Conversation Turn Log
+=====================
+
+Append-only log of every chat turn in ``conversation_turns``, range-
+partitioned by month on ``turn_at``. user_memories only keeps the last
+max_interactions turns per visitor; the log keeps all of them until they
+expire, and expiry is a metadata operation: whole monthly partitions older
+than the cutoff are detached and dropped instead of DELETEd row by row.
+
+Partitions are named ``conversation_turns_YYYY_MM`` and created a few
+months ahead (migration 0004, then cleanup_expired_memories / the scheduler).
+If upkeep hasn't run, a save whose turns have no partition creates it and
+retries, so the log never silently stops at the last pre-created month.
+user_memories itself isn't partitioned (its primary key is the visitor and
+every save moves last_updated); its expiry uses short batched deletes.
+
+The log is also the full-text search index for staff: a stored generated
+``search`` tsvector (visitor text weighted above bot text, migration 0007)
+with a GIN index on every partition, so each turn is indexed as it's
+inserted. ``backfill_turn_log`` seeds it from user_memories for turns that
+predate the log.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from memory_codec_spa import decode_history
+
+logger = logging.getLogger(__name__)
+
+TURN_TABLE = "conversation_turns"
+
+INSERT_TURN_SQL = """
+    INSERT INTO conversation_turns (user_id, turn_at, user_message, bot_response, buyer_stage)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+# Rank and page first, then build snippets for the page only (ts_headline is
+# the expensive part and would otherwise run for every match)
+SEARCH_TURNS_SQL = """
+    SELECT hit.user_id, hit.turn_at, hit.buyer_stage, hit.rank,
+           ts_headline('english', hit.user_message, hit.q, %s) AS user_snippet,
+           ts_headline('english', hit.bot_response, hit.q, %s) AS bot_snippet
+    FROM (
+        SELECT t.user_id, t.turn_at, t.buyer_stage, t.user_message, t.bot_response, q,
+               ts_rank_cd(t.search, q) AS rank
+        FROM {table} t, websearch_to_tsquery('english', %s) AS q
+        WHERE t.search @@ q{filters}
+        ORDER BY rank DESC, t.turn_at DESC, t.user_id
+        LIMIT %s OFFSET %s
+    ) hit
+    ORDER BY hit.rank DESC, hit.turn_at DESC, hit.user_id
+"""
+SEARCH_SNIPPET_OPTIONS = "StartSel=«, StopSel=», MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter= … "
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_OFFSET = 1000
+
+def search_turns_query(query: str, limit: int, offset: int, user_id: str = None,
+                       since: datetime = None, table: str = TURN_TABLE) -> Tuple[str, Tuple]:
+    """SEARCH_TURNS_SQL and its parameters (limit/offset clamped)"""
+    filters, params = "", []
+    if user_id:
+        filters += " AND t.user_id = %s"
+        params.append(user_id)
+    if since:
+        # Also prunes the partitions before since
+        filters += " AND t.turn_at >= %s"
+        params.append(since)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, min(offset, SEARCH_MAX_OFFSET))
+    sql = SEARCH_TURNS_SQL.format(table=table, filters=filters)
+    return sql, (SEARCH_SNIPPET_OPTIONS, SEARCH_SNIPPET_OPTIONS, query, *params, limit, offset)
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date, table: str = TURN_TABLE) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+def turn_rows(user_id: str, buyer_stage: str, turns: List[Dict[str, Any]]) -> List[Tuple]:
+    """Pending turns from add_interaction -> INSERT_TURN_SQL parameters"""
+    return [
+        (user_id, datetime.fromisoformat(turn["timestamp"]), turn.get("user", ""), turn.get("bot", ""), buyer_stage)
+        for turn in turns
+    ]
+
+def list_partitions(cur, table: str = TURN_TABLE) -> List[str]:
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (table,))
+    return sorted(row[0] for row in cur.fetchall())
+
+def create_partition_sql(month: date, table: str = TURN_TABLE) -> str:
+    """CREATE TABLE for one monthly partition (literal bounds: DDL takes no bind parameters)"""
+    return (f'CREATE TABLE IF NOT EXISTS "{partition_name(month, table)}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')")
+
+def create_turn_partition(cur, month: date, table: str = TURN_TABLE) -> str:
+    cur.execute(create_partition_sql(month, table))
+    return partition_name(month, table)
+
+def turn_months(turns: List[Dict[str, Any]]) -> List[date]:
+    """Months the given pending turns fall in (the partitions their insert needs)"""
+    return sorted({month_start(datetime.fromisoformat(turn["timestamp"])) for turn in turns})
+
+def ensure_turn_partitions(cur, months_ahead: int = 2, table: str = TURN_TABLE) -> List[str]:
+    """Create this month's partition and the next months_ahead (idempotent)"""
+    existing = set(list_partitions(cur, table))
+
+    created = []
+    first = month_start(datetime.now())
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        if partition_name(month, table) in existing:
+            continue
+        created.append(create_turn_partition(cur, month, table))
+    if created:
+        logger.info(f"Created turn log partitions: {', '.join(created)}")
+    return created
+
+def drop_expired_turn_partitions(cur, cutoff: datetime, table: str = TURN_TABLE) -> List[str]:
+    """Detach and drop every monthly partition that ends on or before cutoff"""
+    pattern = re.compile(rf"{re.escape(table)}_(\d{{4}})_(\d{{2}})")
+
+    dropped = []
+    for name in list_partitions(cur, table):
+        match = pattern.fullmatch(name)
+        if not match:
+            continue
+        month_end = add_months(date(int(match.group(1)), int(match.group(2)), 1), 1)
+        if datetime.combine(month_end, datetime.min.time()) <= cutoff:
+            cur.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+            cur.execute(f'DROP TABLE "{name}"')
+            dropped.append(name)
+    if dropped:
+        logger.info(f"Dropped expired turn log partitions: {', '.join(dropped)}")
+    return dropped
+
+# ============================================================================
+# BACKFILL (turns saved before the log existed)
+# ============================================================================
+
+BACKFILL_BATCH_SQL = """
+    SELECT m.user_id, m.buyer_stage, m.interactions, m.history,
+           (SELECT min(t.turn_at) FROM conversation_turns t WHERE t.user_id = m.user_id) AS first_logged
+    FROM user_memories m
+    WHERE m.user_id > %s
+    ORDER BY m.user_id
+    LIMIT %s
+"""
+
+def backfill_turn_log(database_url: str, expiry_days: int = 90, batch_size: int = 500) -> int:
+    """
+    Copy the turns kept in user_memories into conversation_turns
+
+    Only turns older than a visitor's first logged turn are copied, so a re-run
+    never duplicates; turns already past expiry are skipped. Missing monthly
+    partitions are created on the way.
+    """
+    import psycopg2
+
+    cutoff = datetime.now() - timedelta(days=expiry_days)
+    copied, last_user = 0, ""
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            partitions = set(list_partitions(cur))
+        while True:
+            with conn, conn.cursor() as cur:
+                cur.execute(BACKFILL_BATCH_SQL, (last_user, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                for user_id, buyer_stage, interactions, history, first_logged in rows:
+                    if history is not None:
+                        interactions = decode_history(history)[0]
+                    elif isinstance(interactions, str):
+                        interactions = json.loads(interactions)
+
+                    turns = []
+                    for turn in turns_before(interactions or [], first_logged, cutoff):
+                        month = month_start(datetime.fromisoformat(turn["timestamp"]))
+                        if partition_name(month) not in partitions:
+                            partitions.add(create_turn_partition(cur, month))
+                        turns.append(turn)
+                    if turns:
+                        cur.executemany(INSERT_TURN_SQL, turn_rows(user_id, buyer_stage, turns))
+                        copied += len(turns)
+                last_user = rows[-1][0]
+            logger.info(f"Backfilled {copied} turns so far")
+    finally:
+        conn.close()
+    return copied
+
+def turns_before(interactions: List[Dict[str, Any]], first_logged: datetime, cutoff: datetime) -> List[Dict[str, Any]]:
+    """Interactions with a parseable timestamp in [cutoff, first_logged)"""
+    selected = []
+    for turn in interactions:
+        try:
+            turn_at = datetime.fromisoformat(turn["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if turn_at >= cutoff and (first_logged is None or turn_at < first_logged):
+            selected.append(turn)
+    return selected
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the conversation turn log")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--expiry-days", type=int, default=90)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    copied = backfill_turn_log(args.database_url, args.expiry_days, args.batch_size)
+    print(f"Backfilled {copied} turns into {TURN_TABLE}")
+
+if __name__ == "__main__":
+    main()